@@ -21,6 +21,10 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+# `alembic -x online=true upgrade head`: apply migrations under load, see
+# app/core/db/online_migrations.py
+ONLINE = context.get_x_argument(as_dictionary=True).get("online", "").lower() == "true"
+
 
 def get_url() -> str:
     settings = get_settings()
@@ -77,7 +81,21 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        if ONLINE:
+            # Fail fast rather than queue behind a long transaction while
+            # holding up every query waiting on the same table. Concurrent
+            # index builds lift it, see online_migrations._run_concurrently
+            lock_timeout = get_settings().MIGRATION_LOCK_TIMEOUT_MS
+            connection.exec_driver_sql(f"SET lock_timeout = {int(lock_timeout)}")
+            # Concurrent index builds on large tables may take a while
+            connection.exec_driver_sql("SET statement_timeout = 0")
+            connection.commit()
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # Commits each migration on its own, so a failure keeps the finished ones
+            transaction_per_migration=ONLINE,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -1,8 +1,9 @@
 from typing import Annotated, TypedDict
 
-from fastapi import Depends, Query
+from fastapi import Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.aws_iot_client import DeviceQuery
 from app.core.db.database import SessionLocal
 
 
@@ -34,3 +35,71 @@ def pagination_params(
 
 
 PaginationDep = Annotated[PaginationParams, Depends(pagination_params)]
+
+
+class KeyFilterParams(TypedDict):
+    group: str | None
+    is_active: bool | None
+    expired: bool | None
+
+
+# Filters shared by the key listing and export endpoints
+def key_filter_params(
+    group: str | None = Query(default=None, min_length=1, max_length=255),
+    is_active: bool | None = Query(default=None),
+    expired: bool | None = Query(default=None),
+) -> KeyFilterParams:
+    """Common bootstrap key filters"""
+    return {"group": group, "is_active": is_active, "expired": expired}
+
+
+KeyFilterDep = Annotated[KeyFilterParams, Depends(key_filter_params)]
+
+
+DEFAULT_DEVICE_PAGE_SIZE = 100
+
+
+class DeviceListParams(TypedDict):
+    query: DeviceQuery | None
+    page_size: int
+    next_token: str | None
+
+
+# Server-side device filters and pagination; without any, all devices are listed
+def device_list_params(
+    name_prefix: str | None = Query(default=None, min_length=1, max_length=128),
+    attribute: list[str] = Query(
+        default=[], description="Attribute equality as name=value, repeatable"
+    ),
+    connected: bool | None = Query(default=None),
+    thing_group: str | None = Query(default=None, min_length=1, max_length=128),
+    page_size: int | None = Query(default=None, ge=1, le=250),
+    next_token: str | None = Query(default=None, max_length=4096),
+) -> DeviceListParams:
+    """Device listing filters and pagination"""
+    attributes = {}
+    for item in attribute:
+        name, separator, value = item.partition("=")
+        if not separator or not name:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid attribute filter {item!r}, expected name=value",
+            )
+        attributes[name] = value
+    query = None
+    filtered = name_prefix or attributes or connected is not None or thing_group
+    if filtered or page_size or next_token:
+        query = DeviceQuery(
+            name_prefix=name_prefix,
+            attributes=attributes,
+            connected=connected,
+            thing_group=thing_group,
+        )
+    return {
+        "query": query,
+        "page_size": page_size or DEFAULT_DEVICE_PAGE_SIZE,
+        "next_token": next_token,
+    }
+
+
+DeviceListDep = Annotated[DeviceListParams, Depends(device_list_params)]
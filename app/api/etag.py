@@ -0,0 +1,45 @@
+from typing import Annotated
+
+from fastapi import Header, Response, status
+
+# Type alias for the conditional GET request header
+IfNoneMatchHeader = Annotated[str | None, Header()]
+
+
+def make_etag(resource: str, version: int) -> str:
+    """
+    Builds a weak ETag from a resource change version.
+    Weak because the body encoding (ordering, pagination) is not byte-stable.
+    """
+    return f'W/"{resource}-{version}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return tag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Weak comparison of an `If-None-Match` header against the current ETag (RFC 9110).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = _opaque_tag(etag)
+    return any(_opaque_tag(candidate) == current for candidate in if_none_match.split(","))
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    # Clients may cache but must revalidate every time
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_etag(response, etag)
+    return response
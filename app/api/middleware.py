@@ -0,0 +1,273 @@
+import asyncio
+import ipaddress
+import random
+import secrets
+import threading
+import time
+import uuid
+
+from opentelemetry import propagate, trace
+from opentelemetry.trace import Status, StatusCode
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+from app.core.audit import ADMIN, AuditWriter
+from app.core.profiling import ProfileStore, StackSampler
+from app.core.settings import Settings
+from app.core.structured_logging import request_id_var
+from app.core.tracing import tracer
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Rebuilds the matched route template (e.g. `/private/v1/admin/keys/{key_id}`)
+    from the request path and its path parameters; "unmatched" for 404s so
+    scanners cannot inflate the label cardinality.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    path = scope["path"]
+    for name, value in scope.get("path_params", {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+
+class ForwardedClientMiddleware:
+    """
+    Replaces the client address with the one a trusted proxy saw, so rate
+    limits and the audit log see devices rather than the load balancer.
+
+    `X-Forwarded-For` is only read when the peer is in `trusted_proxies`
+    (CIDRs). It is walked from the right, skipping trusted hops: entries left
+    of the first untrusted address were written by the client and are ignored.
+    """
+
+    def __init__(self, app: ASGIApp, trusted_proxies: list[str]) -> None:
+        self.app = app
+        # Invalid CIDRs fail at startup
+        self.trusted = [ipaddress.ip_network(cidr, strict=False) for cidr in trusted_proxies]
+
+    def _is_trusted(self, host: str) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted)
+
+    def forwarded_client(self, peer: str, forwarded_for: list[str]) -> str:
+        if not self._is_trusted(peer):
+            return peer
+        hops = [hop.strip() for value in forwarded_for for hop in value.split(",")]
+        hops = [hop for hop in hops if hop]
+        for hop in reversed(hops):
+            if not self._is_trusted(hop):
+                return hop
+        return hops[0] if hops else peer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        client = scope.get("client")
+        if scope["type"] == "http" and self.trusted and client:
+            forwarded_for = Headers(scope=scope).getlist("x-forwarded-for")
+            if forwarded_for:
+                scope["client"] = (self.forwarded_client(client[0], forwarded_for), 0)
+        await self.app(scope, receive, send)
+
+
+class RequestContextMiddleware:
+    """
+    Binds a request id to the logging context: the caller's `X-Request-ID`
+    when it looks sane, a fresh one otherwise. It is echoed in the response.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id", "")
+        if not (0 < len(request_id) <= 128 and request_id.isascii() and request_id.isprintable()):
+            request_id = uuid.uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
+
+
+class AuditMiddleware:
+    """
+    Records every admin API request in the audit log once it is answered:
+    method and route template, status code, the bootstrap key it targeted and
+    the query string.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str, writer: AuditWriter) -> None:
+        self.app = app
+        self.prefix = prefix
+        self.writer = writer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            key_id = str(scope.get("path_params", {}).get("key_id", ""))
+            client = scope.get("client")
+            query_string = scope.get("query_string", b"").decode("latin-1")
+            self.writer.record(
+                ADMIN,
+                f"{scope['method']} {route_template(scope)}",
+                str(status_code),
+                key_id=int(key_id) if key_id.isdigit() else None,
+                client_ip=client[0] if client else None,
+                detail={"query": query_string} if query_string else None,
+            )
+
+
+class MetricsMiddleware:
+    """
+    Records request latency per route template.
+    Pure ASGI so streaming responses are timed until their last chunk.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.REQUEST_LATENCY.labels(
+                method=scope["method"], route=route_template(scope), status=str(status_code)
+            ).observe(time.perf_counter() - start)
+
+
+class TracingMiddleware:
+    """
+    Opens the root server span of each request, continuing the W3C trace
+    context (`traceparent` / `tracestate`) sent by the caller, if any.
+    Steps aside when an outer instrumentation (e.g. FastAPI's native
+    telemetry) already opened one, so requests are not traced twice.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or trace.get_current_span().get_span_context().is_valid:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]
+        }
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with tracer.start_as_current_span(
+            scope["method"],
+            context=propagate.extract(carrier),
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]},
+        ) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                span.update_name(f"{scope['method']} {route}")
+                span.set_attribute("http.route", route)
+                span.set_attribute("http.response.status_code", status_code)
+                if status_code >= 500:
+                    span.set_status(Status(StatusCode.ERROR))
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a random `PROFILING_SAMPLE_RATE` share of requests, and private API
+    requests carrying `PROFILING_TOKEN` in `X-Profile-Token`, with a stack
+    sampler on the event loop thread. The folded stacks are written to the
+    profile store and the profile name is returned in `X-Profile-Id`.
+
+    The sampler sees the whole loop, so only one request is profiled at a
+    time to keep other requests out of its profile as much as possible.
+    """
+
+    def __init__(self, app: ASGIApp, settings: Settings, store: ProfileStore) -> None:
+        self.app = app
+        self.settings = settings
+        self.store = store
+        self._busy = False
+
+    def _wants_profile(self, scope: Scope) -> bool:
+        if random.random() < self.settings.PROFILING_SAMPLE_RATE:
+            return True
+        token = self.settings.PROFILING_TOKEN.get_secret_value()
+        if not token or not scope["path"].startswith(self.settings.API_PRIVATE_V1_STR):
+            return False
+        provided = Headers(scope=scope).get("x-profile-token")
+        return provided is not None and secrets.compare_digest(provided, token)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._busy or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        name = self.store.new_name(scope["method"], scope["path"])
+        sampler = StackSampler(threading.get_ident(), self.settings.PROFILING_INTERVAL_MS / 1000)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            samples = await asyncio.to_thread(sampler.stop)
+            self._busy = False
+            await asyncio.to_thread(self.store.save, name, samples)
@@ -0,0 +1,75 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from app.api.deps import SessionDep
+from app.core.crud.audit_log import query_records
+from app.core.schemas import schemas
+from app.core.settings import Settings, get_settings
+
+audit_router = APIRouter()
+
+
+def _encode_page_token(record) -> str:
+    state = {"created_date": record.created_date.isoformat(), "id": record.id}
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def _decode_page_token(token: str) -> tuple[datetime, int]:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(state["created_date"]), int(state["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid next_token"
+        ) from e
+
+
+@audit_router.get(
+    "/admin/audit",
+    response_model=list[schemas.AuditRecordInfo],
+    tags=["Admin"],
+    summary="Admin: Query the audit log.",
+)
+async def list_audit_records(
+    response: Response,
+    db: SessionDep,
+    key_id: int | None = None,
+    key_hint: str | None = Query(default=None, min_length=4, max_length=4),
+    device_id: str | None = Query(default=None, max_length=128),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    next_token: str | None = Query(default=None, max_length=512),
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Registration attempts and admin requests in the `[since, until)` window,
+    newest first, optionally for one bootstrap key (by id or hint) or device.
+    The window defaults to the last `AUDIT_QUERY_DEFAULT_DAYS` days; only the
+    monthly partitions it overlaps are read. When more records match, pass
+    the `X-Next-Token` response header back as `next_token`.
+    """
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=settings.AUDIT_QUERY_DEFAULT_DAYS)
+    if since.tzinfo is None or until.tzinfo is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since and until must include a timezone",
+        )
+    records = await query_records(
+        db,
+        since,
+        until,
+        key_id=key_id,
+        key_hint=key_hint,
+        device_id=device_id,
+        before=_decode_page_token(next_token) if next_token else None,
+        limit=limit,
+    )
+    if len(records) == limit:
+        response.headers["X-Next-Token"] = _encode_page_token(records[-1])
+    return records
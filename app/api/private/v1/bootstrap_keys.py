@@ -1,16 +1,25 @@
 import logging
+from datetime import datetime, timezone
+from typing import Literal
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
-from app.api.deps import PaginationDep, SessionDep
+from app.api.deps import KeyFilterDep, PaginationDep, SessionDep
+from app.api.etag import IfNoneMatchHeader, etag_matches, make_etag, not_modified, set_etag
 from app.core.crud.bootstrap_keys import (
     BootstrapKeyExpiredError,
     BootstrapKeyNotFoundError,
     create_key,
     delete_key,
     get_keys,
+    stream_keys,
     update_key_status,
 )
+from app.core.crud.change_versions import BOOTSTRAP_KEYS, get_version
+from app.core.crud.key_group_stats import get_stats
+from app.core.crud.key_import import KeyImportFormatError, import_keys, iter_lines
+from app.core.export import ENCODERS, encode_rows
 from app.core.schemas import schemas
 from app.core.schemas.schemas import BootstrapKeyUpdateRequest
 
@@ -70,14 +79,26 @@ async def create_bootstrap_key(
 )
 async def list_bootstrap_keys(
     pagination: PaginationDep,
+    filters: KeyFilterDep,
     db: SessionDep,
+    response: Response,
+    if_none_match: IfNoneMatchHeader = None,
 ):
     """
-    Lists all bootstrap keys in the database.
+    Lists all bootstrap keys in the database, optionally filtered by
+    `group`, `is_active` and `expired`.
     Does *not* return the raw key or hash.
+
+    The response carries an `ETag`; sending it back in `If-None-Match`
+    returns `304 Not Modified` without reading the keys table. Keys expire
+    without a write, so `expired` queries carry no ETag.
     """
+    cacheable = filters["expired"] is None
     try:
-        keys = await get_keys(db, pagination)
+        etag = make_etag(BOOTSTRAP_KEYS, await get_version(db, BOOTSTRAP_KEYS))
+        if cacheable and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        keys = await get_keys(db, pagination, filters)
     except Exception as e:
         logger.exception(f"Failed to list keys: {str(e)}")
         raise HTTPException(
@@ -85,9 +106,95 @@ async def list_bootstrap_keys(
             detail="Failed to list keys",
         )
 
+    if cacheable:
+        set_etag(response, etag)
     return keys
 
 
+@bootstrap_key_router.get(
+    "/admin/keys/export",
+    response_class=StreamingResponse,
+    tags=["Admin"],
+    summary="Admin: Export bootstrap key metadata as CSV or NDJSON.",
+)
+async def export_bootstrap_keys(
+    filters: KeyFilterDep,
+    db: SessionDep,
+    export_format: Literal["csv", "ndjson"] = Query(default="ndjson", alias="format"),
+):
+    """
+    Streams the metadata (hint, group, dates, status) of every key matching
+    the listing filters. Never includes the raw key or hash.
+
+    Rows are read through a server-side cursor and encoded as they arrive,
+    so memory use does not grow with the number of keys.
+    """
+    media_type, _ = ENCODERS[export_format]
+    filename = f"bootstrap_keys-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.{export_format}"
+    return StreamingResponse(
+        encode_rows(stream_keys(db, filters), export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@bootstrap_key_router.post(
+    "/admin/keys/import",
+    response_model=schemas.KeyImportReport,
+    tags=["Admin"],
+    summary="Admin: Bulk import externally generated key hashes.",
+)
+async def import_bootstrap_keys(
+    request: Request,
+    db: SessionDep,
+    import_format: Literal["csv", "ndjson"] = Query(default="ndjson", alias="format"),
+):
+    """
+    Imports key hashes generated outside the service (e.g. on a manufacturer's HSM).
+
+    The request body is the raw CSV (with a header line) or NDJSON file, one key
+    per line with `key_hash`, `key_hint`, `expiration_date` and optionally
+    `group`, `created_date` and `is_active`. The body is streamed, validated in
+    chunks and loaded with COPY; invalid or duplicate rows are reported back
+    instead of failing the whole file.
+    """
+    try:
+        report = await import_keys(db, iter_lines(request.stream()), import_format)
+    except KeyImportFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Failed to import keys: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to import keys",
+        )
+    return report
+
+
+@bootstrap_key_router.get(
+    "/admin/keys/stats",
+    response_model=list[schemas.KeyGroupStats],
+    tags=["Admin"],
+    summary="Admin: Key counts per key group.",
+)
+async def bootstrap_key_stats(db: SessionDep):
+    """
+    Returns active, inactive, expired and used key counts per key group.
+
+    Served from the incrementally maintained `key_group_stats` table, so the
+    cost does not depend on the number of keys. Expiry has hour resolution.
+    """
+    try:
+        stats = await get_stats(db)
+    except Exception as e:
+        logger.exception(f"Failed to compute key stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to compute key stats",
+        )
+    return stats
+
+
 @bootstrap_key_router.delete(
     "/admin/keys/{key_id}",
     status_code=status.HTTP_204_NO_CONTENT,
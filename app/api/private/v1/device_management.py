@@ -1,33 +1,127 @@
 import logging
+from collections.abc import AsyncIterator
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 
+from app.api.deps import DeviceListDep, SessionDep
+from app.api.etag import IfNoneMatchHeader, etag_matches, make_etag, not_modified, set_etag
 from app.core import aws_iot_client
+from app.core.aws_iot_client import LIST_THINGS, InvalidDeviceQueryError, UnknownRegionError
+from app.core.cert_reconciler import start_reconcile_job
+from app.core.crud.change_versions import DEVICES, get_version, mark_changed
+from app.core.crud.device_registrations import (
+    RevocationJobNotFoundError,
+    create_revocation_job,
+    get_revocation_job,
+    record_revocation,
+)
+from app.core.crud.reconcile_jobs import (
+    ReconcileJobNotFoundError,
+    create_reconcile_job,
+    get_reconcile_job,
+)
+from app.core.revocation import start_revocation_job
 from app.core.schemas import schemas
 
 logger = logging.getLogger(__name__)
 device_management_router = APIRouter()
 
 
+async def _stream_devices(first: dict | None, devices: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Writes `first` and the remaining devices as a JSON array, as they arrive."""
+    try:
+        if first is None:
+            yield "[]"
+            return
+        yield "[" + schemas.IotDevice.model_validate(first).model_dump_json()
+        async for device in devices:
+            yield "," + schemas.IotDevice.model_validate(device).model_dump_json()
+        yield "]"
+    except Exception as e:
+        logger.exception(f"Failed to list devices from AWS, response aborted: {str(e)}")
+        raise
+    finally:
+        await devices.aclose()
+
+
 @device_management_router.get(
     "/admin/devices",
     response_model=list[schemas.IotDevice],
     tags=["Admin"],
     summary="Admin: List provisioned devices from AWS IoT Core.",
 )
-async def list_iot_devices():
+async def list_iot_devices(
+    params: DeviceListDep,
+    db: SessionDep,
+    response: Response,
+    if_none_match: IfNoneMatchHeader = None,
+):
     """
-    Acts as a proxy to AWS IoT Core to list all registered Things (devices).
+    Acts as a proxy to AWS IoT Core to list registered Things (devices),
+    fanning out to every configured region concurrently.
+
+    Filters (`name_prefix`, repeatable `attribute=name=value`, `connected`,
+    `thing_group`) and `page_size` are answered server-side with a fleet
+    indexing search, or with `list_things` in regions without indexing
+    (connectivity and thing group filters need indexing). The next page
+    token is returned in `X-Next-Token`, and the path that answered
+    (`search_index`, `list_things` or `mixed`) in `X-Device-Query-Path`.
+    The token only continues the filters it was issued for (400 otherwise).
+    Regions that lost fleet indexing mid-pagination end early and are named
+    in `X-Truncated-Regions`: list them again without a token.
+    Without filters or `page_size`, every region's devices are streamed as
+    one JSON array, merged as the regions' pages arrive. A region failing
+    after the first device aborts the response, leaving the array unclosed
+    rather than silently short.
+
+    The `ETag` tracks devices registered or revoked through this service;
+    a matching `If-None-Match` returns `304 Not Modified` without calling AWS.
+    Connectivity changes are not tracked, so `connected` queries carry no ETag.
     """
+    query = params["query"]
+    cacheable = query is None or query["connected"] is None
+    etag = make_etag(DEVICES, await get_version(db, DEVICES))
+    if cacheable and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    next_token, truncated = None, []
     try:
-        devices = await aws_iot_client.list_provisioned_devices()
-        return devices
+        if query is None:
+            devices = aws_iot_client.iter_provisioned_devices()
+            # Wait for the first device: a region failing up front is still a 500
+            try:
+                first = await anext(devices, None)
+            except BaseException:
+                await devices.aclose()
+                raise
+            path = LIST_THINGS
+        else:
+            devices, next_token, path, truncated = await aws_iot_client.query_devices(
+                query, params["page_size"], params["next_token"]
+            )
+    except InvalidDeviceQueryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.exception(f"Failed to list devices from AWS: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to list devices from AWS",
         )
+    if truncated:
+        # The region must be listed again from the start: nothing to cache
+        response.headers["X-Truncated-Regions"] = ",".join(truncated)
+    elif cacheable:
+        set_etag(response, etag)
+    response.headers["X-Device-Query-Path"] = path
+    if next_token:
+        response.headers["X-Next-Token"] = next_token
+    if query is None:
+        return StreamingResponse(
+            _stream_devices(first, devices),
+            media_type="application/json",
+            headers=dict(response.headers),
+        )
+    return devices
 
 
 @device_management_router.post(
@@ -36,17 +130,114 @@ async def list_iot_devices():
     tags=["Admin"],
     summary="Admin: Revoke a device's certificate in AWS IoT Core.",
 )
-async def revoke_iot_certificate(revoke_request: schemas.RevokeCertificateRequest):
+async def revoke_iot_certificate(revoke_request: schemas.RevokeCertificateRequest, db: SessionDep):
     """
     Revokes a device's certificate in AWS IoT Core.
     This permanently blocks the device from authenticating with the ALB.
+    `region` must be one of the configured regions (400 otherwise).
     """
     try:
-        await aws_iot_client.revoke_device_certificate(certificate_id=revoke_request.certificate_id)
+        await aws_iot_client.revoke_device_certificate(
+            certificate_id=revoke_request.certificate_id, region=revoke_request.region
+        )
+    except UnknownRegionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.exception(f"Failed to revoke certificate: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to revoke certificate",
         )
+    await record_revocation(db, revoke_request.certificate_id, revoke_request.region)
+    await mark_changed(db, DEVICES)
     return
+
+
+@device_management_router.post(
+    "/admin/devices/revocations",
+    response_model=schemas.RevocationJobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Admin"],
+    summary="Admin: Revoke every device onboarded with a bootstrap key or key group.",
+)
+async def create_revocation(revocation_request: schemas.RevocationJobCreateRequest, db: SessionDep):
+    """
+    Starts a background job revoking the certificates of all devices that
+    registered with the given key (`key_id`) or any key of `group`, e.g.
+    after a key leaked. Deactivate the key as well to stop new registrations.
+
+    Poll `GET /admin/devices/revocations/{job_id}` for progress.
+    """
+    job = await create_revocation_job(db, revocation_request.key_id, revocation_request.group)
+    start_revocation_job(job.id)
+    return job
+
+
+@device_management_router.get(
+    "/admin/devices/revocations/{job_id}",
+    response_model=schemas.RevocationJobInfo,
+    tags=["Admin"],
+    summary="Admin: Get the progress of a bulk revocation.",
+)
+async def get_revocation(job_id: int, db: SessionDep):
+    try:
+        return await get_revocation_job(db, job_id)
+    except RevocationJobNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@device_management_router.post(
+    "/admin/devices/revocations/{job_id}/resume",
+    response_model=schemas.RevocationJobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Admin"],
+    summary="Admin: Resume an interrupted or incomplete bulk revocation.",
+)
+async def resume_revocation(job_id: int, db: SessionDep):
+    """
+    Runs the job again: certificates already revoked are skipped and failed
+    ones retried. A job still reporting progress from another run is left alone.
+    """
+    try:
+        job = await get_revocation_job(db, job_id)
+    except RevocationJobNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    start_revocation_job(job.id)
+    return job
+
+
+@device_management_router.post(
+    "/admin/devices/certificates/reconcile",
+    response_model=schemas.CertificateReconcileJobInfo,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Admin"],
+    summary="Admin: Delete orphaned and revoked certificates (dry run by default).",
+)
+async def reconcile_device_certificates(db: SessionDep, dry_run: bool = True):
+    """
+    Starts a background job finding the certificates left ACTIVE without a
+    Thing by failed provisionings (and with no policy but `IOT_POLICY_NAME`),
+    and the REVOKED ones, older than
+    `CERT_RECONCILER_GRACE_H` (revoked ones counting from their revocation
+    when this service recorded it). With `dry_run=false` they are detached
+    and deleted, under the reconciler rate limit; otherwise only reported.
+    The job is `skipped` while another reconciliation runs.
+
+    Poll `GET /admin/devices/certificates/reconcile/{job_id}` for progress.
+    """
+    job = await create_reconcile_job(db, dry_run)
+    start_reconcile_job(job.id)
+    return job
+
+
+@device_management_router.get(
+    "/admin/devices/certificates/reconcile/{job_id}",
+    response_model=schemas.CertificateReconcileJobInfo,
+    tags=["Admin"],
+    summary="Admin: Get the progress and report of a certificate reconciliation.",
+)
+async def get_certificate_reconciliation(job_id: int, db: SessionDep):
+    try:
+        return await get_reconcile_job(db, job_id)
+    except ReconcileJobNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Query
+
+from app.api.deps import SessionDep
+from app.core.crud.outbox import get_dead_letters, requeue_dead_letters
+from app.core.schemas import schemas
+
+outbox_router = APIRouter()
+
+
+@outbox_router.get(
+    "/admin/outbox/dead-letters",
+    response_model=list[schemas.OutboxEventInfo],
+    tags=["Admin"],
+    summary="Admin: List outbox events given up after repeated delivery failures.",
+)
+async def list_dead_letters(db: SessionDep, limit: int = Query(default=100, ge=1, le=1000)):
+    """Oldest first, with the error of their last delivery attempt."""
+    return await get_dead_letters(db, limit)
+
+
+@outbox_router.post(
+    "/admin/outbox/dead-letters/requeue",
+    response_model=schemas.OutboxRequeueResponse,
+    tags=["Admin"],
+    summary="Admin: Deliver dead-lettered outbox events again.",
+)
+async def requeue_outbox_dead_letters(request: schemas.OutboxRequeueRequest, db: SessionDep):
+    """
+    Makes the given dead letters, or all of them, due again with a fresh
+    budget of OUTBOX_MAX_ATTEMPTS attempts, once the sink is fixed.
+    """
+    requeued = await requeue_dead_letters(db, request.event_ids)
+    await db.commit()
+    return schemas.OutboxRequeueResponse(requeued=requeued)
@@ -1,9 +1,17 @@
 from fastapi import APIRouter
 
+from app.api.private.v1.audit import audit_router
 from app.api.private.v1.bootstrap_keys import bootstrap_key_router
 from app.api.private.v1.device_management import device_management_router
+from app.api.private.v1.outbox import outbox_router
+from app.api.private.v1.profiles import profiles_router
+from app.api.private.v1.rotations import rotations_router
 
 private_router = APIRouter()
 
+private_router.include_router(audit_router)
 private_router.include_router(bootstrap_key_router)
 private_router.include_router(device_management_router)
+private_router.include_router(outbox_router)
+private_router.include_router(profiles_router)
+private_router.include_router(rotations_router)
@@ -0,0 +1,47 @@
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+
+from app.core.profiling import ProfileStore, get_profile_store
+from app.core.schemas import schemas
+
+logger = logging.getLogger(__name__)
+profiles_router = APIRouter()
+
+ProfileStoreDep = Annotated[ProfileStore, Depends(get_profile_store)]
+
+
+@profiles_router.get(
+    "/admin/profiles",
+    response_model=list[schemas.ProfileInfo],
+    tags=["Admin"],
+    summary="Admin: List captured request profiles.",
+)
+async def list_profiles(store: ProfileStoreDep):
+    """
+    Lists the profiles kept in the on-disk ring, newest first.
+
+    Profiles are captured by the sampling profiler middleware
+    (`PROFILING_ENABLED`), either at random (`PROFILING_SAMPLE_RATE`) or for
+    private API requests sending `X-Profile-Token`.
+    """
+    return store.list()
+
+
+@profiles_router.get(
+    "/admin/profiles/{name}",
+    response_class=FileResponse,
+    tags=["Admin"],
+    summary="Admin: Download a request profile.",
+)
+async def download_profile(name: str, store: ProfileStoreDep):
+    """
+    Downloads a profile in collapsed-stack format
+    (`flamegraph.pl`, speedscope and inferno read it as is).
+    """
+    profile = store.path(name)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(profile, media_type="text/plain", filename=name)
@@ -0,0 +1,69 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.api.deps import SessionDep
+from app.core.crud.rotation_campaigns import (
+    RotationCampaignNotFoundError,
+    create_campaign,
+    get_campaign,
+    get_campaigns,
+)
+from app.core.schemas import schemas
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+rotations_router = APIRouter()
+
+
+@rotations_router.post(
+    "/admin/devices/rotations",
+    response_model=schemas.RotationCampaignInfo,
+    status_code=status.HTTP_201_CREATED,
+    tags=["Admin"],
+    summary="Admin: Start a certificate rotation campaign.",
+)
+async def create_rotation_campaign(
+    campaign_request: schemas.RotationCampaignCreateRequest,
+    db: SessionDep,
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Replaces the certificates of the devices registered with keys of `group`
+    at least `min_age_days` ago. The rotation scheduler then issues the new
+    certificates at `tps` per second, delivers them to the devices through an
+    IoT Job, and deactivates each old certificate `grace_period_hours` later.
+    """
+    grace_period_hours = campaign_request.grace_period_hours
+    if grace_period_hours is None:
+        grace_period_hours = settings.ROTATION_GRACE_PERIOD_H
+    return await create_campaign(
+        db,
+        key_group=campaign_request.group,
+        min_age_days=campaign_request.min_age_days,
+        tps=campaign_request.tps or settings.ROTATION_TPS,
+        grace_period_s=grace_period_hours * 3600,
+    )
+
+
+@rotations_router.get(
+    "/admin/devices/rotations",
+    response_model=list[schemas.RotationCampaignInfo],
+    tags=["Admin"],
+    summary="Admin: List certificate rotation campaigns.",
+)
+async def list_rotation_campaigns(db: SessionDep):
+    return await get_campaigns(db)
+
+
+@rotations_router.get(
+    "/admin/devices/rotations/{campaign_id}",
+    response_model=schemas.RotationCampaignInfo,
+    tags=["Admin"],
+    summary="Admin: Get the progress of a certificate rotation campaign.",
+)
+async def get_rotation_campaign(campaign_id: int, db: SessionDep):
+    try:
+        return await get_campaign(db, campaign_id)
+    except RotationCampaignNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
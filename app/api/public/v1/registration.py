@@ -1,13 +1,27 @@
+import asyncio
 import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db
-from app.core import aws_iot_client, security
+from app.core import aws_iot_client, metrics, security
+from app.core.admission import AdmissionLimiter, AdmissionRejectedError, get_registration_limiter
+from app.core.audit import REGISTRATION, get_audit_writer
+from app.core.ca import InvalidCsrError, SigningUnavailableError, get_local_ca, validate_csr
+from app.core.crud.bootstrap_keys import mark_key_used
+from app.core.crud.change_versions import DEVICES, mark_changed
+from app.core.crud.device_registrations import record_registrations
+from app.core.db import models
+from app.core.rate_limit import FailureThrottle, get_failure_throttle
 from app.core.schemas import schemas
 from app.core.settings import Settings, get_settings
+from app.core.structured_logging import bind_device_id
 
 # ==============================================================================
 # Public Endpoint: Device Provisioning
@@ -19,17 +33,116 @@ api_key_header = APIKeyHeader(name="X-Api-Key", description="The device's unique
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def _admitted(limiter: AdmissionLimiter, weight: int):
+    try:
+        async with limiter.slot(weight):
+            yield
+    except AdmissionRejectedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Registration service is busy, retry later.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+async def admission_control(limiter: AdmissionLimiter = Depends(get_registration_limiter)):
+    """
+    Admits the registration, or sheds it with 503 and Retry-After when too
+    many are already running and queued.
+    """
+    async with _admitted(limiter, 1):
+        yield
+
+
+async def batch_admission_control(
+    registration_data: schemas.DeviceBatchRegistrationRequest,
+    settings: Settings = Depends(get_settings),
+    limiter: AdmissionLimiter = Depends(get_registration_limiter),
+):
+    """
+    Admits a batch as the number of AWS chains it runs at once, so it counts
+    against the registration limit like that many single registrations.
+    """
+    weight = min(len(registration_data.devices), settings.REGISTRATION_BATCH_CONCURRENCY)
+    async with _admitted(limiter, weight):
+        yield
+
+
+async def track_in_flight():
+    """
+    Counts a registration as in flight until its response (streamed or not) is sent.
+    """
+    with metrics.REGISTRATIONS_IN_FLIGHT.track_inprogress():
+        yield
+
+
+def _audit(
+    request: Request,
+    outcome: str,
+    db_key: models.BootstrapKey | None = None,
+    api_key: str | None = None,
+    device_id: str | None = None,
+    detail: dict | None = None,
+) -> None:
+    """
+    Records a registration attempt in the audit log, with the key that made
+    it (or the hint of the rejected key) and the requested device.
+    """
+    get_audit_writer().record(
+        REGISTRATION,
+        request.scope["route"].name,
+        outcome,
+        key_id=db_key.id if db_key is not None else None,
+        key_hint=db_key.key_hint if db_key is not None else (api_key or "")[-4:] or None,
+        device_id=device_id,
+        client_ip=request.client.host if request.client else None,
+        detail=detail,
+    )
+
+
+async def _authenticate(
+    request: Request, db: AsyncSession, api_key: str, throttle: FailureThrottle | None
+) -> models.BootstrapKey | None:
+    """
+    Validates the bootstrap key unless the client IP or key hint failed too
+    often recently (429 without touching the database or bcrypt).
+    """
+    if throttle is None:
+        return await security.validate_bootstrap_key(db, api_key)
+
+    client_ip = request.client.host if request.client else None
+    keys = throttle.bucket_keys(client_ip, api_key)
+    retry_after = await throttle.retry_after(db, keys)
+    if retry_after is not None:
+        metrics.REGISTRATIONS.labels(outcome="throttled").inc()
+        _audit(request, "throttled", api_key=api_key)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed attempts, retry later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    db_key = await security.validate_bootstrap_key(db, api_key)
+    if db_key is None:
+        await throttle.record_failure(db, keys)
+    return db_key
+
+
 @registration_router.post(
     "/register",
     response_model=schemas.DeviceProvisionResponse,
     tags=["Device Provisioning"],
     summary="Public: Device registers itself using a bootstrap key.",
+    dependencies=[Depends(admission_control), Depends(track_in_flight)],
 )
 async def register_device(
     registration_data: schemas.DeviceRegistrationRequest,
+    request: Request,
     x_api_key: str = Depends(api_key_header),
     db: AsyncSession = Depends(get_db),
     settings: Settings = Depends(get_settings),
+    throttle: FailureThrottle | None = Depends(get_failure_throttle),
 ):
     """
     This public endpoint is hit by a device on its first boot.
@@ -38,16 +151,23 @@ async def register_device(
     `x-api-key` header and its desired `device_id` in the body.
 
     If the key is valid, the service will:
-    1.  Provision a new X.509 certificate from AWS IoT Core.
+    1.  Provision a new X.509 certificate from AWS IoT Core, in the region
+        mapped to the key's group (`KEY_GROUP_REGIONS`).
     2.  Create an IoT Thing with the `device_id`.
     3.  Attach the certificate to the Thing.
     4.  Attach the default IoT Policy to the certificate.
     5.  Return the new certificate and private key to the device.
+
+    The key that onboarded the device is recorded with its certificate, so
+    the device can be revoked in bulk with the key.
     """
 
-    db_key = await security.validate_bootstrap_key(db, x_api_key)
+    bind_device_id(registration_data.device_id)
+    db_key = await _authenticate(request, db, x_api_key, throttle)
 
     if not db_key:
+        metrics.REGISTRATIONS.labels(outcome="invalid_key").inc()
+        _audit(request, "invalid_key", api_key=x_api_key)
         logger.warning(
             "Device registration failed: invalid bootstrap key for device_id=%s",
             registration_data.device_id,
@@ -58,17 +178,289 @@ async def register_device(
 
     try:
         provision_data = await aws_iot_client.provision_device(
-            device_id=registration_data.device_id, policy_name=settings.IOT_POLICY_NAME
+            device_id=registration_data.device_id,
+            policy_name=settings.IOT_POLICY_NAME,
+            region=aws_iot_client.region_for_group(db_key.key_group),
+        )
+        logger.info("Device registered: device_id=%s", registration_data.device_id)
+    except Exception as e:
+        metrics.REGISTRATIONS.labels(outcome="provision_failed").inc()
+        _audit(request, "provision_failed", db_key)
+        logger.exception(f"Failed to provision device: {str(e)}")
+        # Catch potential AWS errors (e.g., Thing already exists, policy not found)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to provision device in AWS",
         )
+    metrics.REGISTRATIONS.labels(outcome="provisioned").inc()
+    _audit(
+        request, "provisioned", db_key, detail={"certificate_id": provision_data["certificate_id"]}
+    )
+    await record_registrations(
+        db,
+        db_key,
+        [
+            (
+                registration_data.device_id,
+                provision_data["certificate_id"],
+                provision_data["region"],
+            )
+        ],
+    )
+    await mark_key_used(db, db_key)
+    await mark_changed(db, DEVICES)
+    return provision_data
+
+
+@registration_router.post(
+    "/register/csr",
+    response_model=schemas.DeviceCsrProvisionResponse,
+    tags=["Device Provisioning"],
+    summary="Public: Device registers itself with its own CSR using a bootstrap key.",
+    dependencies=[Depends(admission_control), Depends(track_in_flight)],
+)
+async def register_device_csr(
+    registration_data: schemas.DeviceCsrRegistrationRequest,
+    request: Request,
+    x_api_key: str = Depends(api_key_header),
+    db: AsyncSession = Depends(get_db),
+    settings: Settings = Depends(get_settings),
+    throttle: FailureThrottle | None = Depends(get_failure_throttle),
+):
+    """
+    Variant of `/register` for devices that generate their own key pair:
+    the private key never leaves the device, only its CSR is sent.
+
+    With `CSR_SIGNING_MODE=local` the CSR is signed by the service's CA in a
+    worker process pool and the certificate is registered with AWS IoT;
+    otherwise AWS signs it (`create_certificate_from_csr`). The Thing and
+    policy are then set up as for `/register`. In both modes the CSR must
+    name the `device_id` as its common name (400 otherwise).
+    """
+    bind_device_id(registration_data.device_id)
+    db_key = await _authenticate(request, db, x_api_key, throttle)
+
+    if not db_key:
+        metrics.REGISTRATIONS.labels(outcome="invalid_key").inc()
+        _audit(request, "invalid_key", api_key=x_api_key)
         logger.warning(
             "Device registration failed: invalid bootstrap key for device_id=%s",
             registration_data.device_id,
         )
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired bootstrap key."
+        )
+
+    certificate_pem = ca_certificate_pem = None
+    try:
+        if settings.CSR_SIGNING_MODE == "local":
+            local_ca = get_local_ca()
+            certificate_pem = await local_ca.sign(
+                registration_data.csr, registration_data.device_id
+            )
+            ca_certificate_pem = local_ca.ca_certificate_pem
+        else:
+            # AWS answers a malformed CSR like a failure of its own: check it first
+            validate_csr(registration_data.csr.encode(), registration_data.device_id)
+    except InvalidCsrError as e:
+        metrics.REGISTRATIONS.labels(outcome="invalid_csr").inc()
+        _audit(request, "invalid_csr", db_key, detail={"error": str(e)})
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except SigningUnavailableError as e:
+        metrics.REGISTRATIONS.labels(outcome="provision_failed").inc()
+        _audit(request, "provision_failed", db_key, detail={"error": str(e)})
+        logger.exception(f"Failed to sign CSR: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
+
+    try:
+        provision_data = await aws_iot_client.provision_device_from_csr(
+            device_id=registration_data.device_id,
+            policy_name=settings.IOT_POLICY_NAME,
+            csr_pem=registration_data.csr,
+            region=aws_iot_client.region_for_group(db_key.key_group),
+            certificate_pem=certificate_pem,
+            ca_certificate_pem=ca_certificate_pem,
+        )
+        logger.info("Device registered from CSR: device_id=%s", registration_data.device_id)
     except Exception as e:
-        logger.exception(f"Failed to provision device: {str(e)}")
-        # Catch potential AWS errors (e.g., Thing already exists, policy not found)
+        metrics.REGISTRATIONS.labels(outcome="provision_failed").inc()
+        _audit(request, "provision_failed", db_key)
+        logger.exception(f"Failed to provision device from CSR: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to provision device in AWS",
         )
+    metrics.REGISTRATIONS.labels(outcome="provisioned").inc()
+    _audit(
+        request, "provisioned", db_key, detail={"certificate_id": provision_data["certificate_id"]}
+    )
+    await record_registrations(
+        db,
+        db_key,
+        [
+            (
+                registration_data.device_id,
+                provision_data["certificate_id"],
+                provision_data["region"],
+            )
+        ],
+    )
+    await mark_key_used(db, db_key)
+    await mark_changed(db, DEVICES)
     return provision_data
+
+
+async def _provision_batch(
+    request: Request,
+    db: AsyncSession,
+    db_key: models.BootstrapKey,
+    devices: list[schemas.DeviceRegistrationRequest],
+    policy_name: str,
+    region: str,
+    concurrency: int,
+) -> AsyncIterator[schemas.DeviceBatchRegistrationResult]:
+    """
+    Provisions the devices with at most `concurrency` AWS chains in flight,
+    yielding each result as soon as it completes.
+
+    Each provisioned device is recorded and committed before its result is
+    yielded. If the client goes away, devices still waiting for a slot are
+    dropped, but chains already started run to completion and are recorded,
+    so every certificate handed out keeps its provenance.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # The request session serves one task at a time
+    db_lock = asyncio.Lock()
+    started: list[asyncio.Future] = []
+
+    def failed(device_id: str, error: str) -> schemas.DeviceBatchRegistrationResult:
+        metrics.REGISTRATIONS.labels(outcome="provision_failed").inc()
+        _audit(request, "provision_failed", db_key, device_id=device_id)
+        return schemas.DeviceBatchRegistrationResult(
+            device_id=device_id, status="failed", error=error
+        )
+
+    async def provision(device_id: str) -> schemas.DeviceBatchRegistrationResult:
+        try:
+            provision_data = await aws_iot_client.provision_device(
+                device_id=device_id, policy_name=policy_name, region=region
+            )
+        except Exception as e:
+            logger.exception(f"Failed to provision device {device_id}: {str(e)}")
+            return failed(device_id, "Failed to provision device in AWS")
+        certificate_id = provision_data["certificate_id"]
+        try:
+            async with db_lock:
+                await record_registrations(
+                    db, db_key, [(device_id, certificate_id, provision_data["region"])]
+                )
+                await mark_key_used(db, db_key)
+                await mark_changed(db, DEVICES)
+        except Exception as e:
+            async with db_lock:
+                await db.rollback()
+            logger.exception(
+                f"Failed to record device {device_id} with certificate {certificate_id}: {str(e)}"
+            )
+            return failed(device_id, "Failed to record device")
+        metrics.REGISTRATIONS.labels(outcome="provisioned").inc()
+        _audit(
+            request,
+            "provisioned",
+            db_key,
+            device_id=device_id,
+            detail={"certificate_id": certificate_id},
+        )
+        return schemas.DeviceBatchRegistrationResult(
+            device_id=device_id,
+            status="provisioned",
+            credentials=schemas.DeviceProvisionResponse.model_validate(provision_data),
+        )
+
+    async def provision_one(device_id: str) -> schemas.DeviceBatchRegistrationResult:
+        # Each task runs in its own copy of the context
+        bind_device_id(device_id)
+        async with semaphore:
+            chain = asyncio.ensure_future(provision(device_id))
+            started.append(chain)
+            return await asyncio.shield(chain)
+
+    tasks = [asyncio.create_task(provision_one(device.device_id)) for device in devices]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client went away: stop provisioning what has not started yet
+        for task in tasks:
+            task.cancel()
+        # and keep the session open until the started chains are recorded
+        with anyio.CancelScope(shield=True):
+            await asyncio.gather(*started, return_exceptions=True)
+
+
+@registration_router.post(
+    "/register/batch",
+    response_class=StreamingResponse,
+    tags=["Device Provisioning"],
+    summary="Public: Gateway registers several child devices using one bootstrap key.",
+    dependencies=[Depends(batch_admission_control), Depends(track_in_flight)],
+)
+async def register_device_batch(
+    registration_data: schemas.DeviceBatchRegistrationRequest,
+    request: Request,
+    x_api_key: str = Depends(api_key_header),
+    db: AsyncSession = Depends(get_db),
+    settings: Settings = Depends(get_settings),
+    throttle: FailureThrottle | None = Depends(get_failure_throttle),
+):
+    """
+    Batch variant of `/register` for gateways onboarding their child sensors.
+
+    The bootstrap key is validated once for the whole batch, then the devices
+    are provisioned concurrently (bounded by `REGISTRATION_BATCH_CONCURRENCY`).
+    The response is NDJSON with one `DeviceBatchRegistrationResult` line per
+    device, streamed in completion order; a failed device does not fail the batch.
+    Each device is recorded against the key before its line is sent.
+    """
+    max_devices = settings.REGISTRATION_BATCH_MAX_DEVICES
+    if len(registration_data.devices) > max_devices:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may contain at most {max_devices} devices.",
+        )
+
+    db_key = await _authenticate(request, db, x_api_key, throttle)
+
+    if not db_key:
+        metrics.REGISTRATIONS.labels(outcome="invalid_key").inc(len(registration_data.devices))
+        _audit(
+            request,
+            "invalid_key",
+            api_key=x_api_key,
+            detail={"device_ids": [device.device_id for device in registration_data.devices]},
+        )
+        logger.warning(
+            "Batch registration failed: invalid bootstrap key for %d devices",
+            len(registration_data.devices),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired bootstrap key."
+        )
+
+    async def stream_results() -> AsyncIterator[str]:
+        async for result in _provision_batch(
+            request,
+            db,
+            db_key,
+            registration_data.devices,
+            settings.IOT_POLICY_NAME,
+            aws_iot_client.region_for_group(db_key.key_group),
+            settings.REGISTRATION_BATCH_CONCURRENCY,
+        ):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
@@ -1,6 +1,11 @@
 import logging
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Response, status
+from fastapi.responses import JSONResponse
+
+from app.core import metrics
+from app.core.health import DOWN, HealthProber, get_health_prober
+from app.core.schemas import schemas
 
 logger = logging.getLogger(__name__)
 
@@ -13,5 +18,32 @@ async def ping() -> dict[str, str]:
     Health check endpoint do not remove
     used by the load balance to check app is alive
     """
-    logger.debug("Pong!")
     return {"ping": "pong"}
+
+
+@base_router.get(
+    "/ready",
+    response_model=schemas.ReadinessResponse,
+    responses={503: {"model": schemas.ReadinessResponse}},
+)
+async def ready(prober: HealthProber = Depends(get_health_prober)):
+    """
+    Readiness check: the last cached probe of Postgres and AWS IoT.
+    "degraded" still answers 200, "down" (or no recent probe) answers 503.
+    """
+    snapshot = schemas.ReadinessResponse.model_validate(prober.snapshot())
+    if snapshot.status == DOWN:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=snapshot.model_dump(mode="json"),
+        )
+    return snapshot
+
+
+@base_router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    """
+    Prometheus scrape endpoint.
+    """
+    content, content_type = metrics.render_latest()
+    return Response(content=content, media_type=content_type)
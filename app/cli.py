@@ -0,0 +1,126 @@
+"""
+Operational commands, e.g. `python -m app.cli rebuild-key-stats`.
+"""
+
+import argparse
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+
+from app.core.cert_reconciler import run_reconcile_job
+from app.core.crud.device_registrations import create_revocation_job
+from app.core.crud.key_group_stats import rebuild_stats
+from app.core.crud.key_import import import_keys
+from app.core.crud.reconcile_jobs import create_reconcile_job
+from app.core.db.database import SessionLocal, engine
+from app.core.key_retention import run_key_retention
+from app.core.revocation import run_revocation_job
+from app.core.schemas import schemas
+from app.core.settings import get_settings
+
+
+async def _rebuild_key_stats(args: argparse.Namespace) -> None:
+    async with SessionLocal() as db:
+        buckets = await rebuild_stats(db)
+    print(f"Rebuilt key_group_stats: {buckets} buckets")
+
+
+async def _read_lines(path: str) -> AsyncIterator[str]:
+    with open(path, encoding="utf-8", newline="") as source:
+        for line in source:
+            yield line.rstrip("\r\n")
+
+
+async def _import_keys(args: argparse.Namespace) -> None:
+    import_format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    async with SessionLocal() as db:
+        report = await import_keys(db, _read_lines(args.path), import_format)
+    print(report.model_dump_json(indent=2))
+
+
+async def _revoke_devices(args: argparse.Namespace) -> None:
+    async with SessionLocal() as db:
+        job_id = args.job
+        if job_id is None:
+            job = await create_revocation_job(db, args.key_id, args.group)
+            job_id = job.id
+            print(f"Created revocation job {job_id}")
+        job = await run_revocation_job(db, job_id, get_settings())
+        print(schemas.RevocationJobInfo.model_validate(job).model_dump_json(indent=2))
+
+
+async def _maintain_key_partitions(args: argparse.Namespace) -> None:
+    async with SessionLocal() as db:
+        created, dropped = await run_key_retention(db, get_settings())
+    print(f"Created key partitions: {', '.join(m.strftime('%Y-%m') for m in created) or 'none'}")
+    print(f"Dropped key partitions: {', '.join(m.strftime('%Y-%m') for m in dropped) or 'none'}")
+
+
+async def _reconcile_certificates(args: argparse.Namespace) -> None:
+    async with SessionLocal() as db:
+        job = await create_reconcile_job(db, dry_run=not args.apply)
+        job = await run_reconcile_job(db, job.id, get_settings())
+        print(schemas.CertificateReconcileJobInfo.model_validate(job).model_dump_json(indent=2))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="onboarding-admin", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser(
+        "rebuild-key-stats", help="Recompute key_group_stats from bootstrap_keys."
+    )
+    rebuild.set_defaults(handler=_rebuild_key_stats)
+
+    import_keys_cmd = commands.add_parser(
+        "import-keys", help="Bulk import externally generated key hashes."
+    )
+    import_keys_cmd.add_argument("path", help="CSV (with header) or NDJSON file.")
+    import_keys_cmd.add_argument(
+        "--format", choices=["csv", "ndjson"], help="Defaults to the file extension."
+    )
+    import_keys_cmd.set_defaults(handler=_import_keys)
+
+    revoke = commands.add_parser(
+        "revoke-devices",
+        help="Revoke every device onboarded with a bootstrap key or key group.",
+    )
+    target = revoke.add_mutually_exclusive_group(required=True)
+    target.add_argument("--key-id", type=int, help="Bootstrap key id.")
+    target.add_argument("--group", help="Key group.")
+    target.add_argument("--job", type=int, help="Resume an existing revocation job.")
+    revoke.set_defaults(handler=_revoke_devices)
+
+    maintain = commands.add_parser(
+        "maintain-key-partitions",
+        help="Create upcoming bootstrap key partitions; archive and drop expired ones.",
+    )
+    maintain.set_defaults(handler=_maintain_key_partitions)
+
+    reconcile = commands.add_parser(
+        "reconcile-certificates",
+        help="Report (or with --apply, delete) orphaned and revoked certificates.",
+    )
+    reconcile.add_argument(
+        "--apply", action="store_true", help="Delete them; the default is a dry run."
+    )
+    reconcile.set_defaults(handler=_reconcile_certificates)
+
+    return parser
+
+
+async def _run(args: argparse.Namespace) -> None:
+    try:
+        await args.handler(args)
+    finally:
+        await engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = build_parser().parse_args(argv)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from app.core import metrics
+from app.core.settings import get_settings
+
+# Weight of the latest request in the moving average of the service time
+SERVICE_TIME_SMOOTHING = 0.1
+
+# Bounds of the Retry-After advertised to rejected clients, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 120
+
+
+class AdmissionRejectedError(Exception):
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    Weighted concurrency limiter with a bounded FIFO wait queue.
+
+    Requests hold as many slots as the work they run at once (one for a
+    single registration). At most `max_concurrency` slots are in use; up to
+    `max_queue` more wait, each request for at most `queue_timeout` seconds.
+    Requests that find the queue full or time out are rejected with a
+    Retry-After estimated from the backlog and the moving average of the
+    service time, so clients back off instead of piling up in the server.
+    """
+
+    def __init__(
+        self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        # (future, weight) in arrival order
+        self._waiters: deque[tuple[asyncio.Future, int]] = deque()
+        self._service_time = 1.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Slots waited for."""
+        return sum(weight for _, weight in self._waiters)
+
+    def retry_after(self) -> int:
+        backlog = self.in_flight + self.queue_depth
+        estimate = math.ceil(backlog / self.max_concurrency * self._service_time)
+        return min(max(estimate, MIN_RETRY_AFTER), MAX_RETRY_AFTER)
+
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        metrics.ADMISSION_REJECTED.labels(limiter=self.name, reason=reason).inc()
+        return AdmissionRejectedError(reason, self.retry_after())
+
+    async def _acquire(self, weight: int) -> None:
+        if self.in_flight + weight <= self.max_concurrency and not self._waiters:
+            self.in_flight += weight
+            return
+        if self.queue_depth + weight > self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, weight)
+        self._waiters.append(entry)
+        metrics.ADMISSION_QUEUE_DEPTH.labels(limiter=self.name).inc(weight)
+        try:
+            # The slots are handed over by _grant, in_flight already counts them
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we gave up: pass the slots on
+                self._release(weight)
+            else:
+                waiter.cancel()
+                self._waiters.remove(entry)
+                # The waiters behind may fit now
+                self._grant()
+            if isinstance(e, TimeoutError):
+                raise self._reject("queue_timeout") from None
+            raise
+        finally:
+            metrics.ADMISSION_QUEUE_DEPTH.labels(limiter=self.name).dec(weight)
+
+    def _grant(self) -> None:
+        """Admits waiters in arrival order while their slots are free."""
+        while self._waiters:
+            waiter, weight = self._waiters[0]
+            if self.in_flight + weight > self.max_concurrency:
+                return
+            self._waiters.popleft()
+            self.in_flight += weight
+            waiter.set_result(None)
+
+    def _release(self, weight: int) -> None:
+        self.in_flight -= weight
+        self._grant()
+
+    @asynccontextmanager
+    async def slot(self, weight: int = 1):
+        """
+        Holds `weight` slots (at most `max_concurrency`) for the duration of
+        the block; raises AdmissionRejectedError.
+        """
+        weight = min(weight, self.max_concurrency)
+        await self._acquire(weight)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._service_time += SERVICE_TIME_SMOOTHING * (elapsed - self._service_time)
+            self._release(weight)
+
+
+@lru_cache()
+def get_registration_limiter() -> AdmissionLimiter:
+    """
+    FastAPI dependency to get the limiter shared by the registration routes.
+    """
+    settings = get_settings()
+    return AdmissionLimiter(
+        "registration",
+        max_concurrency=settings.REGISTRATION_MAX_CONCURRENCY,
+        max_queue=settings.REGISTRATION_MAX_QUEUE,
+        queue_timeout=settings.REGISTRATION_QUEUE_TIMEOUT_S,
+    )
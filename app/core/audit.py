@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+from app.core import metrics
+from app.core.crud.audit_log import (
+    copy_records,
+    drop_partitions_before,
+    ensure_partitions,
+)
+from app.core.crud.partitions import add_months
+from app.core.db.database import SessionLocal
+from app.core.settings import Settings, get_settings
+from app.core.structured_logging import device_id_var, request_id_var
+
+logger = logging.getLogger(__name__)
+
+REGISTRATION = "registration"
+ADMIN = "admin"
+
+# Partitions kept ready ahead of the current month
+PARTITIONS_AHEAD = 2
+
+
+class AuditWriter:
+    """
+    Buffers audit records in memory and writes them in batches with COPY, so
+    recording one never waits on the database.
+
+    The buffer is flushed every `flush_interval` seconds, or as soon as it
+    holds `batch_size` records. When the database is unreachable it keeps at
+    most `max_buffer` records; newer ones are dropped and counted in
+    `audit_records_dropped_total`. Once a day the writer creates the coming
+    monthly partitions and drops those older than `retention_months`.
+    """
+
+    def __init__(
+        self, batch_size: int, flush_interval: float, max_buffer: int, retention_months: int
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.retention_months = retention_months
+        self._buffer: deque[tuple] = deque()
+        self._wakeup = asyncio.Event()
+        self._maintained_on: date | None = None
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AuditWriter":
+        return cls(
+            batch_size=settings.AUDIT_BATCH_SIZE,
+            flush_interval=settings.AUDIT_FLUSH_INTERVAL_S,
+            max_buffer=settings.AUDIT_MAX_BUFFER,
+            retention_months=settings.AUDIT_RETENTION_MONTHS,
+        )
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def record(
+        self,
+        category: str,
+        action: str,
+        outcome: str,
+        *,
+        key_id: int | None = None,
+        key_hint: str | None = None,
+        device_id: str | None = None,
+        client_ip: str | None = None,
+        detail: dict | None = None,
+    ) -> None:
+        """
+        Queues one record; never blocks nor raises. The request id and, unless
+        given, the device id come from the logging context.
+        """
+        if len(self._buffer) >= self.max_buffer:
+            metrics.AUDIT_RECORDS_DROPPED.inc()
+            return
+        self._buffer.append(
+            (
+                datetime.now(timezone.utc),
+                category,
+                action[:255],
+                outcome[:32],
+                key_id,
+                key_hint,
+                device_id if device_id is not None else device_id_var.get(),
+                client_ip,
+                request_id_var.get(),
+                json.dumps(detail) if detail is not None else None,
+            )
+        )
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def maintain_partitions(self, today: date) -> None:
+        month = today.replace(day=1)
+        async with SessionLocal() as db:
+            await ensure_partitions(db, month, PARTITIONS_AHEAD + 1)
+            dropped = await drop_partitions_before(db, add_months(month, -self.retention_months))
+        for expired in dropped:
+            logger.info("Dropped audit partition for %s", expired.strftime("%Y-%m"))
+        self._maintained_on = today
+
+    async def flush(self) -> int:
+        """Writes up to one batch; on failure the records go back to the buffer."""
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if not batch:
+            return 0
+        try:
+            async with SessionLocal() as db:
+                await copy_records(db, batch)
+                await db.commit()
+        except Exception:
+            self._buffer.extendleft(reversed(batch))
+            raise
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                today = datetime.now(timezone.utc).date()
+                if self._maintained_on != today:
+                    await self.maintain_partitions(today)
+                while await self.flush() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.exception(f"Failed to write audit records: {str(e)}")
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            while await self.flush():
+                pass
+        except Exception as e:
+            logger.exception(f"Lost {self.pending} audit records at shutdown: {str(e)}")
+
+
+@lru_cache()
+def get_audit_writer() -> AuditWriter:
+    """
+    FastAPI dependency to get the process-wide audit writer.
+    """
+    return AuditWriter.from_settings(get_settings())
@@ -1,101 +1,806 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections.abc import AsyncIterator
+from functools import lru_cache
+from typing import TypedDict
+
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
 
+from app.core import metrics
 from app.core.settings import get_settings
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Things requested per list_things page
+LIST_PAGE_SIZE = 250
+
+# IoT Jobs delivering rotated certificates are named after this prefix
+ROTATION_JOB_PREFIX = "rotate-"
+
+# Rotation job execution statuses meaning the device will not switch certificates
+ROTATION_JOB_FAILED_STATUSES = {"FAILED", "REJECTED", "TIMED_OUT", "CANCELED", "REMOVED"}
+
+# Fleet indexing: the registry index, and the errors meaning it is not enabled
+THING_INDEX_NAME = "AWS_Things"
+INDEX_UNAVAILABLE_ERRORS = {"ResourceNotFoundException", "IndexNotReadyException"}
+
+# register_thing errors caused by the template or its parameters: the steps
+# path may still succeed. Throttling and service errors are raised instead,
+# since retrying step by step would multiply the calls
+TEMPLATE_FALLBACK_ERRORS = {
+    "InvalidRequestException",
+    "ResourceRegistrationFailureException",
+    "ValidationException",
+}
+
+# Seconds before retrying fleet indexing in a region where it was unavailable
+INDEX_RECHECK_SECONDS = 300
+
+# Provisioning template creating the Thing and attaching certificate and policy
+PROVISIONING_TEMPLATE = {
+    "Parameters": {
+        "ThingName": {"Type": "String"},
+        "CertificateId": {"Type": "String"},
+        "PolicyName": {"Type": "String"},
+    },
+    "Resources": {
+        "thing": {
+            "Type": "AWS::IoT::Thing",
+            "Properties": {"ThingName": {"Ref": "ThingName"}},
+            "OverrideSettings": {
+                "AttributePayload": "MERGE",
+                "ThingTypeName": "REPLACE",
+                "ThingGroups": "DO_NOTHING",
+            },
+        },
+        "certificate": {
+            "Type": "AWS::IoT::Certificate",
+            "Properties": {"CertificateId": {"Ref": "CertificateId"}, "Status": "ACTIVE"},
+        },
+        "policy": {
+            "Type": "AWS::IoT::Policy",
+            "Properties": {"PolicyName": {"Ref": "PolicyName"}},
+        },
+    },
+}
+
+SEARCH_INDEX = "search_index"
+LIST_THINGS = "list_things"
+
+
+class InvalidDeviceQueryError(Exception):
+    pass
+
+
+class UnknownRegionError(ValueError):
+    pass
+
+
+class DeviceQuery(TypedDict):
+    name_prefix: str | None
+    attributes: dict[str, str]
+    connected: bool | None
+    thing_group: str | None
+
+
+class IotClientRegistry:
+    """
+    One boto3 IoT client per region, created on first use. Each client has
+    its own HTTP connection pool, sized for the worker threads calling it.
+    Only the configured regions are served, so a stray region cannot create
+    a client that listings and health probes never look at.
+    """
 
-# Use a global session and settings
+    def __init__(self, default_region: str, regions: list[str], max_pool_connections: int):
+        self.default_region = default_region
+        self.regions = list(dict.fromkeys([default_region, *regions]))
+        self._config = Config(max_pool_connections=max_pool_connections)
+        self._session = boto3.session.Session()
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, region: str | None = None):
+        region = region or self.default_region
+        if region not in self.regions:
+            raise UnknownRegionError(
+                f"Region {region!r} is not configured (AWS_REGION, AWS_REGIONS)"
+            )
+        with self._lock:
+            client = self._clients.get(region)
+            if client is None:
+                client = self._session.client("iot", region_name=region, config=self._config)
+                self._clients[region] = client
+            return client
+
+
+# Use a global registry and settings
 settings = get_settings()
-session = boto3.session.Session()
-iot_client = session.client("iot", region_name=settings.AWS_REGION)
+clients = IotClientRegistry(
+    settings.AWS_REGION, settings.AWS_REGIONS, settings.AWS_MAX_POOL_CONNECTIONS
+)
+iot_client = clients.get()
 
 
-async def provision_device(device_id: str, policy_name: str) -> dict:
+def region_for_group(key_group: str | None) -> str:
     """
-    Provisions a new device in AWS IoT Core.
-    1. Creates a new certificate.
-    2. Creates a new "Thing" (the device record).
-    3. Attaches the certificate to the Thing.
-    4. Attaches the operational policy to the certificate.
+    Region whose IoT endpoint serves devices of a key group
+    (`KEY_GROUP_REGIONS`, `AWS_REGION` for unmapped groups).
     """
-    print(f"Provisioning device: {device_id} with policy {policy_name}")
+    return settings.KEY_GROUP_REGIONS.get(key_group or "", settings.AWS_REGION)
 
-    # 1. Create Certificate
-    cert_response = iot_client.create_keys_and_certificate(setAsActive=True)
-    certificate_pem = cert_response["certificatePem"]
-    certificate_arn = cert_response["certificateArn"]
-    certificate_id = cert_response["certificateId"]
-    private_key = cert_response["keyPair"]["PrivateKey"]
 
-    print(f"Created certificate: {certificate_id}")
+def _error_label(error: Exception) -> str:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code", "ClientError")
+    return type(error).__name__
 
+
+async def _call(operation, **kwargs):
+    """
+    Runs a blocking boto3 operation in a worker thread so concurrent
+    provisioning does not stall the event loop (boto3 clients are thread safe).
+    Records its latency labelled with the outcome.
+    """
+    name = getattr(operation, "__name__", "unknown")
+    client_meta = getattr(getattr(operation, "__self__", None), "meta", None)
+    region = getattr(client_meta, "region_name", None) or "unknown"
+    error = "none"
+    start = time.perf_counter()
+    with tracer.start_as_current_span(
+        f"iot.{name}",
+        kind=trace.SpanKind.CLIENT,
+        attributes={
+            "rpc.system": "aws-api",
+            "rpc.service": "IoT",
+            "rpc.method": name,
+            "cloud.region": region,
+        },
+        record_exception=False,
+        set_status_on_exception=False,
+    ) as span:
+        try:
+            return await asyncio.to_thread(operation, **kwargs)
+        except Exception as e:
+            error = _error_label(e)
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, error))
+            raise
+        finally:
+            metrics.AWS_CALL_LATENCY.labels(operation=name, error=error).observe(
+                time.perf_counter() - start
+            )
+
+
+async def _attach_steps(
+    iot_client, device_id: str, policy_name: str, certificate_id: str, certificate_arn: str
+) -> tuple[str, str]:
+    """Creates (or reuses) the Thing and attaches certificate and policy, one call each."""
     # 2. Create Thing
     try:
-        thing_response = iot_client.create_thing(thingName=device_id)
+        thing_response = await _call(iot_client.create_thing, thingName=device_id)
         thing_name = thing_response["thingName"]
         thing_arn = thing_response["thingArn"]
-        print(f"Created thing: {thing_name}")
+        logger.info("Created thing: %s", thing_name)
     except iot_client.exceptions.ResourceAlreadyExistsException:
         # If Thing already exists, just get its details
-        print(f"Thing {device_id} already exists. Re-using.")
-        thing_response = iot_client.describe_thing(thingName=device_id)
+        logger.info("Thing %s already exists. Re-using.", device_id)
+        thing_response = await _call(iot_client.describe_thing, thingName=device_id)
         thing_name = thing_response["thingName"]
         thing_arn = thing_response["thingArn"]
 
     # 3. Attach Certificate to Thing
-    iot_client.attach_thing_principal(thingName=thing_name, principal=certificate_arn)
-    print(f"Attached certificate {certificate_id} to {thing_name}")
+    await _call(iot_client.attach_thing_principal, thingName=thing_name, principal=certificate_arn)
+    logger.info("Attached certificate %s to %s", certificate_id, thing_name)
 
     # 4. Attach Policy to Certificate
-    iot_client.attach_policy(policyName=policy_name, target=certificate_arn)
-    print(f"Attached policy {policy_name} to {certificate_id}")
+    await _call(iot_client.attach_policy, policyName=policy_name, target=certificate_arn)
+    logger.info("Attached policy %s to %s", policy_name, certificate_id)
+    return thing_name, thing_arn
+
+
+@lru_cache()
+def provisioning_template() -> str:
+    """Template body for template mode: `IOT_PROVISIONING_TEMPLATE_FILE` or the built-in one."""
+    if settings.IOT_PROVISIONING_TEMPLATE_FILE:
+        with open(settings.IOT_PROVISIONING_TEMPLATE_FILE, encoding="utf-8") as f:
+            return f.read()
+    return json.dumps(PROVISIONING_TEMPLATE)
+
 
+async def _attach_with_template(
+    iot_client, device_id: str, policy_name: str, certificate_id: str
+) -> tuple[str, str]:
+    """Creates the Thing and both attachments in one `register_thing` call."""
+    response = await _call(
+        iot_client.register_thing,
+        templateBody=provisioning_template(),
+        parameters={
+            "ThingName": device_id,
+            "CertificateId": certificate_id,
+            "PolicyName": policy_name,
+        },
+    )
+    logger.info("Registered thing %s with certificate %s", device_id, certificate_id)
+    return device_id, response["resourceArns"]["thing"]
+
+
+async def _attach_device(
+    iot_client, device_id: str, policy_name: str, certificate_id: str, certificate_arn: str
+) -> tuple[str, str]:
+    """
+    Binds a certificate to its Thing and policy using `IOT_PROVISIONING_MODE`.
+    If the template is rejected (`TEMPLATE_FALLBACK_ERRORS`), the step-by-step
+    path finishes the job with the same certificate (every step is
+    idempotent), so none is orphaned.
+    """
+    if settings.IOT_PROVISIONING_MODE == "template":
+        try:
+            return await _attach_with_template(iot_client, device_id, policy_name, certificate_id)
+        except ClientError as e:
+            if _error_label(e) not in TEMPLATE_FALLBACK_ERRORS:
+                raise
+            logger.warning(
+                "register_thing failed for %s (%s), provisioning step by step",
+                device_id,
+                _error_label(e),
+            )
+    return await _attach_steps(iot_client, device_id, policy_name, certificate_id, certificate_arn)
+
+
+async def provision_device(device_id: str, policy_name: str, region: str | None = None) -> dict:
+    """
+    Provisions a new device in AWS IoT Core, in `region` (default `AWS_REGION`).
+    1. Creates a new certificate.
+    2. Creates a new "Thing" (the device record).
+    3. Attaches the certificate to the Thing.
+    4. Attaches the operational policy to the certificate.
+
+    In "template" provisioning mode, steps 2 to 4 are a single server-side
+    `register_thing` call.
+    """
+    iot_client = clients.get(region)
+    logger.info(
+        "Provisioning device: %s with policy %s in %s",
+        device_id,
+        policy_name,
+        iot_client.meta.region_name,
+    )
+
+    # 1. Create Certificate
+    cert_response = await _call(iot_client.create_keys_and_certificate, setAsActive=True)
+    certificate_id = cert_response["certificateId"]
+    logger.info("Created certificate: %s", certificate_id)
+
+    thing_name, thing_arn = await _attach_device(
+        iot_client, device_id, policy_name, certificate_id, cert_response["certificateArn"]
+    )
+
+    # Keys match schemas.DeviceProvisionResponse
     return {
-        "certificatePem": certificate_pem,
-        "privateKey": private_key,
-        "certificateId": certificate_id,
-        "thingName": thing_name,
-        "thingArn": thing_arn,
+        "certificate_pem": cert_response["certificatePem"],
+        "private_key": cert_response["keyPair"]["PrivateKey"],
+        "certificate_id": certificate_id,
+        "thing_name": thing_name,
+        "thing_arn": thing_arn,
+        "region": iot_client.meta.region_name,
     }
 
 
-async def list_provisioned_devices() -> list[dict]:
+async def provision_device_from_csr(
+    device_id: str,
+    policy_name: str,
+    csr_pem: str,
+    region: str | None = None,
+    certificate_pem: str | None = None,
+    ca_certificate_pem: str | None = None,
+) -> dict:
     """
-    Lists all Things (devices) registered in AWS IoT Core.
+    Provisions a device that keeps its private key: the certificate comes
+    from the device's CSR, either signed by AWS (`create_certificate_from_csr`)
+    or, when `certificate_pem` is given, already signed by our local CA and
+    only registered with IoT. Then binds it like `provision_device`.
     """
-    things = []
-    paginator = iot_client.get_paginator("list_things")
-    for page in paginator.paginate():
-        for thing in page["things"]:
-            things.append(
-                {
-                    "thing_name": thing["thingName"],
-                    "thing_arn": thing["thingArn"],
-                    "attributes": thing.get("attributes", {}),
-                }
-            )
-    return things
+    iot_client = clients.get(region)
+    if certificate_pem is None:
+        cert_response = await _call(
+            iot_client.create_certificate_from_csr,
+            certificateSigningRequest=csr_pem,
+            setAsActive=True,
+        )
+        certificate_pem = cert_response["certificatePem"]
+    else:
+        cert_response = await _call(
+            iot_client.register_certificate,
+            certificatePem=certificate_pem,
+            caCertificatePem=ca_certificate_pem,
+            status="ACTIVE",
+        )
+    certificate_id = cert_response["certificateId"]
+    logger.info("Created certificate from CSR: %s", certificate_id)
+
+    thing_name, thing_arn = await _attach_device(
+        iot_client, device_id, policy_name, certificate_id, cert_response["certificateArn"]
+    )
 
+    # Keys match schemas.DeviceCsrProvisionResponse
+    return {
+        "certificate_pem": certificate_pem,
+        "certificate_id": certificate_id,
+        "thing_name": thing_name,
+        "thing_arn": thing_arn,
+        "region": iot_client.meta.region_name,
+    }
 
-async def revoke_device_certificate(certificate_id: str) -> None:
+
+async def check_reachability(region: str | None = None) -> None:
     """
-    Revokes a device's certificate by setting its status to REVOKED.
-    The ALB's mTLS listener must have revocation checking enabled for this to work.
+    Cheapest authenticated IoT call, used by the readiness prober.
+    """
+    await _call(clients.get(region).describe_endpoint, endpointType="iot:Data-ATS")
+
+
+async def _list_region_pages(region: str) -> AsyncIterator[list[dict]]:
+    iot_client = clients.get(region)
+    kwargs = {"maxResults": LIST_PAGE_SIZE}
+    while True:
+        page = await _call(iot_client.list_things, **kwargs)
+        yield [
+            {
+                "thing_name": thing["thingName"],
+                "thing_arn": thing["thingArn"],
+                "attributes": thing.get("attributes", {}),
+                "region": region,
+            }
+            for thing in page["things"]
+        ]
+        if not page.get("nextToken"):
+            return
+        kwargs["nextToken"] = page["nextToken"]
+
+
+async def iter_provisioned_devices() -> AsyncIterator[dict]:
+    """
+    Lists the Things (devices) of every configured region. Regions are paged
+    concurrently and devices are yielded page by page as they arrive, so the
+    slowest region does not hold back the others. Fails if any region fails.
+    """
+    pages: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def list_region(region: str) -> None:
+        try:
+            async for page in _list_region_pages(region):
+                await pages.put(page)
+        except Exception as e:
+            await pages.put(e)
+        finally:
+            await pages.put(done)
+
+    tasks = [asyncio.create_task(list_region(region)) for region in clients.regions]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            page = await pages.get()
+            if page is done:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                for device in page:
+                    yield device
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _escape_query(value: str) -> str:
+    """Escapes fleet indexing query syntax characters in a literal term."""
+    return re.sub(r"([^A-Za-z0-9_.])", r"\\\1", value)
+
+
+def build_search_query(query: DeviceQuery) -> str:
+    """Translates device filters into a fleet indexing query string."""
+    terms = []
+    if query["name_prefix"]:
+        terms.append(f"thingName:{_escape_query(query['name_prefix'])}*")
+    for name, value in query["attributes"].items():
+        terms.append(f"attributes.{_escape_query(name)}:{_escape_query(value)}")
+    if query["connected"] is not None:
+        terms.append(f"connectivity.connected:{str(query['connected']).lower()}")
+    if query["thing_group"]:
+        terms.append(f"thingGroupNames:{_escape_query(query['thing_group'])}")
+    return " AND ".join(terms) or "thingName:*"
+
+
+def _query_hash(query: DeviceQuery) -> str:
+    """Binds a page token to the filters it was issued for."""
+    return hashlib.sha256(json.dumps(query, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _encode_page_token(query: DeviceQuery, state: dict[str, dict]) -> str | None:
+    if not state:
+        return None
+    token = {"query": _query_hash(query), "regions": state}
+    return base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+
+def _decode_page_token(token: str, query: DeviceQuery) -> dict[str, dict]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, ValueError) as e:
+        raise InvalidDeviceQueryError("Invalid next_token") from e
+    if not isinstance(payload, dict):
+        raise InvalidDeviceQueryError("Invalid next_token")
+    if payload.get("query") != _query_hash(query):
+        raise InvalidDeviceQueryError("next_token was issued for other filters")
+    state = payload.get("regions")
+    if not isinstance(state, dict) or not state or not set(state) <= set(clients.regions):
+        raise InvalidDeviceQueryError("Invalid next_token")
+    for cursor in state.values():
+        valid = (
+            isinstance(cursor, dict)
+            and cursor.get("path") in (SEARCH_INDEX, LIST_THINGS)
+            and isinstance(cursor.get("token"), str)
+            and cursor["token"]
+        )
+        if not valid:
+            raise InvalidDeviceQueryError("Invalid next_token")
+    return state
+
+
+# region -> monotonic time fleet indexing was found unavailable
+_index_unavailable: dict[str, float] = {}
+
+
+def _index_available(region: str) -> bool:
+    since = _index_unavailable.get(region)
+    return since is None or time.monotonic() - since > INDEX_RECHECK_SECONDS
+
+
+async def _search_region(
+    region: str, query: DeviceQuery, page_size: int, token: str | None
+) -> tuple[list[dict], str | None]:
+    page = await _call(
+        clients.get(region).search_index,
+        indexName=THING_INDEX_NAME,
+        queryString=build_search_query(query),
+        maxResults=page_size,
+        **({"nextToken": token} if token else {}),
+    )
+    devices = [
+        {
+            "thing_name": thing["thingName"],
+            "thing_arn": None,
+            "attributes": thing.get("attributes", {}),
+            "region": region,
+            "connected": thing.get("connectivity", {}).get("connected"),
+        }
+        for thing in page.get("things", [])
+    ]
+    return devices, page.get("nextToken")
+
+
+async def _list_things_region(
+    region: str, query: DeviceQuery, page_size: int, token: str | None
+) -> tuple[list[dict], str | None]:
+    """
+    Fallback without fleet indexing: list_things filters on one attribute,
+    the name prefix and other attributes are applied here, page by page.
+    """
+    if query["connected"] is not None or query["thing_group"]:
+        raise InvalidDeviceQueryError(
+            f"Filtering on connectivity or thing group needs fleet indexing in {region}"
+        )
+    kwargs = {"maxResults": page_size}
+    attributes = list(query["attributes"].items())
+    if attributes:
+        kwargs["attributeName"], kwargs["attributeValue"] = attributes[0]
+    if token:
+        kwargs["nextToken"] = token
+    page = await _call(clients.get(region).list_things, **kwargs)
+    devices = [
+        {
+            "thing_name": thing["thingName"],
+            "thing_arn": thing["thingArn"],
+            "attributes": thing.get("attributes", {}),
+            "region": region,
+        }
+        for thing in page["things"]
+        if thing["thingName"].startswith(query["name_prefix"] or "")
+        and all(thing.get("attributes", {}).get(k) == v for k, v in attributes[1:])
+    ]
+    return devices, page.get("nextToken")
+
+
+async def _query_region(
+    region: str, query: DeviceQuery, page_size: int, cursor: dict | None
+) -> tuple[list[dict], dict | None, str, bool]:
+    """One page of a region: devices, next cursor, path, and whether it was cut short."""
+    path = cursor["path"] if cursor else (SEARCH_INDEX if _index_available(region) else None)
+    token = cursor["token"] if cursor else None
+    if path == SEARCH_INDEX:
+        try:
+            devices, token = await _search_region(region, query, page_size, token)
+        except ClientError as e:
+            if _error_label(e) not in INDEX_UNAVAILABLE_ERRORS:
+                raise
+            _index_unavailable[region] = time.monotonic()
+            if cursor:
+                # Restarting with list_things would repeat the pages already returned
+                logger.warning("Fleet indexing lost in %s mid-pagination, ending it", region)
+                return [], None, SEARCH_INDEX, True
+            logger.warning("Fleet indexing unavailable in %s, using list_things", region)
+            path, token = None, None
+        else:
+            _index_unavailable.pop(region, None)
+    if path != SEARCH_INDEX:
+        path = LIST_THINGS
+        devices, token = await _list_things_region(region, query, page_size, token)
+    return devices, ({"path": path, "token": token} if token else None), path, False
+
+
+async def query_devices(
+    query: DeviceQuery, page_size: int, next_token: str | None = None
+) -> tuple[list[dict], str | None, str, list[str]]:
+    """
+    Server-side filtered device listing: one page of up to `page_size`
+    devices per region, all regions queried concurrently.
+
+    Each region answers from its fleet index (`search_index`) or, when
+    indexing is not enabled there, from `list_things`. Returns the devices,
+    the next token (per-region cursors bound to `query`, opaque to clients),
+    the path that answered ("search_index", "list_things" or "mixed") and
+    the regions cut short. A region whose fleet index disappears
+    mid-pagination ends there rather than restarting from its first page,
+    and is reported as cut short. A token replayed with other filters
+    raises InvalidDeviceQueryError.
+    """
+    if next_token:
+        cursors = _decode_page_token(next_token, query)
+    else:
+        cursors = {region: None for region in clients.regions}
+    pages = await asyncio.gather(
+        *(_query_region(region, query, page_size, cursor) for region, cursor in cursors.items())
+    )
+    devices, next_cursors, paths, truncated = [], {}, set(), []
+    for region, (region_devices, cursor, path, cut_short) in zip(cursors, pages):
+        devices.extend(region_devices)
+        paths.add(path)
+        if cursor is not None:
+            next_cursors[region] = cursor
+        if cut_short:
+            truncated.append(region)
+    path = paths.pop() if len(paths) == 1 else "mixed"
+    return devices, _encode_page_token(query, next_cursors), path, truncated
+
+
+def rotation_job_id(certificate_id: str) -> str:
+    return f"{ROTATION_JOB_PREFIX}{certificate_id[:32]}"
+
+
+async def issue_replacement_certificate(
+    device_id: str, policy_name: str, region: str | None = None
+) -> dict:
+    """
+    Issues a replacement certificate for an existing device and binds it to
+    its Thing and policy next to the current one, so both work during the
+    rotation grace period. The credentials are only returned: the caller
+    records the certificate, then hands them to `deliver_replacement_certificate`.
+    If binding fails, the new certificate is deleted rather than left ACTIVE.
+    """
+    iot_client = clients.get(region)
+    cert_response = await _call(iot_client.create_keys_and_certificate, setAsActive=True)
+    certificate_id = cert_response["certificateId"]
+    region_name = iot_client.meta.region_name
+    try:
+        thing_name, thing_arn = await _attach_device(
+            iot_client, device_id, policy_name, certificate_id, cert_response["certificateArn"]
+        )
+    except Exception:
+        await discard_replacement_certificate(certificate_id, region_name)
+        raise
+    logger.info("Issued replacement certificate %s for %s", certificate_id, device_id)
+    return {
+        "certificate_id": certificate_id,
+        "certificate_pem": cert_response["certificatePem"],
+        "private_key": cert_response["keyPair"]["PrivateKey"],
+        "thing_name": thing_name,
+        "thing_arn": thing_arn,
+        "region": region_name,
+    }
+
+
+async def deliver_replacement_certificate(certificate: dict) -> None:
+    """
+    Sends credentials from `issue_replacement_certificate` to the device
+    through an IoT Job targeting its Thing, over the connection of its
+    current certificate. The job is deleted by `delete_rotation_job` once the
+    device reports the switch, so the private key does not outlive it.
+    """
+    iot_client = clients.get(certificate["region"])
+    await _call(
+        iot_client.create_job,
+        jobId=rotation_job_id(certificate["certificate_id"]),
+        targets=[certificate["thing_arn"]],
+        document=json.dumps(
+            {
+                "operation": "rotate-certificate",
+                "certificateId": certificate["certificate_id"],
+                "certificatePem": certificate["certificate_pem"],
+                "privateKey": certificate["private_key"],
+            }
+        ),
+    )
+
+
+async def rotation_job_exists(certificate_id: str, region: str | None = None) -> bool:
+    """Whether the job delivering `certificate_id` was created."""
+    iot_client = clients.get(region)
+    try:
+        await _call(iot_client.describe_job, jobId=rotation_job_id(certificate_id))
+    except ClientError as e:
+        if _error_label(e) != "ResourceNotFoundException":
+            raise
+        return False
+    return True
+
+
+async def rotation_job_status(
+    certificate_id: str, thing_name: str, region: str | None = None
+) -> str:
+    """
+    Status of the rotation job's execution on the device's Thing (QUEUED,
+    IN_PROGRESS, SUCCEEDED, FAILED...); "REMOVED" when it no longer exists.
     """
-    print(f"Revoking certificate: {certificate_id}")
-    iot_client.update_certificate(certificateId=certificate_id, newStatus="REVOKED")
-    # Note: You must also detach the principal from the thing
-    # and detach policies if you want a full cleanup.
-    # For now, REVOKED is enough to block access.
+    iot_client = clients.get(region)
+    try:
+        response = await _call(
+            iot_client.describe_job_execution,
+            jobId=rotation_job_id(certificate_id),
+            thingName=thing_name,
+        )
+    except ClientError as e:
+        if _error_label(e) != "ResourceNotFoundException":
+            raise
+        return "REMOVED"
+    return response["execution"]["status"]
+
 
-    principals_response = iot_client.list_thing_principals(
-        thingName=iot_client.describe_certificate(certificateId=certificate_id)[
-            "certificateDescription"
-        ]["certificateArn"].split("/")[-1]  # This is a bit of a hack to get the thing name
+async def delete_rotation_job(certificate_id: str, region: str | None = None) -> None:
+    """Deletes a rotation job, and the private key in its document, if it exists."""
+    iot_client = clients.get(region)
+    try:
+        await _call(iot_client.delete_job, jobId=rotation_job_id(certificate_id), force=True)
+    except ClientError as e:
+        if _error_label(e) != "ResourceNotFoundException":
+            raise
+    logger.info("Deleted rotation job for %s", certificate_id)
+
+
+async def discard_replacement_certificate(certificate_id: str, region: str | None = None) -> None:
+    """
+    Undoes `issue_replacement_certificate` for a rotation that failed before
+    reaching the device: deletes its job if one was created, then detaches,
+    deactivates and deletes the new certificate.
+    """
+    iot_client = clients.get(region)
+    await delete_rotation_job(certificate_id, region)
+    try:
+        description = await _call(iot_client.describe_certificate, certificateId=certificate_id)
+    except ClientError as e:
+        if _error_label(e) != "ResourceNotFoundException":
+            raise
+        return
+    certificate_arn = description["certificateDescription"]["certificateArn"]
+    await delete_certificate(
+        {"certificate_id": certificate_id, "certificate_arn": certificate_arn, "status": "ACTIVE"},
+        await certificate_attachments(certificate_arn, region),
+        region,
     )
 
-    # Detach from all things
-    for principal_arn in principals_response["principals"]:
-        thing_name = iot_client.list_principal_things(principal=principal_arn)["things"][0]
-        iot_client.detach_thing_principal(thingName=thing_name, principal=principal_arn)
-        print(f"Detached {certificate_id} from {thing_name}")
 
-    return None
+async def _retire_certificate(iot_client, certificate_id: str, new_status: str) -> None:
+    """Sets the certificate status, then detaches it from the Things it is attached to."""
+    description = await _call(iot_client.describe_certificate, certificateId=certificate_id)
+    certificate_arn = description["certificateDescription"]["certificateArn"]
+    await _call(iot_client.update_certificate, certificateId=certificate_id, newStatus=new_status)
+
+    # Policies stay attached: an inactive certificate cannot use them anyway
+    things = await _call(iot_client.list_principal_things, principal=certificate_arn)
+    for thing_name in things["things"]:
+        await _call(
+            iot_client.detach_thing_principal, thingName=thing_name, principal=certificate_arn
+        )
+        logger.info("Detached %s from %s", certificate_id, thing_name)
+
+
+async def deactivate_certificate(certificate_id: str, region: str | None = None) -> None:
+    """
+    Deactivates a certificate replaced by a rotation. Unlike a revocation it
+    can be reactivated if a device turns out not to have switched over.
+    """
+    logger.info("Deactivating certificate: %s", certificate_id)
+    await _retire_certificate(clients.get(region), certificate_id, "INACTIVE")
+
+
+async def revoke_device_certificate(certificate_id: str, region: str | None = None) -> None:
+    """
+    Revokes a device's certificate by setting its status to REVOKED, then
+    detaches it from the Things it is attached to.
+    The ALB's mTLS listener must have revocation checking enabled for this to work.
+    """
+    logger.info("Revoking certificate: %s", certificate_id)
+    await _retire_certificate(clients.get(region), certificate_id, "REVOKED")
+
+
+async def iter_certificate_pages(region: str) -> AsyncIterator[list[dict]]:
+    """Pages through every certificate of a region, oldest first."""
+    iot_client = clients.get(region)
+    kwargs = {"pageSize": LIST_PAGE_SIZE, "ascendingOrder": True}
+    while True:
+        page = await _call(iot_client.list_certificates, **kwargs)
+        yield [
+            {
+                "certificate_id": certificate["certificateId"],
+                "certificate_arn": certificate["certificateArn"],
+                "status": certificate["status"],
+                "created_date": certificate["creationDate"],
+                "region": region,
+            }
+            for certificate in page["certificates"]
+        ]
+        if not page.get("nextMarker"):
+            return
+        kwargs["marker"] = page["nextMarker"]
+
+
+async def certificate_attachments(certificate_arn: str, region: str | None = None) -> dict:
+    """Things and policies attached to a certificate."""
+    iot_client = clients.get(region)
+    things = await _call(iot_client.list_principal_things, principal=certificate_arn)
+    policies = []
+    kwargs = {"target": certificate_arn, "pageSize": LIST_PAGE_SIZE}
+    while True:
+        page = await _call(iot_client.list_attached_policies, **kwargs)
+        policies += [policy["policyName"] for policy in page["policies"]]
+        if not page.get("nextMarker"):
+            break
+        kwargs["marker"] = page["nextMarker"]
+    return {"things": things["things"], "policies": policies}
+
+
+async def delete_certificate(
+    certificate: dict, attachments: dict, region: str | None = None
+) -> None:
+    """
+    Deletes a certificate listed by `iter_certificate_pages`: detaches its
+    Things and policies and deactivates it first, since IoT refuses to
+    delete an attached or ACTIVE certificate.
+    """
+    iot_client = clients.get(region)
+    certificate_id = certificate["certificate_id"]
+    certificate_arn = certificate["certificate_arn"]
+    for thing_name in attachments["things"]:
+        await _call(
+            iot_client.detach_thing_principal, thingName=thing_name, principal=certificate_arn
+        )
+    for policy_name in attachments["policies"]:
+        await _call(iot_client.detach_policy, policyName=policy_name, target=certificate_arn)
+    if certificate["status"] == "ACTIVE":
+        await _call(
+            iot_client.update_certificate, certificateId=certificate_id, newStatus="INACTIVE"
+        )
+    await _call(iot_client.delete_certificate, certificateId=certificate_id)
+    logger.info("Deleted certificate %s", certificate_id)
@@ -0,0 +1,191 @@
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+MIN_RSA_KEY_SIZE = 2048
+ALLOWED_CURVES = (ec.SECP256R1, ec.SECP384R1)
+
+
+class InvalidCsrError(Exception):
+    pass
+
+
+class SigningUnavailableError(Exception):
+    pass
+
+
+def load_ca(
+    ca_cert_pem: bytes, ca_key_pem: bytes, password: bytes | None
+) -> tuple[x509.Certificate, object]:
+    """Parses the CA certificate and key; raises ValueError unless they form a pair."""
+    try:
+        ca_cert = x509.load_pem_x509_certificate(ca_cert_pem)
+        ca_key = serialization.load_pem_private_key(ca_key_pem, password=password)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Cannot load the local CA: {e}") from e
+    if ca_key.public_key() != ca_cert.public_key():
+        raise ValueError("The local CA key does not match its certificate")
+    return ca_cert, ca_key
+
+
+# The CA of a signing worker process, loaded once by _init_worker
+_worker_ca: tuple[x509.Certificate, object] | None = None
+
+
+def _init_worker(ca_cert_pem: bytes, ca_key_pem: bytes, password: bytes | None) -> None:
+    global _worker_ca
+    _worker_ca = load_ca(ca_cert_pem, ca_key_pem, password)
+
+
+def _worker_ready() -> bool:
+    return _worker_ca is not None
+
+
+def _check_csr(csr: x509.CertificateSigningRequest, device_id: str) -> None:
+    if not csr.is_signature_valid:
+        raise InvalidCsrError("CSR signature is invalid")
+    common_names = csr.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+    if [name.value for name in common_names] != [device_id]:
+        raise InvalidCsrError("CSR common name must be the device_id")
+    public_key = csr.public_key()
+    if isinstance(public_key, rsa.RSAPublicKey):
+        if public_key.key_size < MIN_RSA_KEY_SIZE:
+            raise InvalidCsrError(f"RSA keys must be at least {MIN_RSA_KEY_SIZE} bits")
+    elif isinstance(public_key, ec.EllipticCurvePublicKey):
+        if not isinstance(public_key.curve, ALLOWED_CURVES):
+            raise InvalidCsrError("EC keys must use P-256 or P-384")
+    else:
+        raise InvalidCsrError("Only RSA and EC keys are supported")
+
+
+def validate_csr(csr_pem: bytes, device_id: str) -> x509.CertificateSigningRequest:
+    """Parses and checks a device CSR; raises InvalidCsrError."""
+    try:
+        csr = x509.load_pem_x509_csr(csr_pem)
+    except ValueError as e:
+        raise InvalidCsrError("CSR is not valid PEM") from e
+    _check_csr(csr, device_id)
+    return csr
+
+
+def sign_csr(csr_pem: bytes, device_id: str, validity_days: int) -> str:
+    """
+    Signs a device CSR with the worker's CA. Only the subject and public key
+    of the CSR are used; extensions requested by the device are ignored.
+    """
+    csr = validate_csr(csr_pem, device_id)
+
+    ca_cert, ca_key = _worker_ca
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(csr.subject)
+        .issuer_name(ca_cert.subject)
+        .public_key(csr.public_key())
+        .serial_number(int.from_bytes(secrets.token_bytes(16), "big") >> 1)
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=validity_days))
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.CLIENT_AUTH]), critical=False)
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()),
+            critical=False,
+        )
+        .sign(ca_key, hashes.SHA256())
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class LocalCertificateAuthority:
+    """
+    Signs device CSRs with a CA held by the service. Signing is CPU bound,
+    so it runs in a pool of worker processes that each load the CA once.
+
+    The CA is parsed here first, so a bad key or password fails at startup.
+    Workers are spawned rather than forked: the service process already runs
+    logging, monitoring and probing threads a fork would copy mid-flight.
+    """
+
+    def __init__(
+        self,
+        ca_cert_pem: bytes,
+        ca_key_pem: bytes,
+        password: bytes | None,
+        validity_days: int,
+        workers: int,
+    ) -> None:
+        load_ca(ca_cert_pem, ca_key_pem, password)
+        self.ca_certificate_pem = ca_cert_pem.decode()
+        self.validity_days = validity_days
+        self.workers = workers
+        self._initargs = (ca_cert_pem, ca_key_pem, password)
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+
+    async def start(self) -> None:
+        """Starts every worker process, so the first CSRs do not pay for it."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _worker_ready) for _ in range(self.workers))
+        )
+
+    async def sign(self, csr_pem: str, device_id: str) -> str:
+        """
+        Returns the signed certificate PEM; raises InvalidCsrError, or
+        SigningUnavailableError if a worker died (the pool is then replaced).
+        """
+        executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, sign_csr, csr_pem.encode(), device_id, self.validity_days
+            )
+        except BrokenProcessPool as e:
+            if self._executor is executor:
+                logger.error("CSR signing pool broke, starting a new one: %s", e)
+                self._executor = self._new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise SigningUnavailableError("CSR signing is temporarily unavailable") from e
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+
+@lru_cache()
+def get_local_ca() -> LocalCertificateAuthority:
+    """
+    The CA configured by `LOCAL_CA_CERT_FILE` and `LOCAL_CA_KEY_FILE`.
+    """
+    settings = get_settings()
+    with open(settings.LOCAL_CA_CERT_FILE, "rb") as f:
+        ca_cert_pem = f.read()
+    with open(settings.LOCAL_CA_KEY_FILE, "rb") as f:
+        ca_key_pem = f.read()
+    password = settings.LOCAL_CA_KEY_PASSWORD.get_secret_value().encode() or None
+    return LocalCertificateAuthority(
+        ca_cert_pem,
+        ca_key_pem,
+        password,
+        settings.DEVICE_CERT_VALIDITY_DAYS,
+        settings.CSR_SIGNING_WORKERS,
+    )
@@ -0,0 +1,291 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import aclosing, asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import anyio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import aws_iot_client
+from app.core.crud.device_registrations import live_certificate_ids, revocation_dates
+from app.core.crud.reconcile_jobs import get_reconcile_job, update_reconcile_job
+from app.core.db import models
+from app.core.db.database import SessionLocal, engine
+from app.core.rotation import Pacer
+from app.core.schemas import schemas
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Statuses the reconciler acts on; INACTIVE certificates are kept, they may
+# be reactivated after a rotation
+CANDIDATE_STATUSES = {"ACTIVE", "REVOKED"}
+
+# Advisory lock letting one pass at a time run, background or API-started
+RECONCILER_LOCK = "cert_reconciler"
+
+# Jobs started by this process, so they are not garbage collected mid-run
+_running: dict[int, asyncio.Task] = {}
+
+
+@asynccontextmanager
+async def reconciler_lock() -> AsyncIterator[bool]:
+    """
+    Tries to take RECONCILER_LOCK, a session-level lock held on its own
+    connection until the block exits; yields whether it was acquired.
+    """
+    async with engine.connect() as lock_connection:
+        acquired = await lock_connection.scalar(
+            text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": RECONCILER_LOCK}
+        )
+        await lock_connection.commit()
+        if not acquired:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            await lock_connection.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": RECONCILER_LOCK}
+            )
+            await lock_connection.commit()
+
+
+def _is_orphaned(attachments: dict, policy_name: str) -> bool:
+    """
+    Whether an ACTIVE certificate was left by a failed provisioning: attached
+    to no Thing and to no policy but this service's. Certificates with other
+    policies belong to other workloads and are never deleted.
+    """
+    return not attachments["things"] and set(attachments["policies"]) <= {policy_name}
+
+
+async def _reconcile(
+    certificate: dict,
+    pacer: Pacer,
+    semaphore: asyncio.Semaphore,
+    dry_run: bool,
+    policy_name: str,
+) -> schemas.ReconciledCertificate | None:
+    """Deletes one candidate unless it turns out to be in use; None if it is."""
+    reason = "revoked" if certificate["status"] == "REVOKED" else "unattached"
+    error = None
+    async with semaphore:
+        await pacer.wait()
+        try:
+            attachments = await aws_iot_client.certificate_attachments(
+                certificate["certificate_arn"], certificate["region"]
+            )
+            if reason == "unattached" and not _is_orphaned(attachments, policy_name):
+                return None
+            if dry_run:
+                action = "would_delete"
+            else:
+                await aws_iot_client.delete_certificate(
+                    certificate, attachments, certificate["region"]
+                )
+                action = "deleted"
+        except Exception as e:
+            logger.error("Failed to delete certificate %s: %s", certificate["certificate_id"], e)
+            action, error = "failed", str(e)
+    return schemas.ReconciledCertificate(
+        certificate_id=certificate["certificate_id"],
+        region=certificate["region"],
+        status=certificate["status"],
+        reason=reason,
+        created_date=certificate["created_date"],
+        action=action,
+        error=error,
+    )
+
+
+async def reconcile_certificates(
+    db: AsyncSession,
+    settings: Settings,
+    dry_run: bool,
+    on_page: Callable[[schemas.CertificateReconcileReport], Awaitable[None]] | None = None,
+) -> schemas.CertificateReconcileReport:
+    """
+    Pages through the certificates of every region, oldest first, and
+    deletes those older than `CERT_RECONCILER_GRACE_H` that are REVOKED, or
+    ACTIVE but attached to no Thing and no policy other than
+    `IOT_POLICY_NAME` (left by a provisioning that failed midway). The grace
+    period of a REVOKED certificate starts when this service revoked it, if
+    it did, rather than at its creation. ACTIVE certificates issued to a
+    registered, unrevoked device are skipped without an API call. Deletions
+    run `CERT_RECONCILER_CONCURRENCY` at a time, starting at most
+    `CERT_RECONCILER_TPS` per second. `on_page` is awaited with the report
+    so far after each page.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.CERT_RECONCILER_GRACE_H)
+    pacer = Pacer(settings.CERT_RECONCILER_TPS)
+    semaphore = asyncio.Semaphore(settings.CERT_RECONCILER_CONCURRENCY)
+    report = schemas.CertificateReconcileReport(dry_run=dry_run)
+
+    for region in aws_iot_client.clients.regions:
+        async with aclosing(aws_iot_client.iter_certificate_pages(region)) as pages:
+            async for page in pages:
+                report.scanned += len(page)
+                old = [
+                    c
+                    for c in page
+                    if c["created_date"] < cutoff and c["status"] in CANDIDATE_STATUSES
+                ]
+                live = await live_certificate_ids(
+                    db, [c["certificate_id"] for c in old if c["status"] == "ACTIVE"]
+                )
+                revoked_dates = await revocation_dates(
+                    db, [c["certificate_id"] for c in old if c["status"] == "REVOKED"]
+                )
+                # The AWS calls below may take a while: no transaction stays open meanwhile
+                await db.commit()
+                results = await asyncio.gather(
+                    *(
+                        _reconcile(c, pacer, semaphore, dry_run, settings.IOT_POLICY_NAME)
+                        for c in old
+                        if c["certificate_id"] not in live
+                        and revoked_dates.get(c["certificate_id"], c["created_date"]) < cutoff
+                    )
+                )
+                for result in filter(None, results):
+                    if result.reason == "revoked":
+                        report.revoked += 1
+                    else:
+                        report.unattached += 1
+                    if result.action == "deleted":
+                        report.deleted += 1
+                    elif result.action == "failed":
+                        report.failed += 1
+                    if len(report.certificates) < settings.CERT_RECONCILER_REPORT_LIMIT:
+                        report.certificates.append(result)
+                if on_page is not None:
+                    await on_page(report)
+                # Pages are in creation order: the rest is within the grace period
+                if page and page[-1]["created_date"] >= cutoff:
+                    break
+    return report
+
+
+async def run_reconcile_job(
+    db: AsyncSession, job_id: int, settings: Settings
+) -> models.ReconcileJob:
+    """
+    Runs a reconciliation started through the admin API or the CLI under
+    RECONCILER_LOCK, committing the job's progress after each page. The job
+    is "skipped" when another pass holds the lock.
+    """
+    job = await get_reconcile_job(db, job_id)
+    dry_run = job.dry_run
+    async with reconciler_lock() as acquired:
+        if acquired:
+            await update_reconcile_job(db, job_id, "running")
+
+            async def save_progress(report: schemas.CertificateReconcileReport) -> None:
+                await update_reconcile_job(db, job_id, "running", report)
+
+            try:
+                report = await reconcile_certificates(db, settings, dry_run, save_progress)
+            except Exception as e:
+                await db.rollback()
+                await update_reconcile_job(db, job_id, "failed", error=str(e))
+                raise
+            await update_reconcile_job(db, job_id, "completed", report)
+        else:
+            await update_reconcile_job(
+                db, job_id, "skipped", error="Another certificate reconciliation is running"
+            )
+    await db.refresh(job)
+    return job
+
+
+async def _run_in_background(job_id: int) -> None:
+    try:
+        async with SessionLocal() as db:
+            await run_reconcile_job(db, job_id, get_settings())
+    except asyncio.CancelledError:
+        with anyio.CancelScope(shield=True):
+            async with SessionLocal() as db:
+                await update_reconcile_job(db, job_id, "interrupted")
+        raise
+    except Exception as e:
+        logger.exception(f"Reconcile job {job_id} failed: {str(e)}")
+
+
+def start_reconcile_job(job_id: int) -> None:
+    """
+    Runs a job in a background task of this process.
+    """
+    task = asyncio.create_task(_run_in_background(job_id))
+    _running[job_id] = task
+    task.add_done_callback(lambda _: _running.pop(job_id, None))
+
+
+async def cancel_reconcile_jobs() -> None:
+    """
+    Stops the jobs running in this process; they are marked interrupted.
+    """
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class CertificateReconciler:
+    """
+    Background loop reconciling certificates every `interval` seconds. Only
+    one worker runs a pass at a time; the others skip it.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.interval = settings.CERT_RECONCILER_INTERVAL_H * 3600
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> None:
+        async with reconciler_lock() as acquired:
+            if not acquired:
+                return
+            async with SessionLocal() as db:
+                report = await reconcile_certificates(
+                    db, self.settings, self.settings.CERT_RECONCILER_DRY_RUN
+                )
+        logger.info(
+            "Certificate reconciliation%s: %d scanned, %d unattached, %d revoked, "
+            "%d deleted, %d failed",
+            " (dry run)" if report.dry_run else "",
+            report.scanned,
+            report.unattached,
+            report.revoked,
+            report.deleted,
+            report.failed,
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception(f"Certificate reconciliation failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+@lru_cache()
+def get_cert_reconciler() -> CertificateReconciler:
+    """
+    Reconciler started by the application lifespan.
+    """
+    return CertificateReconciler(get_settings())
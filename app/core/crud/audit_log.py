@@ -0,0 +1,113 @@
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.crud.partitions import (
+    add_months,
+    list_partitions,
+    lock_partitions,
+    partition_bounds,
+    partition_name,
+)
+from app.core.db import models
+
+AUDIT_TABLE = "audit_log"
+AUDIT_COLUMNS = [
+    "created_date",
+    "category",
+    "action",
+    "outcome",
+    "key_id",
+    "key_hint",
+    "device_id",
+    "client_ip",
+    "request_id",
+    "detail",
+]
+
+
+async def copy_records(db: AsyncSession, records: list[tuple]) -> None:
+    """
+    Writes records (in `AUDIT_COLUMNS` order) with one COPY; the rows are
+    routed to their monthly partition. Does *not* commit.
+    """
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        AUDIT_TABLE, records=records, columns=AUDIT_COLUMNS
+    )
+
+
+async def ensure_partitions(db: AsyncSession, first_month: date, count: int) -> None:
+    """
+    Creates the monthly partitions from `first_month` on, if missing. Bounds
+    are in UTC. Commits.
+    """
+    await lock_partitions(db, AUDIT_TABLE)
+    for offset in range(count):
+        month = add_months(first_month, offset)
+        await db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(AUDIT_TABLE, month)} "
+                f"PARTITION OF {AUDIT_TABLE} FOR VALUES {partition_bounds(month)}"
+            )
+        )
+    await db.commit()
+
+
+async def drop_partitions_before(db: AsyncSession, month: date) -> list[date]:
+    """
+    Retention: drops every partition older than `month` as a whole, without
+    deleting rows one by one. Commits.
+    """
+    await lock_partitions(db, AUDIT_TABLE)
+    dropped = [m for m in await list_partitions(db, AUDIT_TABLE) if m < month]
+    for expired in dropped:
+        await db.execute(text(f"DROP TABLE IF EXISTS {partition_name(AUDIT_TABLE, expired)}"))
+    await db.commit()
+    return dropped
+
+
+async def query_records(
+    db: AsyncSession,
+    since: datetime,
+    until: datetime,
+    key_id: int | None = None,
+    key_hint: str | None = None,
+    device_id: str | None = None,
+    before: tuple[datetime, int] | None = None,
+    limit: int = 100,
+) -> list[models.AuditRecord]:
+    """
+    Records of the `[since, until)` window, newest first. The window prunes
+    partitions; key and device filters use their `(column, created_date)`
+    indexes. `before` is the `(created_date, id)` of the last record of the
+    previous page (keyset pagination).
+    """
+    stmt = select(models.AuditRecord).where(
+        models.AuditRecord.created_date >= since, models.AuditRecord.created_date < until
+    )
+    if key_id is not None:
+        stmt = stmt.where(models.AuditRecord.key_id == key_id)
+    if key_hint is not None:
+        stmt = stmt.where(models.AuditRecord.key_hint == key_hint)
+    if device_id is not None:
+        stmt = stmt.where(models.AuditRecord.device_id == device_id)
+    if before is not None:
+        created_date, record_id = before
+        stmt = stmt.where(
+            or_(
+                models.AuditRecord.created_date < created_date,
+                and_(
+                    models.AuditRecord.created_date == created_date,
+                    models.AuditRecord.id < record_id,
+                ),
+            )
+        )
+    result = await db.execute(
+        stmt.order_by(models.AuditRecord.created_date.desc(), models.AuditRecord.id.desc()).limit(
+            limit
+        )
+    )
+    return list(result.scalars().all())
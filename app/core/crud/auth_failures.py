@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import models
+
+
+def _refilled(rate: float, burst: float):
+    """Tokens of a stored bucket after refilling it up to now."""
+    elapsed = func.extract("epoch", func.now() - models.AuthFailureBucket.updated_date)
+    return func.least(literal(burst), models.AuthFailureBucket.tokens + elapsed * rate)
+
+
+async def get_tokens(db: AsyncSession, key: str, rate: float, burst: float) -> float:
+    """Tokens left in a bucket; a missing bucket is full."""
+    result = await db.execute(
+        select(_refilled(rate, burst)).where(models.AuthFailureBucket.key == key)
+    )
+    tokens = result.scalar_one_or_none()
+    return burst if tokens is None else tokens
+
+
+async def consume_token(db: AsyncSession, key: str, rate: float, burst: float) -> None:
+    """
+    Takes one token from a bucket, creating it full first. Atomic across
+    workers: the refill and the decrement happen in a single upsert.
+    Does *not* commit.
+    """
+    stmt = insert(models.AuthFailureBucket).values(
+        key=key, tokens=burst - 1, updated_date=func.now()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.AuthFailureBucket.key],
+        set_={
+            "tokens": func.greatest(_refilled(rate, burst) - 1, 0),
+            "updated_date": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def delete_expired(db: AsyncSession, ttl_seconds: float) -> int:
+    """Drops buckets idle for longer than the TTL. Does *not* commit."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl_seconds)
+    result = await db.execute(
+        delete(models.AuthFailureBucket).where(models.AuthFailureBucket.updated_date < cutoff)
+    )
+    return result.rowcount
@@ -1,12 +1,16 @@
 import secrets
+from collections.abc import AsyncIterator
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import delete
+from sqlalchemy import Select, delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.api.deps import PaginationDep
+from app.api.deps import KeyFilterParams, PaginationDep
 from app.core import security
+from app.core.crud.change_versions import BOOTSTRAP_KEYS, bump_version
+from app.core.crud.key_group_stats import adjust_stats
+from app.core.crud.outbox import KEY_CREATED, KEY_DELETED, KEY_STATUS_CHANGED, emit_event
 from app.core.db import models
 from app.core.schemas import schemas
 from app.core.schemas.schemas import BootstrapKeyUpdateRequest
@@ -39,15 +43,62 @@ async def create_key(
         expiration_date=expiration_date,
     )
     db.add(db_key)
+    await db.flush()
+    await adjust_stats(db, db_key.key_group, expiration_date, active=1)
+    await emit_event(
+        db,
+        KEY_CREATED,
+        {
+            "key_id": db_key.id,
+            "key_hint": key_hint,
+            "group": db_key.key_group,
+            "expiration_date": expiration_date.isoformat(),
+        },
+    )
+    await bump_version(db, BOOTSTRAP_KEYS)
     await db.commit()
     await db.refresh(db_key)
     return db_key, raw_key
 
 
-async def get_keys(db: AsyncSession, pagination: PaginationDep) -> list[models.BootstrapKey]:
+# Rows per round trip when streaming keys through a server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Key metadata exported (and archived): never the hash
+EXPORT_COLUMNS = (
+    models.BootstrapKey.id,
+    models.BootstrapKey.key_hint,
+    models.BootstrapKey.key_group,
+    models.BootstrapKey.created_date,
+    models.BootstrapKey.expiration_date,
+    models.BootstrapKey.is_active,
+    models.BootstrapKey.last_used_date,
+)
+
+
+def _apply_key_filters(stmt: Select, filters: KeyFilterParams | None) -> Select:
+    if not filters:
+        return stmt
+    if filters.get("group") is not None:
+        stmt = stmt.where(models.BootstrapKey.key_group == filters["group"])
+    if filters.get("is_active") is not None:
+        stmt = stmt.where(models.BootstrapKey.is_active == filters["is_active"])
+    if filters.get("expired") is not None:
+        now = datetime.now(timezone.utc)
+        # Plain range conditions on the partition key let the planner prune partitions
+        if filters["expired"]:
+            stmt = stmt.where(models.BootstrapKey.expiration_date < now)
+        else:
+            stmt = stmt.where(models.BootstrapKey.expiration_date >= now)
+    return stmt
+
+
+async def get_keys(
+    db: AsyncSession, pagination: PaginationDep, filters: KeyFilterParams | None = None
+) -> list[models.BootstrapKey]:
+    stmt = _apply_key_filters(select(models.BootstrapKey), filters)
     result = await db.execute(
-        select(models.BootstrapKey)
-        .order_by(models.BootstrapKey.id.desc())
+        stmt.order_by(models.BootstrapKey.id.desc())
         .offset(pagination["skip"])
         .limit(pagination["limit"])
     )
@@ -55,18 +106,52 @@ async def get_keys(db: AsyncSession, pagination: PaginationDep) -> list[models.B
     return keys
 
 
+async def stream_keys(db: AsyncSession, filters: KeyFilterParams | None = None) -> AsyncIterator:
+    """
+    Yields key metadata rows (never the hash) through a server-side cursor,
+    fetching `EXPORT_BATCH_SIZE` rows at a time so memory stays flat whatever
+    the table size. Plain rows are selected to keep the ORM identity map empty.
+    """
+    stmt = _apply_key_filters(select(*EXPORT_COLUMNS), filters).order_by(models.BootstrapKey.id)
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for row in result:
+        yield row
+
+
 async def delete_key(key_id: int, db: AsyncSession) -> None:
-    result = await db.execute(delete(models.BootstrapKey).where(models.BootstrapKey.id == key_id))
-    if result.rowcount == 0:
+    result = await db.execute(
+        delete(models.BootstrapKey)
+        .where(models.BootstrapKey.id == key_id)
+        .returning(
+            models.BootstrapKey.key_group,
+            models.BootstrapKey.expiration_date,
+            models.BootstrapKey.is_active,
+            models.BootstrapKey.last_used_date,
+        )
+    )
+    deleted = result.one_or_none()
+    if deleted is None:
         raise BootstrapKeyNotFoundError(f"Key with id {key_id} not found")
 
+    await adjust_stats(
+        db,
+        deleted.key_group,
+        deleted.expiration_date,
+        active=-1 if deleted.is_active else 0,
+        inactive=0 if deleted.is_active else -1,
+        used=-1 if deleted.last_used_date is not None else 0,
+    )
+    await emit_event(db, KEY_DELETED, {"key_id": key_id, "group": deleted.key_group})
+    await bump_version(db, BOOTSTRAP_KEYS)
     await db.commit()
 
 
 async def update_key_status(
     key_id: int, key_status: BootstrapKeyUpdateRequest, db: AsyncSession
 ) -> models.BootstrapKey:
-    db_key = await db.get(models.BootstrapKey, key_id)
+    # The row lock makes concurrent toggles see each other's is_active, so the
+    # stats delta is applied once
+    db_key = await db.get(models.BootstrapKey, key_id, with_for_update=True, populate_existing=True)
     if not db_key:
         raise BootstrapKeyNotFoundError(f"Key with id {key_id} not found")
 
@@ -77,7 +162,40 @@ async def update_key_status(
         and key_status.activation_flag
     ):
         raise BootstrapKeyExpiredError(f"Key with id {key_id} has expired")
+    if db_key.is_active != key_status.activation_flag:
+        delta = 1 if key_status.activation_flag else -1
+        await adjust_stats(
+            db, db_key.key_group, db_key.expiration_date, active=delta, inactive=-delta
+        )
+        await emit_event(
+            db,
+            KEY_STATUS_CHANGED,
+            {"key_id": key_id, "group": db_key.key_group, "is_active": key_status.activation_flag},
+        )
     db_key.is_active = key_status.activation_flag
+    await bump_version(db, BOOTSTRAP_KEYS)
     await db.commit()
     await db.refresh(db_key)
     return db_key
+
+
+async def mark_key_used(db: AsyncSession, db_key: models.BootstrapKey) -> None:
+    """
+    Records the first successful registration made with a key.
+    The conditional UPDATE makes concurrent registrations count the key once.
+    Does *not* commit.
+    """
+    result = await db.execute(
+        update(models.BootstrapKey)
+        .where(models.BootstrapKey.id == db_key.id)
+        # Pins the UPDATE to the key's partition
+        .where(models.BootstrapKey.expiration_date == db_key.expiration_date)
+        .where(models.BootstrapKey.last_used_date.is_(None))
+        .values(last_used_date=datetime.now(timezone.utc))
+        .returning(models.BootstrapKey.key_group, models.BootstrapKey.expiration_date)
+    )
+    first_use = result.one_or_none()
+    if first_use is None:
+        return
+    await adjust_stats(db, first_use.key_group, first_use.expiration_date, used=1)
+    await bump_version(db, BOOTSTRAP_KEYS)
@@ -0,0 +1,43 @@
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.db import models
+
+BOOTSTRAP_KEYS = "bootstrap_keys"
+DEVICES = "devices"
+
+
+async def get_version(db: AsyncSession, resource: str) -> int:
+    """
+    Returns the current change version of a resource (0 if it was never written).
+    Primary key lookup only, it never touches the resource rows.
+    """
+    result = await db.execute(
+        select(models.ChangeVersion.version).where(models.ChangeVersion.resource == resource)
+    )
+    return result.scalar_one_or_none() or 0
+
+
+async def bump_version(db: AsyncSession, resource: str) -> None:
+    """
+    Increments the change version of a resource.
+
+    Does *not* commit: callers run it inside the transaction of the write it
+    describes, so readers never see the new version before the new data.
+    """
+    stmt = insert(models.ChangeVersion).values(resource=resource, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.ChangeVersion.resource],
+        set_={"version": models.ChangeVersion.version + 1},
+    )
+    await db.execute(stmt)
+
+
+async def mark_changed(db: AsyncSession, resource: str) -> None:
+    """
+    Bumps the version of a resource whose source of truth lives outside the
+    database (e.g. devices in AWS IoT) and commits straight away.
+    """
+    await bump_version(db, resource)
+    await db.commit()
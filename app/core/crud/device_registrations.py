@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.crud.outbox import DEVICE_PROVISIONED, DEVICE_REVOKED, emit_events
+from app.core.db import models
+
+
+class RevocationJobNotFoundError(Exception):
+    pass
+
+
+async def record_registrations(
+    db: AsyncSession, db_key: models.BootstrapKey, registrations: list[tuple[str, str, str]]
+) -> None:
+    """
+    Records which key onboarded each `(device_id, certificate_id, region)`
+    and queues their "device.provisioned" events.
+    Does *not* commit: callers run it in the transaction marking the key used.
+    """
+    if not registrations:
+        return
+    stmt = insert(models.DeviceRegistration).values(
+        [
+            {
+                "device_id": device_id,
+                "certificate_id": certificate_id,
+                "region": region,
+                "key_id": db_key.id,
+                "key_group": db_key.key_group,
+            }
+            for device_id, certificate_id, region in registrations
+        ]
+    )
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=["certificate_id"]))
+    await emit_events(
+        db,
+        [
+            (
+                DEVICE_PROVISIONED,
+                {
+                    "device_id": device_id,
+                    "certificate_id": certificate_id,
+                    "region": region,
+                    "key_id": db_key.id,
+                    "group": db_key.key_group,
+                },
+            )
+            for device_id, certificate_id, region in registrations
+        ],
+    )
+
+
+def _job_filter(job: models.RevocationJob):
+    if job.key_id is not None:
+        return models.DeviceRegistration.key_id == job.key_id
+    return models.DeviceRegistration.key_group == job.key_group
+
+
+async def create_revocation_job(
+    db: AsyncSession, key_id: int | None, key_group: str | None
+) -> models.RevocationJob:
+    job = models.RevocationJob(key_id=key_id, key_group=key_group, status="pending")
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_revocation_job(db: AsyncSession, job_id: int) -> models.RevocationJob:
+    job = await db.get(models.RevocationJob, job_id)
+    if job is None:
+        raise RevocationJobNotFoundError(f"Revocation job with id {job_id} not found")
+    return job
+
+
+async def claim_revocation_job(
+    db: AsyncSession, job_id: int, stale_after_seconds: float
+) -> models.RevocationJob | None:
+    """
+    Marks a job running and resets its progress from the registrations table.
+    Returns None when another run holds it, i.e. it is running and reported
+    progress less than `stale_after_seconds` ago (a crashed run goes stale).
+    The conditional UPDATE makes concurrent claims from several workers safe.
+    """
+    job = await get_revocation_job(db, job_id)
+    stale = datetime.now(timezone.utc) - timedelta(seconds=stale_after_seconds)
+    counts = await db.execute(
+        select(
+            func.count(),
+            func.count(models.DeviceRegistration.revoked_date),
+        ).where(_job_filter(job))
+    )
+    total, revoked = counts.one()
+    result = await db.execute(
+        update(models.RevocationJob)
+        .where(models.RevocationJob.id == job_id)
+        .where(
+            or_(
+                models.RevocationJob.status != "running",
+                models.RevocationJob.updated_date < stale,
+            )
+        )
+        .values(status="running", total=total, revoked=revoked, failed=0)
+        .returning(models.RevocationJob.id)
+    )
+    claimed = result.scalar_one_or_none() is not None
+    await db.commit()
+    if not claimed:
+        return None
+    await db.refresh(job)
+    return job
+
+
+async def pending_registrations(
+    db: AsyncSession, job: models.RevocationJob, after_id: int, limit: int
+) -> list[models.DeviceRegistration]:
+    """Next unrevoked registrations of a job, in id order (keyset pagination)."""
+    result = await db.execute(
+        select(models.DeviceRegistration)
+        .where(_job_filter(job))
+        .where(models.DeviceRegistration.revoked_date.is_(None))
+        .where(models.DeviceRegistration.id > after_id)
+        .order_by(models.DeviceRegistration.id)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+def _revoked_event(device_id: str | None, certificate_id: str, region: str | None):
+    return (
+        DEVICE_REVOKED,
+        {"device_id": device_id, "certificate_id": certificate_id, "region": region},
+    )
+
+
+async def mark_revoked(db: AsyncSession, registrations: list[models.DeviceRegistration]) -> None:
+    """Does *not* commit."""
+    if not registrations:
+        return
+    await db.execute(
+        update(models.DeviceRegistration)
+        .where(models.DeviceRegistration.id.in_([r.id for r in registrations]))
+        .values(revoked_date=datetime.now(timezone.utc))
+    )
+    await emit_events(
+        db, [_revoked_event(r.device_id, r.certificate_id, r.region) for r in registrations]
+    )
+
+
+async def record_revocation(db: AsyncSession, certificate_id: str, region: str | None) -> None:
+    """
+    Marks a certificate revoked outside a revocation job (it may predate the
+    provenance table). Does *not* commit.
+    """
+    result = await db.execute(
+        update(models.DeviceRegistration)
+        .where(models.DeviceRegistration.certificate_id == certificate_id)
+        .values(revoked_date=datetime.now(timezone.utc))
+        .returning(models.DeviceRegistration.device_id, models.DeviceRegistration.region)
+    )
+    registration = result.one_or_none()
+    if registration is not None:
+        event = _revoked_event(registration.device_id, certificate_id, registration.region)
+    else:
+        event = _revoked_event(None, certificate_id, region)
+    await emit_events(db, [event])
+
+
+async def live_certificate_ids(db: AsyncSession, certificate_ids: list[str]) -> set[str]:
+    """The certificates among `certificate_ids` issued to a device and not revoked."""
+    if not certificate_ids:
+        return set()
+    result = await db.execute(
+        select(models.DeviceRegistration.certificate_id)
+        .where(models.DeviceRegistration.certificate_id.in_(certificate_ids))
+        .where(models.DeviceRegistration.revoked_date.is_(None))
+    )
+    return set(result.scalars().all())
+
+
+async def revocation_dates(db: AsyncSession, certificate_ids: list[str]) -> dict[str, datetime]:
+    """When each certificate among `certificate_ids` was revoked through this service."""
+    if not certificate_ids:
+        return {}
+    result = await db.execute(
+        select(models.DeviceRegistration.certificate_id, models.DeviceRegistration.revoked_date)
+        .where(models.DeviceRegistration.certificate_id.in_(certificate_ids))
+        .where(models.DeviceRegistration.revoked_date.is_not(None))
+    )
+    return dict(result.tuples().all())
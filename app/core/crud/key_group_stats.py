@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.db import models
+
+
+def expiration_bucket(expiration_date: datetime | None) -> datetime | None:
+    """Truncates an expiration date to its UTC hour, matching the SQL rebuild."""
+    if expiration_date is None:
+        return None
+    if expiration_date.tzinfo is None:
+        expiration_date = expiration_date.replace(tzinfo=timezone.utc)
+    return expiration_date.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+async def adjust_stats(
+    db: AsyncSession,
+    key_group: str | None,
+    expiration_date: datetime | None,
+    active: int = 0,
+    inactive: int = 0,
+    used: int = 0,
+) -> None:
+    """
+    Applies a delta to the counters of one (group, expiration hour) bucket.
+    Does *not* commit: call it inside the transaction of the key change.
+    """
+    table = models.KeyGroupStats
+    stmt = insert(table).values(
+        key_group=key_group,
+        expiration_hour=expiration_bucket(expiration_date),
+        active_count=active,
+        inactive_count=inactive,
+        used_count=used,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.key_group, table.expiration_hour],
+        set_={
+            "active_count": table.active_count + active,
+            "inactive_count": table.inactive_count + inactive,
+            "used_count": table.used_count + used,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def get_stats(db: AsyncSession) -> list[dict]:
+    """
+    Aggregates the buckets into per-group counts.
+
+    A bucket is expired once its whole hour is in the past, so keys expiring
+    within the current hour still count as active/inactive.
+    """
+    table = models.KeyGroupStats
+    expired = table.expiration_hour + timedelta(hours=1) <= func.now()
+    live_active = case((expired, 0), else_=table.active_count)
+    live_inactive = case((expired, 0), else_=table.inactive_count)
+    expired_count = case((expired, table.active_count + table.inactive_count), else_=0)
+
+    result = await db.execute(
+        select(
+            table.key_group,
+            func.sum(live_active).label("active"),
+            func.sum(live_inactive).label("inactive"),
+            func.sum(expired_count).label("expired"),
+            func.sum(table.used_count).label("used"),
+        )
+        .group_by(table.key_group)
+        .order_by(table.key_group.nulls_first())
+    )
+    return [
+        {
+            "group": row.key_group,
+            "active": row.active,
+            "inactive": row.inactive,
+            "expired": row.expired,
+            "used": row.used,
+            "total": row.active + row.inactive + row.expired,
+        }
+        for row in result
+    ]
+
+
+async def rebuild_stats(db: AsyncSession) -> int:
+    """
+    Recomputes every bucket from `bootstrap_keys` (recovery after drift, e.g.
+    rows written outside the CRUD layer). Writers are blocked for the duration
+    so the rebuilt counters are consistent. Returns the number of buckets.
+    """
+    await db.execute(text("LOCK TABLE bootstrap_keys IN SHARE MODE"))
+    await db.execute(text("DELETE FROM key_group_stats"))
+    result = await db.execute(
+        text(
+            """
+            INSERT INTO key_group_stats
+                (key_group, expiration_hour, active_count, inactive_count, used_count)
+            SELECT key_group,
+                   date_trunc('hour', expiration_date, 'UTC'),
+                   count(*) FILTER (WHERE is_active),
+                   count(*) FILTER (WHERE NOT is_active),
+                   count(last_used_date)
+            FROM bootstrap_keys
+            GROUP BY 1, 2
+            """
+        )
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,320 @@
+import codecs
+import csv
+import json
+from collections import deque
+from collections.abc import AsyncIterator
+from datetime import timezone
+
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import security
+from app.core.crud.change_versions import BOOTSTRAP_KEYS, bump_version
+from app.core.crud.outbox import KEYS_IMPORTED, emit_event
+from app.core.schemas import schemas
+
+# Rows validated and copied to the staging table per round trip
+IMPORT_CHUNK_SIZE = 5000
+
+# Rejections listed in detail in the report, the rest are only counted
+MAX_REPORTED_REJECTIONS = 1000
+
+STAGING_TABLE = "bootstrap_keys_import"
+STAGING_COLUMNS = [
+    "line_no",
+    "key_hash",
+    "key_hint",
+    "key_group",
+    "created_date",
+    "expiration_date",
+    "is_active",
+]
+
+
+class KeyImportFormatError(Exception):
+    pass
+
+
+class _ImportReport:
+    def __init__(self) -> None:
+        self.total_rows = 0
+        self.rejected = 0
+        self.rejections: list[schemas.KeyImportRejection] = []
+
+    def reject(self, line: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.rejections) < MAX_REPORTED_REJECTIONS:
+            self.rejections.append(schemas.KeyImportRejection(line=line, reason=reason))
+
+    def build(self, imported: int) -> schemas.KeyImportReport:
+        self.rejections.sort(key=lambda rejection: rejection.line)
+        return schemas.KeyImportReport(
+            total_rows=self.total_rows,
+            imported=imported,
+            rejected=self.rejected,
+            rejections=self.rejections,
+            rejections_truncated=self.rejected > len(self.rejections),
+        )
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Splits a stream of UTF-8 bytes into lines without buffering the whole body."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+class _CsvLineFeed:
+    """
+    Source of the single csv.reader parsing an import. Lines are pushed as
+    they arrive; a record is complete once its lines hold an even number of
+    quotes, so the reader never runs out of input inside a quoted field.
+    """
+
+    def __init__(self) -> None:
+        self.lines: deque[str] = deque()
+        self.quotes = 0
+
+    def push(self, line: str) -> None:
+        self.lines.append(line + "\n")
+        self.quotes += line.count('"')
+
+    def has_record(self) -> bool:
+        return bool(self.lines) and self.quotes % 2 == 0
+
+    def __iter__(self) -> "_CsvLineFeed":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        line = self.lines.popleft()
+        self.quotes -= line.count('"')
+        return line
+
+
+async def _iter_csv_rows(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[int, list[str] | None]]:
+    """
+    Yields (first line number, values) per CSV record; quoted fields may span
+    lines. Values are None for a quoted field left open at the end of the file.
+    """
+    feed = _CsvLineFeed()
+    reader = csv.reader(feed)
+    async for line in lines:
+        feed.push(line)
+        while feed.has_record():
+            line_no = reader.line_num + 1
+            yield line_no, next(reader)
+    if feed.lines:
+        yield reader.line_num + 1, None
+
+
+async def _iter_records(
+    lines: AsyncIterator[str], import_format: str
+) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Yields (line number, raw record, parse error) for every non-blank record."""
+    if import_format == "ndjson":
+        line_no = 0
+        async for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"Invalid JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Expected a JSON object"
+                continue
+            yield line_no, record, None
+        return
+
+    # CSV: the first record is the header
+    header = None
+    async for line_no, values in _iter_csv_rows(lines):
+        if values is None:
+            yield line_no, None, "Unterminated quoted field"
+            continue
+        if len(values) <= 1 and not "".join(values).strip():
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            missing = {"key_hash", "key_hint", "expiration_date"} - set(header)
+            if missing:
+                raise KeyImportFormatError(f"CSV header is missing {', '.join(sorted(missing))}")
+            continue
+        if len(values) != len(header):
+            yield line_no, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty CSV cells mean "not provided"
+        yield line_no, {k: v for k, v in zip(header, values) if v != ""}, None
+
+
+def _validate(record: dict) -> tuple[schemas.KeyImportRow | None, str | None]:
+    try:
+        row = schemas.KeyImportRow.model_validate(record)
+    except ValidationError as e:
+        error = e.errors()[0]
+        location = ".".join(str(part) for part in error["loc"])
+        return None, f"{location}: {error['msg']}"
+    if security.pwd_context.identify(row.key_hash, required=False) is None:
+        return None, "key_hash: unsupported hash format"
+    return row, None
+
+
+def _staging_record(line_no: int, row: schemas.KeyImportRow) -> tuple:
+    def aware(value):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+    return (
+        line_no,
+        row.key_hash,
+        row.key_hint,
+        row.group,
+        aware(row.created_date),
+        aware(row.expiration_date),
+        row.is_active,
+    )
+
+
+async def import_keys(
+    db: AsyncSession, lines: AsyncIterator[str], import_format: str
+) -> schemas.KeyImportReport:
+    """
+    Bulk-loads externally generated key hashes.
+
+    Rows are validated `IMPORT_CHUNK_SIZE` at a time and each valid chunk is
+    COPYed into a temporary staging table, so the file is never held in memory.
+    A set-based merge then rejects hashes duplicated in the file or already
+    stored, inserts the rest and updates `key_group_stats`, all in one
+    transaction. Invalid rows are reported instead of aborting the import.
+    `key_hash` has no unique index (see `models.BootstrapKey`), so the merge
+    is serialized across imports by an advisory lock.
+    """
+    if import_format not in ("csv", "ndjson"):
+        raise KeyImportFormatError(f"Unsupported import format {import_format}")
+
+    # The first statement opens the transaction the raw COPY below joins
+    await db.execute(
+        text(
+            f"""
+            CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+                line_no integer NOT NULL,
+                key_hash text NOT NULL,
+                key_hint varchar(4) NOT NULL,
+                key_group text,
+                created_date timestamptz,
+                expiration_date timestamptz NOT NULL,
+                is_active boolean NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+    )
+    await db.execute(text(f"TRUNCATE {STAGING_TABLE}"))
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    report = _ImportReport()
+    chunk: list[tuple] = []
+    async for line_no, record, error in _iter_records(lines, import_format):
+        report.total_rows += 1
+        if error is None:
+            row, error = _validate(record)
+        if error is not None:
+            report.reject(line_no, error)
+            continue
+        chunk.append(_staging_record(line_no, row))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await driver_connection.copy_records_to_table(
+                STAGING_TABLE, records=chunk, columns=STAGING_COLUMNS
+            )
+            chunk = []
+    if chunk:
+        await driver_connection.copy_records_to_table(
+            STAGING_TABLE, records=chunk, columns=STAGING_COLUMNS
+        )
+
+    duplicates = await db.execute(
+        text(
+            f"""
+            DELETE FROM {STAGING_TABLE} s
+            USING {STAGING_TABLE} first
+            WHERE s.key_hash = first.key_hash AND s.line_no > first.line_no
+            RETURNING s.line_no
+            """
+        )
+    )
+    for (line_no,) in duplicates:
+        report.reject(line_no, "key_hash: duplicated in file")
+
+    # Held until commit, so a concurrent import sees this one's keys
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": STAGING_TABLE})
+    existing = await db.execute(
+        text(
+            f"""
+            DELETE FROM {STAGING_TABLE} s
+            USING bootstrap_keys k
+            WHERE s.key_hash = k.key_hash
+            RETURNING s.line_no
+            """
+        )
+    )
+    for (line_no,) in existing:
+        report.reject(line_no, "key_hash: already exists")
+
+    result = await db.execute(
+        text(
+            f"""
+            WITH inserted AS (
+                INSERT INTO bootstrap_keys
+                    (key_hash, key_hint, key_group, created_date, expiration_date, is_active)
+                SELECT key_hash, key_hint, key_group, coalesce(created_date, now()),
+                       expiration_date, is_active
+                FROM {STAGING_TABLE}
+                RETURNING id, key_group, expiration_date, is_active
+            ), stats AS (
+                INSERT INTO key_group_stats
+                    (key_group, expiration_hour, active_count, inactive_count, used_count)
+                SELECT key_group,
+                       date_trunc('hour', expiration_date, 'UTC'),
+                       count(*) FILTER (WHERE is_active),
+                       count(*) FILTER (WHERE NOT is_active),
+                       0
+                FROM inserted
+                GROUP BY 1, 2
+                ON CONFLICT (key_group, expiration_hour) DO UPDATE SET
+                    active_count = key_group_stats.active_count + excluded.active_count,
+                    inactive_count = key_group_stats.inactive_count + excluded.inactive_count
+            )
+            SELECT key_group, count(*), min(id), max(id)
+            FROM inserted
+            GROUP BY key_group
+            ORDER BY key_group NULLS FIRST
+            """
+        )
+    )
+    groups = [
+        {"group": group, "imported": count, "first_key_id": first_id, "last_key_id": last_id}
+        for group, count, first_id, last_id in result
+    ]
+    imported = sum(group["imported"] for group in groups)
+    if imported:
+        # One summary event: the keys of each group lie in its id range
+        await emit_event(db, KEYS_IMPORTED, {"imported": imported, "groups": groups})
+        await bump_version(db, BOOTSTRAP_KEYS)
+    await db.commit()
+    return report.build(imported)
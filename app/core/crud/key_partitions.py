@@ -0,0 +1,240 @@
+from collections.abc import AsyncIterator, Iterable
+from datetime import date, datetime, time, timezone
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.crud.bootstrap_keys import EXPORT_BATCH_SIZE, EXPORT_COLUMNS
+from app.core.crud.change_versions import BOOTSTRAP_KEYS, bump_version
+from app.core.crud.partitions import (
+    add_months,
+    list_partitions,
+    lock_partitions,
+    partition_bounds,
+    partition_name,
+)
+from app.core.db import models
+
+KEYS_TABLE = "bootstrap_keys"
+DEFAULT_PARTITION = "bootstrap_keys_default"
+
+# Longest wait for the ACCESS EXCLUSIVE locks taken on the default partition
+ATTACH_LOCK_TIMEOUT = "5s"
+
+
+def month_start(month: date) -> datetime:
+    return datetime.combine(month, time(), tzinfo=timezone.utc)
+
+
+async def default_partition_months(db: AsyncSession) -> list[date]:
+    """Expiration months of the keys waiting in the default partition."""
+    result = await db.execute(
+        text(
+            f"""
+            SELECT DISTINCT (date_trunc('month', expiration_date, 'UTC') AT TIME ZONE 'UTC')::date
+            FROM {DEFAULT_PARTITION}
+            """
+        )
+    )
+    return sorted(result.scalars().all())
+
+
+async def _has_constraint(db: AsyncSession, table: str, name: str) -> bool:
+    result = await db.execute(
+        text(
+            "SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(:table) AND conname = :name"
+        ),
+        {"table": table, "name": name},
+    )
+    return result.scalar() is not None
+
+
+def _range_condition(month: date) -> str:
+    lower = month_start(month).isoformat()
+    upper = month_start(add_months(month, 1)).isoformat()
+    return f"expiration_date >= '{lower}' AND expiration_date < '{upper}'"
+
+
+async def _create_detached(db: AsyncSession, month: date) -> str:
+    """
+    Creates the month's partition as a plain table with the indexes of
+    `bootstrap_keys` and a CHECK constraint matching its range, so attaching
+    it neither builds indexes nor scans it.
+    """
+    name = partition_name(KEYS_TABLE, month)
+    await db.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {name} "
+            f"(LIKE {KEYS_TABLE} INCLUDING DEFAULTS INCLUDING INDEXES)"
+        )
+    )
+    if not await _has_constraint(db, name, f"{name}_range"):
+        await db.execute(
+            text(
+                f"ALTER TABLE {name} ADD CONSTRAINT {name}_range CHECK ({_range_condition(month)})"
+            )
+        )
+    return name
+
+
+async def _attach(db: AsyncSession, month: date, name: str) -> None:
+    """
+    Attaches a partition prepared by `_create_detached`, then drops the
+    CHECK constraints made redundant by the partition bounds.
+    """
+    # ATTACH locks the default partition ACCESS EXCLUSIVE: give up (until the
+    # next run) rather than queue key validations behind a long transaction
+    await db.execute(text(f"SET LOCAL lock_timeout = '{ATTACH_LOCK_TIMEOUT}'"))
+    await db.execute(
+        text(
+            f"ALTER TABLE {KEYS_TABLE} ATTACH PARTITION {name} FOR VALUES {partition_bounds(month)}"
+        )
+    )
+    await db.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_range"))
+    await db.execute(
+        text(f"ALTER TABLE {DEFAULT_PARTITION} DROP CONSTRAINT IF EXISTS {name}_excluded")
+    )
+
+
+async def _add_empty_partition(db: AsyncSession, month: date) -> bool:
+    """
+    Adds the partition of a month without keys, in short transactions;
+    False if another worker added it first. The
+    default partition gets a CHECK constraint excluding the month, added
+    NOT VALID and validated without blocking reads or writes, so that ATTACH
+    does not scan it while holding its ACCESS EXCLUSIVE lock. Until the
+    attach commits, inserting a key of that month fails.
+    """
+    excluded = f"{partition_name(KEYS_TABLE, month)}_excluded"
+    await lock_partitions(db, KEYS_TABLE)
+    if month in await list_partitions(db, KEYS_TABLE):
+        await db.commit()
+        return False
+    name = await _create_detached(db, month)
+    if not await _has_constraint(db, DEFAULT_PARTITION, excluded):
+        await db.execute(text(f"SET LOCAL lock_timeout = '{ATTACH_LOCK_TIMEOUT}'"))
+        await db.execute(
+            text(
+                f"ALTER TABLE {DEFAULT_PARTITION} ADD CONSTRAINT {excluded} "
+                f"CHECK (NOT ({_range_condition(month)})) NOT VALID"
+            )
+        )
+    await db.commit()
+    try:
+        await db.execute(text(f"ALTER TABLE {DEFAULT_PARTITION} VALIDATE CONSTRAINT {excluded}"))
+        await db.commit()
+        await lock_partitions(db, KEYS_TABLE)
+        await _attach(db, month, name)
+        await db.commit()
+        return True
+    except Exception:
+        # Keys of the month must not stay rejected until the next run
+        await db.rollback()
+        await db.execute(
+            text(f"ALTER TABLE {DEFAULT_PARTITION} DROP CONSTRAINT IF EXISTS {excluded}")
+        )
+        await db.commit()
+        raise
+
+
+async def _add_partition_with_keys(db: AsyncSession, month: date) -> bool:
+    """
+    Adds the partition of a month whose keys wait in the default partition;
+    False if another worker added it first.
+    They are moved in the attach transaction, so they never disappear from
+    `bootstrap_keys`; ATTACH then has to scan the default partition.
+    """
+    await lock_partitions(db, KEYS_TABLE)
+    if month in await list_partitions(db, KEYS_TABLE):
+        await db.commit()
+        return False
+    name = await _create_detached(db, month)
+    await db.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE expiration_date >= :lower AND expiration_date < :upper
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """
+        ),
+        {"lower": month_start(month), "upper": month_start(add_months(month, 1))},
+    )
+    await _attach(db, month, name)
+    await db.commit()
+    return True
+
+
+async def ensure_partitions(db: AsyncSession, months: Iterable[date]) -> list[date]:
+    """
+    Creates the missing monthly partitions among `months` and returns them.
+
+    Each partition is prepared detached and attached in a short transaction,
+    one month at a time; see `_add_empty_partition` and
+    `_add_partition_with_keys` for how the default partition's locks stay
+    brief. Key writes are never blocked for the duration of the whole run.
+    Commits.
+    """
+    await lock_partitions(db, KEYS_TABLE)
+    existing = set(await list_partitions(db, KEYS_TABLE))
+    missing = sorted(set(months) - existing)
+    waiting = set(await default_partition_months(db)) if missing else set()
+    await db.commit()
+    created = []
+    for month in missing:
+        add = _add_partition_with_keys if month in waiting else _add_empty_partition
+        if await add(db, month):
+            created.append(month)
+    return created
+
+
+async def expired_partitions(db: AsyncSession, before: datetime) -> list[date]:
+    """Months whose partition only holds keys expired before `before`, oldest first."""
+    return [
+        month
+        for month in await list_partitions(db, KEYS_TABLE)
+        if month_start(add_months(month, 1)) <= before
+    ]
+
+
+async def stream_partition(db: AsyncSession, month: date) -> AsyncIterator:
+    """
+    Yields the metadata of the keys expiring in `month`, `EXPORT_BATCH_SIZE`
+    rows at a time; the expiration bounds confine the scan to the month's
+    partition. Pages by id rather than through a server-side cursor, which
+    would keep the partition in use until the transaction ends.
+    """
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .where(models.BootstrapKey.expiration_date >= month_start(month))
+        .where(models.BootstrapKey.expiration_date < month_start(add_months(month, 1)))
+        .order_by(models.BootstrapKey.id)
+        .limit(EXPORT_BATCH_SIZE)
+    )
+    after_id = 0
+    while rows := (await db.execute(stmt.where(models.BootstrapKey.id > after_id))).all():
+        for row in rows:
+            yield row
+        after_id = rows[-1].id
+
+
+async def drop_partition(db: AsyncSession, month: date) -> None:
+    """
+    Retention: drops the partition of `month` as a whole, instead of deleting
+    its keys row by row, together with their `key_group_stats` buckets.
+    Commits.
+    """
+    await lock_partitions(db, KEYS_TABLE)
+    stats = models.KeyGroupStats
+    await db.execute(
+        delete(stats)
+        .where(stats.expiration_hour >= month_start(month))
+        .where(stats.expiration_hour < month_start(add_months(month, 1)))
+    )
+    name = partition_name(KEYS_TABLE, month)
+    await db.execute(text(f"ALTER TABLE {KEYS_TABLE} DETACH PARTITION {name}"))
+    await db.execute(text(f"DROP TABLE {name}"))
+    await bump_version(db, BOOTSTRAP_KEYS)
+    await db.commit()
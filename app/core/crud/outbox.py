@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import models
+from app.core.settings import get_settings
+
+settings = get_settings()
+
+DEVICE_PROVISIONED = "device.provisioned"
+DEVICE_REVOKED = "device.revoked"
+DEVICE_CERTIFICATE_ROTATED = "device.certificate_rotated"
+DEVICE_CERTIFICATE_DEACTIVATED = "device.certificate_deactivated"
+KEY_CREATED = "key.created"
+KEY_STATUS_CHANGED = "key.status_changed"
+KEY_DELETED = "key.deleted"
+KEYS_IMPORTED = "keys.imported"
+
+
+async def emit_events(db: AsyncSession, events: list[tuple[str, dict]]) -> None:
+    """
+    Queues `(event_type, payload)` events for delivery. Payloads must be
+    JSON serializable. A no-op while no outbox sink is configured.
+
+    Does *not* commit: callers run it in the transaction of the change the
+    events describe, so an event exists if and only if its change does.
+    """
+    if not events or not settings.OUTBOX_SINKS:
+        return
+    await db.execute(
+        insert(models.OutboxEvent),
+        [{"event_type": event_type, "payload": payload} for event_type, payload in events],
+    )
+
+
+async def emit_event(db: AsyncSession, event_type: str, payload: dict) -> None:
+    """Queues one event, see `emit_events`. Does *not* commit."""
+    await emit_events(db, [(event_type, payload)])
+
+
+async def claim_batch(db: AsyncSession, limit: int) -> list[models.OutboxEvent]:
+    """
+    Locks the next due events, oldest first, leaving dead letters out. SKIP
+    LOCKED lets every worker run a dispatcher without two of them delivering
+    the same batch.
+    """
+    result = await db.execute(
+        select(models.OutboxEvent)
+        .where(models.OutboxEvent.delivered_date.is_(None))
+        .where(models.OutboxEvent.dead_lettered_date.is_(None))
+        .where(models.OutboxEvent.next_attempt_date <= func.now())
+        .order_by(models.OutboxEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return list(result.scalars().all())
+
+
+async def mark_delivered(db: AsyncSession, event_ids: list[int]) -> None:
+    """Does *not* commit."""
+    await db.execute(
+        update(models.OutboxEvent)
+        .where(models.OutboxEvent.id.in_(event_ids))
+        .values(delivered_date=datetime.now(timezone.utc), last_error=None)
+    )
+
+
+async def mark_failed(
+    db: AsyncSession,
+    event_ids: list[int],
+    error: str,
+    retry_base: float,
+    retry_max: float,
+    max_attempts: int,
+) -> list[int]:
+    """
+    Schedules another attempt with exponential backoff: `retry_base` seconds
+    doubled per previous attempt, capped at `retry_max`. Events reaching
+    `max_attempts` are dead-lettered instead; their ids are returned. Does
+    *not* commit.
+    """
+    delay = func.least(retry_base * func.power(2, models.OutboxEvent.attempts), retry_max)
+    result = await db.execute(
+        update(models.OutboxEvent)
+        .where(models.OutboxEvent.id.in_(event_ids))
+        .values(
+            attempts=models.OutboxEvent.attempts + 1,
+            last_error=error[:1024],
+            next_attempt_date=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, delay),
+            dead_lettered_date=case(
+                (models.OutboxEvent.attempts + 1 >= max_attempts, func.now()), else_=None
+            ),
+        )
+        .returning(models.OutboxEvent.id, models.OutboxEvent.dead_lettered_date)
+    )
+    return [event_id for event_id, dead_lettered_date in result.all() if dead_lettered_date]
+
+
+async def count_dead_letters(db: AsyncSession) -> int:
+    return await db.scalar(
+        select(func.count())
+        .select_from(models.OutboxEvent)
+        .where(models.OutboxEvent.dead_lettered_date.is_not(None))
+    )
+
+
+async def get_dead_letters(db: AsyncSession, limit: int) -> list[models.OutboxEvent]:
+    """Dead-lettered events, oldest first."""
+    result = await db.execute(
+        select(models.OutboxEvent)
+        .where(models.OutboxEvent.dead_lettered_date.is_not(None))
+        .order_by(models.OutboxEvent.id)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def requeue_dead_letters(db: AsyncSession, event_ids: list[int] | None = None) -> int:
+    """
+    Makes dead letters (all of them when `event_ids` is None) due again with
+    a fresh attempt budget; returns how many were requeued. Does *not* commit.
+    """
+    stmt = (
+        update(models.OutboxEvent)
+        .where(models.OutboxEvent.dead_lettered_date.is_not(None))
+        .values(attempts=0, dead_lettered_date=None, next_attempt_date=func.now())
+    )
+    if event_ids is not None:
+        stmt = stmt.where(models.OutboxEvent.id.in_(event_ids))
+    result = await db.execute(stmt)
+    return result.rowcount
+
+
+async def delete_delivered(db: AsyncSession, retention_seconds: float) -> int:
+    """Drops events delivered longer ago than the retention. Does *not* commit."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention_seconds)
+    result = await db.execute(
+        delete(models.OutboxEvent).where(models.OutboxEvent.delivered_date < cutoff)
+    )
+    return result.rowcount
@@ -0,0 +1,61 @@
+"""
+Helpers shared by the tables range-partitioned by month, whose partitions
+are named `<table>_yYYYYmMM`.
+"""
+
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_bounds(month: date) -> str:
+    """`FOR VALUES` clause of a monthly partition, with UTC bounds."""
+    return (
+        f"FROM ('{month.isoformat()} 00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00+00')"
+    )
+
+
+async def lock_partitions(db: AsyncSession, table: str) -> None:
+    """Serializes partition DDL on `table` across workers until the transaction ends."""
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:table))"), {"table": table})
+
+
+async def is_partitioned(db: AsyncSession, table: str) -> bool:
+    result = await db.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    )
+    return result.scalar() == "p"
+
+
+async def list_partitions(db: AsyncSession, table: str) -> list[date]:
+    """Months of `table` that have a partition, oldest first."""
+    result = await db.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :table
+            """
+        ),
+        {"table": table},
+    )
+    pattern = re.compile(rf"^{re.escape(table)}_y(\d{{4}})m(\d{{2}})$")
+    months = []
+    for (name,) in result:
+        match = pattern.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
@@ -0,0 +1,48 @@
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import models
+from app.core.schemas import schemas
+
+
+class ReconcileJobNotFoundError(Exception):
+    pass
+
+
+async def create_reconcile_job(db: AsyncSession, dry_run: bool) -> models.ReconcileJob:
+    job = models.ReconcileJob(dry_run=dry_run, status="pending")
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_reconcile_job(db: AsyncSession, job_id: int) -> models.ReconcileJob:
+    job = await db.get(models.ReconcileJob, job_id)
+    if job is None:
+        raise ReconcileJobNotFoundError(f"Reconcile job with id {job_id} not found")
+    return job
+
+
+async def update_reconcile_job(
+    db: AsyncSession,
+    job_id: int,
+    status: str,
+    report: schemas.CertificateReconcileReport | None = None,
+    error: str | None = None,
+) -> None:
+    """Records a job's status and, when given, the progress of its report; commits."""
+    values = {"status": status, "error": error}
+    if report is not None:
+        values.update(
+            scanned=report.scanned,
+            unattached=report.unattached,
+            revoked=report.revoked,
+            deleted=report.deleted,
+            failed=report.failed,
+            certificates=[c.model_dump(mode="json") for c in report.certificates],
+        )
+    await db.execute(
+        update(models.ReconcileJob).where(models.ReconcileJob.id == job_id).values(**values)
+    )
+    await db.commit()
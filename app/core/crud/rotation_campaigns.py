@@ -0,0 +1,370 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.crud.outbox import (
+    DEVICE_CERTIFICATE_DEACTIVATED,
+    DEVICE_CERTIFICATE_ROTATED,
+    emit_event,
+    emit_events,
+)
+from app.core.db import models
+
+
+class RotationCampaignNotFoundError(Exception):
+    pass
+
+
+def _selected(campaign: models.RotationCampaign):
+    """Registrations whose certificate the campaign replaces."""
+    conditions = [
+        models.DeviceRegistration.registered_date < campaign.registered_before,
+        models.DeviceRegistration.revoked_date.is_(None),
+    ]
+    if campaign.key_group is not None:
+        conditions.append(models.DeviceRegistration.key_group == campaign.key_group)
+    return and_(*conditions)
+
+
+async def create_campaign(
+    db: AsyncSession,
+    key_group: str | None,
+    min_age_days: int,
+    tps: float,
+    grace_period_s: float,
+) -> models.RotationCampaign:
+    """
+    Creates a campaign over the registrations of `key_group` (any group when
+    None) that are at least `min_age_days` old. The selection is frozen at
+    creation: devices registered afterwards are not rotated.
+    """
+    now = await db.scalar(select(func.now()))
+    campaign = models.RotationCampaign(
+        key_group=key_group,
+        registered_before=now - timedelta(days=min_age_days),
+        tps=tps,
+        grace_period_s=grace_period_s,
+        status="issuing",
+    )
+    campaign.total = await db.scalar(
+        select(func.count())
+        .select_from(models.DeviceRegistration)
+        .where(_selected(campaign))
+        .where(models.DeviceRegistration.replaced_date.is_(None))
+    )
+    db.add(campaign)
+    await db.commit()
+    await db.refresh(campaign)
+    return campaign
+
+
+async def get_campaign(db: AsyncSession, campaign_id: int) -> models.RotationCampaign:
+    campaign = await db.get(models.RotationCampaign, campaign_id)
+    if campaign is None:
+        raise RotationCampaignNotFoundError(f"Rotation campaign with id {campaign_id} not found")
+    return campaign
+
+
+async def get_campaigns(db: AsyncSession) -> list[models.RotationCampaign]:
+    result = await db.execute(
+        select(models.RotationCampaign).order_by(models.RotationCampaign.id.desc())
+    )
+    return list(result.scalars().all())
+
+
+async def due_campaign_ids(db: AsyncSession) -> list[int]:
+    """Unfinished campaigns no worker currently holds."""
+    result = await db.execute(
+        select(models.RotationCampaign.id)
+        .where(models.RotationCampaign.status != "completed")
+        .where(
+            or_(
+                models.RotationCampaign.lease_expires.is_(None),
+                models.RotationCampaign.lease_expires < func.now(),
+            )
+        )
+        .order_by(models.RotationCampaign.id)
+    )
+    return list(result.scalars().all())
+
+
+async def claim_campaign(
+    db: AsyncSession, campaign_id: int, lease_seconds: float
+) -> models.RotationCampaign | None:
+    """
+    Takes the campaign's lease unless another worker holds an unexpired one.
+    The conditional UPDATE makes concurrent claims safe; a crashed worker's
+    lease simply runs out.
+    """
+    result = await db.execute(
+        update(models.RotationCampaign)
+        .where(models.RotationCampaign.id == campaign_id)
+        .where(models.RotationCampaign.status != "completed")
+        .where(
+            or_(
+                models.RotationCampaign.lease_expires.is_(None),
+                models.RotationCampaign.lease_expires < func.now(),
+            )
+        )
+        .values(lease_expires=func.now() + timedelta(seconds=lease_seconds))
+        .returning(models.RotationCampaign.id)
+    )
+    claimed = result.scalar_one_or_none() is not None
+    await db.commit()
+    if not claimed:
+        return None
+    return await get_campaign(db, campaign_id)
+
+
+async def pending_registrations(
+    db: AsyncSession,
+    campaign: models.RotationCampaign,
+    after_id: int,
+    limit: int,
+    max_attempts: int,
+) -> list[models.DeviceRegistration]:
+    """
+    Next selected registrations not replaced yet, in id order (keyset
+    pagination), skipping those that failed `max_attempts` times and those
+    with a pending rotation to settle first.
+    """
+    exhausted = (
+        select(models.CertificateRotation.registration_id)
+        .where(models.CertificateRotation.campaign_id == campaign.id)
+        .where(
+            or_(
+                and_(
+                    models.CertificateRotation.status == "failed",
+                    models.CertificateRotation.attempts >= max_attempts,
+                ),
+                models.CertificateRotation.status == "pending",
+            )
+        )
+    )
+    result = await db.execute(
+        select(models.DeviceRegistration)
+        .where(_selected(campaign))
+        .where(models.DeviceRegistration.replaced_date.is_(None))
+        .where(models.DeviceRegistration.id.not_in(exhausted))
+        .where(models.DeviceRegistration.id > after_id)
+        .order_by(models.DeviceRegistration.id)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+def _upsert_rotation(campaign_id: int, registration: models.DeviceRegistration, **values):
+    stmt = insert(models.CertificateRotation).values(
+        campaign_id=campaign_id,
+        registration_id=registration.id,
+        device_id=registration.device_id,
+        old_certificate_id=registration.certificate_id,
+        region=registration.region,
+        attempts=1,
+        **values,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["campaign_id", "registration_id"],
+        set_={"attempts": models.CertificateRotation.attempts + 1, **values},
+    )
+
+
+def _update_rotation(campaign_id: int, registration: models.DeviceRegistration, **values):
+    return (
+        update(models.CertificateRotation)
+        .where(models.CertificateRotation.campaign_id == campaign_id)
+        .where(models.CertificateRotation.registration_id == registration.id)
+        .values(**values)
+    )
+
+
+async def record_pending(
+    db: AsyncSession,
+    campaign_id: int,
+    registration: models.DeviceRegistration,
+    certificate_id: str,
+) -> None:
+    """
+    Checkpoints a replacement certificate before its job is created, so a
+    worker crashing in between leaves a record of it to settle. Counts as an
+    attempt. Does *not* commit.
+    """
+    await db.execute(
+        _upsert_rotation(
+            campaign_id,
+            registration,
+            new_certificate_id=certificate_id,
+            status="pending",
+            error=None,
+        )
+    )
+
+
+async def pending_rotations(
+    db: AsyncSession, campaign: models.RotationCampaign
+) -> list[tuple[models.CertificateRotation, models.DeviceRegistration]]:
+    """Rotations whose delivery was not recorded, with the registration they replace."""
+    result = await db.execute(
+        select(models.CertificateRotation, models.DeviceRegistration)
+        .join(
+            models.DeviceRegistration,
+            models.DeviceRegistration.id == models.CertificateRotation.registration_id,
+        )
+        .where(models.CertificateRotation.campaign_id == campaign.id)
+        .where(models.CertificateRotation.status == "pending")
+        .order_by(models.CertificateRotation.id)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def record_issued(
+    db: AsyncSession,
+    campaign_id: int,
+    registration: models.DeviceRegistration,
+    certificate_id: str,
+) -> None:
+    """
+    Checkpoints a pending rotation whose job was created: the old
+    registration is marked replaced and the new certificate inherits its key
+    provenance, so a bulk revocation by key still covers rotated devices.
+    Does *not* commit.
+    """
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        _update_rotation(campaign_id, registration, status="issued", error=None, issued_date=now)
+    )
+    db.add(
+        models.DeviceRegistration(
+            device_id=registration.device_id,
+            certificate_id=certificate_id,
+            region=registration.region,
+            key_id=registration.key_id,
+            key_group=registration.key_group,
+        )
+    )
+    registration.replaced_date = now
+    await emit_event(
+        db,
+        DEVICE_CERTIFICATE_ROTATED,
+        {
+            "device_id": registration.device_id,
+            "old_certificate_id": registration.certificate_id,
+            "certificate_id": certificate_id,
+            "region": registration.region,
+            "campaign_id": campaign_id,
+        },
+    )
+
+
+async def record_failure(
+    db: AsyncSession,
+    campaign_id: int,
+    registration: models.DeviceRegistration,
+    error: str,
+    new_attempt: bool = True,
+) -> None:
+    """
+    `new_attempt` is False when failing a pending rotation, already counted.
+    Does *not* commit.
+    """
+    if new_attempt:
+        stmt = _upsert_rotation(campaign_id, registration, status="failed", error=error[:1024])
+    else:
+        stmt = _update_rotation(campaign_id, registration, status="failed", error=error[:1024])
+    await db.execute(stmt)
+
+
+async def due_deactivations(
+    db: AsyncSession, campaign: models.RotationCampaign, after_id: int, limit: int
+) -> list[models.CertificateRotation]:
+    """Issued rotations whose grace period is over, in id order (keyset pagination)."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=campaign.grace_period_s)
+    result = await db.execute(
+        select(models.CertificateRotation)
+        .where(models.CertificateRotation.campaign_id == campaign.id)
+        .where(models.CertificateRotation.status == "issued")
+        .where(models.CertificateRotation.issued_date <= cutoff)
+        .where(models.CertificateRotation.id > after_id)
+        .order_by(models.CertificateRotation.id)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def mark_deactivated(db: AsyncSession, rotations: list[models.CertificateRotation]) -> None:
+    """Does *not* commit."""
+    if not rotations:
+        return
+    await db.execute(
+        update(models.CertificateRotation)
+        .where(models.CertificateRotation.id.in_([r.id for r in rotations]))
+        .values(status="deactivated", deactivated_date=datetime.now(timezone.utc))
+    )
+    await emit_events(
+        db,
+        [
+            (
+                DEVICE_CERTIFICATE_DEACTIVATED,
+                {
+                    "device_id": r.device_id,
+                    "certificate_id": r.old_certificate_id,
+                    "region": r.region,
+                    "campaign_id": r.campaign_id,
+                },
+            )
+            for r in rotations
+        ],
+    )
+
+
+async def mark_stalled(
+    db: AsyncSession, rotations: list[tuple[models.CertificateRotation, str]]
+) -> None:
+    """
+    Records rotations whose job ended without the device switching, with
+    the job status, once their new certificate was discarded: its
+    registration is deleted and the old one, still in use, is no longer
+    marked replaced. Does *not* commit.
+    """
+    for rotation, job_status in rotations:
+        await db.execute(
+            update(models.CertificateRotation)
+            .where(models.CertificateRotation.id == rotation.id)
+            .values(status="stalled", error=f"Rotation job {job_status}")
+        )
+        await db.execute(
+            delete(models.DeviceRegistration).where(
+                models.DeviceRegistration.certificate_id == rotation.new_certificate_id
+            )
+        )
+        await db.execute(
+            update(models.DeviceRegistration)
+            .where(models.DeviceRegistration.id == rotation.registration_id)
+            .values(replaced_date=None)
+        )
+
+
+async def update_progress(
+    db: AsyncSession, campaign: models.RotationCampaign, max_attempts: int
+) -> None:
+    """
+    Recomputes the campaign counters from its checkpoints. Does *not* commit.
+    """
+    result = await db.execute(
+        select(
+            func.count().filter(
+                models.CertificateRotation.status.in_(("issued", "deactivated", "stalled"))
+            ),
+            func.count().filter(models.CertificateRotation.status == "deactivated"),
+            func.count().filter(models.CertificateRotation.status == "stalled"),
+            func.count().filter(
+                and_(
+                    models.CertificateRotation.status == "failed",
+                    models.CertificateRotation.attempts >= max_attempts,
+                )
+            ),
+        ).where(models.CertificateRotation.campaign_id == campaign.id)
+    )
+    campaign.rotated, campaign.deactivated, campaign.stalled, campaign.failed = result.one()
@@ -1,12 +1,39 @@
+import time
+
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.core import metrics
 from app.core.settings import get_settings
+from app.core.tracing import instrument_engine, tracer
 
 settings = get_settings()
 DATABASE_URL = settings.sqlalchemy_postgres_uri.unicode_string()
 
-engine = create_async_engine(DATABASE_URL, pool_pre_ping=True)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Default async pool that records how long each checkout waits for a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            with tracer.start_as_current_span("db.pool.checkout"):
+                return super()._do_get()
+        finally:
+            metrics.DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+engine = create_async_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+)
+instrument_engine(engine.sync_engine)
 SessionLocal = async_sessionmaker(
     autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
 )
@@ -1,21 +1,53 @@
-
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, func
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    Sequence,
+    String,
+    event,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 
 from app.core.db.database import Base
 
+bootstrap_keys_id_seq = Sequence("bootstrap_keys_id_seq")
+
 
 class BootstrapKey(Base):
     """
     SQLAlchemy model for storing bootstrap keys.
     We store a hash of the key for security, not the raw key.
+
+    Range partitioned by expiration month, so queries restricted to unexpired
+    keys skip the partitions of past lots and fully expired partitions are
+    dropped whole (see `app.core.key_retention`). Keys outside the monthly
+    partitions land in the default partition until one is created for them.
     """
 
     __tablename__ = "bootstrap_keys"
+    __table_args__ = (
+        # The partition key must be part of the primary key
+        PrimaryKeyConstraint("id", "expiration_date"),
+        # Key validation: active keys by hint
+        Index("ix_bootstrap_keys_active_key_hint", "key_hint", postgresql_where=text("is_active")),
+        {"postgresql_partition_by": "RANGE (expiration_date)"},
+    )
+    # ids are unique on their own (sequence): the ORM identifies keys by id
+    __mapper_args__ = {"primary_key": ["id"]}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, bootstrap_keys_id_seq, server_default=bootstrap_keys_id_seq.next_value())
 
     # We store a secure hash of the key, not the key itself.
-    key_hash = Column(String, unique=True, index=True, nullable=False)
+    # Not unique: uniqueness across partitions would need the partition key
+    key_hash = Column(String, index=True, nullable=False)
 
     # Store the last 4 chars for easy identification in admin UIs
     key_hint = Column(String(4), nullable=False)
@@ -24,6 +56,359 @@ class BootstrapKey(Base):
 
     created_date = Column(DateTime(timezone=True), server_default=func.now())
 
-    expiration_date = Column(DateTime(timezone=True), nullable=True)
+    expiration_date = Column(DateTime(timezone=True), nullable=False)
 
     is_active = Column(Boolean, default=True, nullable=False, index=True)
+
+    # Set by the first successful registration made with this key
+    last_used_date = Column(DateTime(timezone=True), nullable=True)
+
+
+# Catch-all partition: inserts never fail for lack of a monthly partition
+event.listen(
+    BootstrapKey.__table__,
+    "after_create",
+    DDL("CREATE TABLE bootstrap_keys_default PARTITION OF bootstrap_keys DEFAULT"),
+)
+
+
+class ChangeVersion(Base):
+    """
+    Monotonic change counter per resource (e.g. "bootstrap_keys", "devices").
+    Bumped in the same transaction as every write so list endpoints can serve
+    ETags / 304s without reading the rows themselves.
+    """
+
+    __tablename__ = "change_versions"
+
+    resource = Column(String(64), primary_key=True)
+
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class KeyGroupStats(Base):
+    """
+    Incrementally maintained key counters per group and expiration hour.
+
+    Kept up to date by the bootstrap key CRUD functions in the same transaction
+    as the key change. Bucketing by expiration hour lets "expired" be derived at
+    read time from this small table instead of scanning `bootstrap_keys`.
+    """
+
+    __tablename__ = "key_group_stats"
+    __table_args__ = (
+        Index(
+            "ux_key_group_stats_bucket",
+            "key_group",
+            "expiration_hour",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    key_group = Column(String, nullable=True)
+
+    # date_trunc('hour', expiration_date) in UTC, NULL for keys that never expire
+    expiration_hour = Column(DateTime(timezone=True), nullable=True)
+
+    active_count = Column(BigInteger, nullable=False, default=0)
+
+    inactive_count = Column(BigInteger, nullable=False, default=0)
+
+    used_count = Column(BigInteger, nullable=False, default=0)
+
+
+class AuthFailureBucket(Base):
+    """
+    Failed-authentication token buckets shared by all workers (shared
+    throttling mode). UNLOGGED: counters are cheap to lose on a crash.
+    """
+
+    __tablename__ = "auth_failure_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    # e.g. "ip:10.0.0.1" or "hint:abcd"
+    key = Column(String(128), primary_key=True)
+
+    tokens = Column(Float, nullable=False)
+
+    updated_date = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class DeviceRegistration(Base):
+    """
+    Provenance of every certificate issued at registration: which bootstrap
+    key onboarded which device. Lets all devices onboarded with a leaked key
+    (or key group) be found and revoked.
+    """
+
+    __tablename__ = "device_registrations"
+
+    id = Column(BigInteger, primary_key=True)
+
+    device_id = Column(String, index=True, nullable=False)
+
+    certificate_id = Column(String, unique=True, nullable=False)
+
+    # Region the certificate was issued in
+    region = Column(String, nullable=False)
+
+    # No foreign key: provenance must outlive deleted keys
+    key_id = Column(Integer, index=True, nullable=False)
+
+    key_group = Column(String, index=True, nullable=True)
+
+    registered_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # Set once the certificate has been revoked
+    revoked_date = Column(DateTime(timezone=True), nullable=True)
+
+    # Set once a rotation issued the certificate replacing this one
+    replaced_date = Column(DateTime(timezone=True), nullable=True)
+
+
+class RevocationJob(Base):
+    """
+    Bulk revocation of the certificates issued under a key or a key group.
+    Progress counters are committed as the job runs; an interrupted job is
+    resumed by running it again (revoked registrations are skipped).
+    """
+
+    __tablename__ = "revocation_jobs"
+
+    id = Column(Integer, primary_key=True)
+
+    # Exactly one of key_id / key_group is set
+    key_id = Column(Integer, nullable=True)
+
+    key_group = Column(String, nullable=True)
+
+    # "pending", "running", "completed" or "incomplete" (some revocations
+    # failed and are retried when the job is resumed)
+    status = Column(String(16), nullable=False, default="pending")
+
+    total = Column(Integer, nullable=False, default=0)
+
+    revoked = Column(Integer, nullable=False, default=0)
+
+    failed = Column(Integer, nullable=False, default=0)
+
+    created_date = Column(DateTime(timezone=True), server_default=func.now())
+
+    updated_date = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ReconcileJob(Base):
+    """
+    Certificate reconciliation started through the admin API. Counters and
+    the (capped) report are committed after each page of certificates.
+    """
+
+    __tablename__ = "reconcile_jobs"
+
+    id = Column(Integer, primary_key=True)
+
+    dry_run = Column(Boolean, nullable=False)
+
+    # "pending", "running", "completed", "failed", "skipped" (another pass
+    # held the reconciler lock) or "interrupted" (the worker shut down)
+    status = Column(String(16), nullable=False, default="pending")
+
+    scanned = Column(Integer, nullable=False, default=0)
+
+    unattached = Column(Integer, nullable=False, default=0)
+
+    revoked = Column(Integer, nullable=False, default=0)
+
+    deleted = Column(Integer, nullable=False, default=0)
+
+    failed = Column(Integer, nullable=False, default=0)
+
+    # ReconciledCertificate entries, at most CERT_RECONCILER_REPORT_LIMIT
+    certificates = Column(JSONB, nullable=False, default=list)
+
+    error = Column(String, nullable=True)
+
+    created_date = Column(DateTime(timezone=True), server_default=func.now())
+
+    updated_date = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class RotationCampaign(Base):
+    """
+    Fleet certificate rotation: replaces the certificates of the registrations
+    selected by key group and age, then deactivates the old ones once the
+    grace period has passed. Driven in steps by the rotation scheduler; the
+    lease keeps two workers from running the same campaign at once.
+    """
+
+    __tablename__ = "rotation_campaigns"
+
+    id = Column(Integer, primary_key=True)
+
+    # Selection: registrations of this key group (any when NULL) made before
+    key_group = Column(String, nullable=True)
+
+    registered_before = Column(DateTime(timezone=True), nullable=False)
+
+    # Replacement certificates issued per second
+    tps = Column(Float, nullable=False)
+
+    grace_period_s = Column(Float, nullable=False)
+
+    # "issuing", "grace" (waiting to deactivate old certificates) or "completed"
+    status = Column(String(16), nullable=False, default="issuing", index=True)
+
+    lease_expires = Column(DateTime(timezone=True), nullable=True)
+
+    total = Column(Integer, nullable=False, default=0)
+
+    rotated = Column(Integer, nullable=False, default=0)
+
+    deactivated = Column(Integer, nullable=False, default=0)
+
+    # Rotated devices whose job failed: their old certificate stays active
+    stalled = Column(Integer, nullable=False, default=0)
+
+    failed = Column(Integer, nullable=False, default=0)
+
+    created_date = Column(DateTime(timezone=True), server_default=func.now())
+
+    updated_date = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CertificateRotation(Base):
+    """
+    Checkpoint of one device in a rotation campaign.
+    """
+
+    __tablename__ = "certificate_rotations"
+    __table_args__ = (
+        Index(
+            "ux_certificate_rotations_registration", "campaign_id", "registration_id", unique=True
+        ),
+        Index("ix_certificate_rotations_status", "campaign_id", "status", "issued_date"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+
+    campaign_id = Column(Integer, nullable=False)
+
+    # The device_registrations row of the certificate being replaced
+    registration_id = Column(BigInteger, nullable=False)
+
+    device_id = Column(String, nullable=False)
+
+    old_certificate_id = Column(String, nullable=False)
+
+    new_certificate_id = Column(String, nullable=True)
+
+    region = Column(String, nullable=False)
+
+    # "pending" (certificate issued, job not created yet), "issued", "deactivated",
+    # "stalled" (the job ended without the device switching) or "failed"
+    # (issuing failed `attempts` times)
+    status = Column(String(16), nullable=False)
+
+    attempts = Column(Integer, nullable=False, default=0)
+
+    error = Column(String, nullable=True)
+
+    issued_date = Column(DateTime(timezone=True), nullable=True)
+
+    deactivated_date = Column(DateTime(timezone=True), nullable=True)
+
+
+class OutboxEvent(Base):
+    """
+    Transactional outbox: events for downstream systems (MES, billing...)
+    written in the same transaction as the change they describe, then
+    delivered in batches by the outbox dispatcher, at least once.
+    """
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index(
+            "ix_outbox_events_pending",
+            "next_attempt_date",
+            "id",
+            postgresql_where=text("delivered_date IS NULL AND dead_lettered_date IS NULL"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+
+    # e.g. "device.provisioned", "key.created"
+    event_type = Column(String(64), nullable=False)
+
+    payload = Column(JSONB, nullable=False)
+
+    created_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    next_attempt_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    attempts = Column(Integer, nullable=False, default=0)
+
+    last_error = Column(String, nullable=True)
+
+    delivered_date = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    # Set when delivery failed OUTBOX_MAX_ATTEMPTS times; cleared by a requeue
+    dead_lettered_date = Column(DateTime(timezone=True), nullable=True)
+
+
+audit_log_id_seq = Sequence("audit_log_id_seq")
+
+
+class AuditRecord(Base):
+    """
+    Audit trail of admin requests and registration attempts.
+
+    Range partitioned by month on `created_date` (partitions are created
+    ahead by the audit writer, which also drops those past the retention)
+    and written in batches with COPY. The id comes from a sequence default
+    so COPY can fill it; it only orders records created in the same instant.
+    """
+
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_key_id", "key_id", "created_date"),
+        Index("ix_audit_log_key_hint", "key_hint", "created_date"),
+        Index("ix_audit_log_device_id", "device_id", "created_date"),
+        # Rows arrive in time order: a BRIN index serves time windows at a tiny size
+        Index("ix_audit_log_created_date", "created_date", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_date)"},
+    )
+
+    # The partition key must be part of the primary key
+    created_date = Column(DateTime(timezone=True), primary_key=True)
+
+    id = Column(
+        BigInteger,
+        audit_log_id_seq,
+        server_default=audit_log_id_seq.next_value(),
+        primary_key=True,
+    )
+
+    # "registration" or "admin"
+    category = Column(String(16), nullable=False)
+
+    # e.g. "register", "register_batch" or "DELETE /private/v1/admin/keys/{key_id}"
+    action = Column(String(255), nullable=False)
+
+    # Registration outcome (e.g. "provisioned", "invalid_key") or HTTP status
+    outcome = Column(String(32), nullable=False)
+
+    key_id = Column(Integer, nullable=True)
+
+    key_hint = Column(String(4), nullable=True)
+
+    device_id = Column(String, nullable=True)
+
+    client_ip = Column(String(64), nullable=True)
+
+    request_id = Column(String(128), nullable=True)
+
+    detail = Column(JSONB, nullable=True)
@@ -1,4 +1,27 @@
 from app.core.db.database import Base
-from app.core.db.models import BootstrapKey
+from app.core.db.models import (
+    AuditRecord,
+    AuthFailureBucket,
+    BootstrapKey,
+    CertificateRotation,
+    ChangeVersion,
+    DeviceRegistration,
+    KeyGroupStats,
+    OutboxEvent,
+    RevocationJob,
+    RotationCampaign,
+)
 
-__all__ = ["Base", "BootstrapKey"]
+__all__ = [
+    "Base",
+    "AuditRecord",
+    "AuthFailureBucket",
+    "BootstrapKey",
+    "CertificateRotation",
+    "ChangeVersion",
+    "DeviceRegistration",
+    "KeyGroupStats",
+    "OutboxEvent",
+    "RevocationJob",
+    "RotationCampaign",
+]
@@ -0,0 +1,191 @@
+"""
+Alembic helpers for schema changes applied while the service takes traffic.
+
+Use them from migrations run with `alembic -x online=true upgrade head`
+(see `alembic/env.py`), which commits each migration separately and sets a
+short lock timeout for ordinary DDL. Every helper runs outside the migration
+transaction and can be re-run after an interruption.
+"""
+
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from alembic import op
+
+logger = logging.getLogger("alembic.online_migrations")
+
+# Seconds between two progress log lines of a backfill
+PROGRESS_INTERVAL_S = 10.0
+
+
+def _relkind(bind: Connection, name: str) -> str | None:
+    return bind.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+
+
+def _partitions(bind: Connection, table: str) -> list[str]:
+    return list(
+        bind.execute(
+            text(
+                """
+                SELECT inhrelid::regclass::text FROM pg_inherits
+                WHERE inhparent = to_regclass(:table) ORDER BY 1
+                """
+            ),
+            {"table": table},
+        ).scalars()
+    )
+
+
+def _index_is_valid(bind: Connection, name: str) -> bool | None:
+    """None when the index does not exist."""
+    return bind.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+
+
+def _run_concurrently(bind: Connection, statement: str) -> None:
+    """
+    Runs a CONCURRENTLY index statement with `lock_timeout` disabled: it
+    waits for every older transaction to end, and the session's short
+    timeout would cut that wait and leave an invalid index. The timeout is
+    restored for the ordinary DDL that follows.
+    """
+    lock_timeout = bind.exec_driver_sql("SHOW lock_timeout").scalar()
+    bind.exec_driver_sql("SET lock_timeout = 0")
+    try:
+        bind.exec_driver_sql(statement)
+    finally:
+        bind.exec_driver_sql(f"SET lock_timeout = '{lock_timeout}'")
+
+
+def _index_definition(table: str, columns: list[str], unique: bool, where: str | None) -> str:
+    definition = f"INDEX {{name}} ON {{only}}{table} ({', '.join(columns)})"
+    if unique:
+        definition = "UNIQUE " + definition
+    return definition + (f" WHERE {where}" if where else "")
+
+
+def _build_index(
+    bind: Connection, name: str, table: str, columns: list[str], unique: bool, where: str | None
+) -> None:
+    definition = _index_definition(table, columns, unique, where)
+    if _relkind(bind, table) == "p":
+        # Partitioned indexes cannot be built concurrently: create the parent
+        # index on the parent only (instant, invalid), build one index per
+        # partition concurrently and attach it; the parent index turns valid
+        # once every partition has one.
+        bind.exec_driver_sql(
+            "CREATE " + definition.format(name=f"IF NOT EXISTS {name}", only="ONLY ")
+        )
+        for partition in _partitions(bind, table):
+            child = f"{partition}_{name}"[:63]
+            _build_index(bind, child, partition, columns, unique, where)
+            attached = bind.execute(
+                text("SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:child)"),
+                {"child": child},
+            ).scalar()
+            if not attached:
+                bind.exec_driver_sql(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+        return
+
+    valid = _index_is_valid(bind, name)
+    if valid:
+        return
+    if valid is not None:
+        # Left invalid by an interrupted concurrent build
+        logger.info("Rebuilding invalid index %s", name)
+        _run_concurrently(bind, f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    logger.info("Building index %s on %s", name, table)
+    _run_concurrently(bind, "CREATE " + definition.format(name=f"CONCURRENTLY {name}", only=""))
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: list[str],
+    unique: bool = False,
+    where: str | None = None,
+) -> None:
+    """
+    Builds an index without blocking writes to `table` (CREATE INDEX
+    CONCURRENTLY), partition by partition on partitioned tables. `columns`
+    and `where` are SQL expressions. An existing valid index is kept; an
+    invalid one, left by an interrupted build, is rebuilt.
+    """
+    with op.get_context().autocommit_block():
+        _build_index(op.get_bind(), name, table, columns, unique, where)
+
+
+def drop_index_concurrently(name: str) -> None:
+    """
+    Drops an index without blocking writes. Partitioned indexes cannot be
+    dropped concurrently; they are dropped normally, which waits for
+    `lock_timeout` at most.
+    """
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        if _relkind(bind, name) == "I":
+            bind.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        else:
+            _run_concurrently(bind, f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def backfill(
+    table: str,
+    set_clause: str,
+    where: str | None = None,
+    key: str = "id",
+    batch_size: int = 5000,
+    pause: float = 0.1,
+) -> int:
+    """
+    Runs `UPDATE table SET set_clause [WHERE where]` in batches of at most
+    `batch_size` rows by ascending integer `key`, each batch committing on its own
+    so row locks are held briefly and replicas keep up. Sleeps `pause`
+    seconds between batches to leave headroom to the service, and logs
+    progress (share of the key range done, rows per second) as it goes.
+
+    `where` should exclude rows already backfilled, so an interrupted
+    backfill can simply be run again. Returns the number of rows updated.
+    """
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        first, last = bind.execute(text(f"SELECT min({key}), max({key}) FROM {table}")).one()
+        if first is None:
+            return 0
+        next_upper = text(
+            f"SELECT max({key}) FROM "
+            f"(SELECT {key} FROM {table} WHERE {key} >= :after ORDER BY {key} LIMIT :limit) batch"
+        )
+        update = text(
+            f"UPDATE {table} SET {set_clause} "
+            f"WHERE {key} >= :after AND {key} <= :upper" + (f" AND ({where})" if where else "")
+        )
+        updated = 0
+        after = first
+        started = logged = time.monotonic()
+        while after is not None and after <= last:
+            upper = bind.execute(next_upper, {"after": after, "limit": batch_size}).scalar()
+            if upper is None:
+                break
+            updated += bind.execute(update, {"after": after, "upper": upper}).rowcount
+            now = time.monotonic()
+            if now - logged >= PROGRESS_INTERVAL_S or upper >= last:
+                logger.info(
+                    "Backfill of %s: %d rows updated, %.1f%% done, %.0f rows/s",
+                    table,
+                    updated,
+                    100.0 * (upper - first + 1) / (last - first + 1),
+                    updated / max(now - started, 1e-6),
+                )
+                logged = now
+            after = upper + 1 if upper < last else None
+            if after is not None and pause:
+                time.sleep(pause)
+        return updated
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Iterable
+from datetime import datetime, timezone
+
+# Columns of a key export, in output order
+EXPORT_FIELDS = [
+    "id",
+    "key_hint",
+    "group",
+    "created_date",
+    "expiration_date",
+    "last_used_date",
+    "is_active",
+    "status",
+]
+
+# Rows encoded per chunk handed to the response
+CHUNK_ROWS = 500
+
+
+def key_status(is_active: bool, expiration_date: datetime | None, now: datetime) -> str:
+    if expiration_date is not None and expiration_date < now:
+        return "expired"
+    return "active" if is_active else "inactive"
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def key_record(row, now: datetime) -> dict:
+    """Flattens a key row into the export record."""
+    return {
+        "id": row.id,
+        "key_hint": row.key_hint,
+        "group": row.key_group,
+        "created_date": _isoformat(row.created_date),
+        "expiration_date": _isoformat(row.expiration_date),
+        "last_used_date": _isoformat(row.last_used_date),
+        "is_active": row.is_active,
+        "status": key_status(row.is_active, row.expiration_date, now),
+    }
+
+
+def _encode_csv_rows(records: Iterable[dict], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson_rows(records: Iterable[dict], header: bool) -> bytes:
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+ENCODERS = {
+    "csv": ("text/csv", _encode_csv_rows),
+    "ndjson": ("application/x-ndjson", _encode_ndjson_rows),
+}
+
+
+async def encode_rows(rows: AsyncIterator, export_format: str) -> AsyncIterator[bytes]:
+    """
+    Encodes rows as they arrive, `CHUNK_ROWS` at a time, so at most one chunk
+    is held in memory regardless of how many rows are exported.
+    """
+    _, encode = ENCODERS[export_format]
+    now = datetime.now(timezone.utc)
+    chunk: list[dict] = []
+    header = True
+    async for row in rows:
+        chunk.append(key_record(row, now))
+        if len(chunk) >= CHUNK_ROWS:
+            yield encode(chunk, header)
+            chunk, header = [], False
+    if chunk or header:
+        yield encode(chunk, header)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+
+from app.core import aws_iot_client
+from app.core.db.database import engine
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+DEGRADED = "degraded"
+DOWN = "down"
+UNKNOWN = "unknown"
+
+
+class DegradedError(Exception):
+    """Raised by a check when the dependency works but should not be relied on."""
+
+
+def database_check(engine: AsyncEngine, max_overflow: int) -> Callable[[], Awaitable[None]]:
+    """`max_overflow` is the one the engine was created with, -1 for unbounded."""
+
+    async def check() -> None:
+        pool = engine.pool
+        # Overflow connections are still free capacity
+        saturated = (
+            isinstance(pool, QueuePool)
+            and max_overflow >= 0
+            and pool.checkedout() >= pool.size() + max_overflow
+        )
+        if saturated:
+            # Do not queue behind requests for a connection: the answer is known
+            raise DegradedError(f"Connection pool saturated: {pool.status()}")
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    return check
+
+
+def iot_check(region: str) -> Callable[[], Awaitable[None]]:
+    async def check() -> None:
+        await aws_iot_client.check_reachability(region)
+
+    return check
+
+
+class HealthProber:
+    """
+    Probes the service dependencies in the background and caches the results,
+    so readiness requests read a snapshot instead of touching Postgres or AWS.
+
+    A check passes ("ok"), is "degraded" when it is slower than
+    `degraded_latency` or raises DegradedError, and is "down" on any other
+    error or timeout. A result older than `ttl` (the prober is stuck or has
+    not run yet) is reported as "unknown".
+    """
+
+    def __init__(
+        self,
+        checks: dict[str, Callable[[], Awaitable[None]]],
+        interval: float,
+        ttl: float,
+        timeout: float,
+        degraded_latency: float,
+    ) -> None:
+        self.checks = checks
+        self.interval = interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self.degraded_latency = degraded_latency
+        self._results: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+
+    async def _probe(self, name: str, check: Callable[[], Awaitable[None]]) -> None:
+        state, detail = OK, None
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.timeout):
+                await check()
+        except DegradedError as e:
+            state, detail = DEGRADED, str(e)
+        except TimeoutError:
+            state, detail = DOWN, f"Timed out after {self.timeout}s"
+        except Exception as e:
+            state, detail = DOWN, f"{type(e).__name__}: {e}"
+        latency = time.perf_counter() - start
+        if state == OK and latency > self.degraded_latency:
+            state, detail = DEGRADED, f"Slow response ({latency * 1000:.0f}ms)"
+        if state != OK:
+            logger.warning(f"Dependency {name} is {state}: {detail}")
+        self._results[name] = {
+            "status": state,
+            "detail": detail,
+            "latency_ms": round(latency * 1000, 1),
+            "checked_date": datetime.now(timezone.utc),
+            "_checked_at": time.monotonic(),
+        }
+
+    async def run_once(self) -> None:
+        await asyncio.gather(*(self._probe(name, check) for name, check in self.checks.items()))
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def snapshot(self) -> dict:
+        """Overall status and per-dependency results; O(1), never does I/O."""
+        now = time.monotonic()
+        checks = {}
+        for name in self.checks:
+            result = self._results.get(name)
+            if result is None or now - result["_checked_at"] > self.ttl:
+                checks[name] = {"status": UNKNOWN, "detail": "No recent probe result"}
+            else:
+                checks[name] = {k: v for k, v in result.items() if not k.startswith("_")}
+        states = {check["status"] for check in checks.values()}
+        if states & {DOWN, UNKNOWN}:
+            overall = DOWN
+        elif DEGRADED in states:
+            overall = DEGRADED
+        else:
+            overall = OK
+        return {"status": overall, "checks": checks}
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+@lru_cache()
+def get_health_prober() -> HealthProber:
+    """
+    FastAPI dependency to get the prober of the database and AWS IoT.
+    """
+    settings = get_settings()
+    return HealthProber(
+        {
+            "database": database_check(engine, settings.DB_MAX_OVERFLOW),
+            **{f"aws_iot:{region}": iot_check(region) for region in aws_iot_client.clients.regions},
+        },
+        interval=settings.HEALTH_PROBE_INTERVAL_S,
+        ttl=settings.HEALTH_PROBE_TTL_S,
+        timeout=settings.HEALTH_PROBE_TIMEOUT_S,
+        degraded_latency=settings.HEALTH_DEGRADED_LATENCY_MS / 1000,
+    )
@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.crud.key_partitions import (
+    KEYS_TABLE,
+    default_partition_months,
+    drop_partition,
+    ensure_partitions,
+    expired_partitions,
+    stream_partition,
+)
+from app.core.crud.partitions import add_months, is_partitioned, list_partitions, partition_name
+from app.core.db.database import SessionLocal, engine
+from app.core.export import encode_rows
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+KEY_RETENTION_LOCK = "key_retention"
+
+
+async def archive_partition(db: AsyncSession, month: date, directory: str) -> Path:
+    """
+    Writes the metadata of a partition's keys (never the hashes) as gzipped
+    NDJSON. The file only gets its final name once complete.
+    """
+    target = Path(directory) / f"{partition_name(KEYS_TABLE, month)}.ndjson.gz"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_suffix(".part")
+    with gzip.open(partial, "wb") as archive:
+        async for chunk in encode_rows(stream_partition(db, month), "ndjson"):
+            await asyncio.to_thread(archive.write, chunk)
+    os.replace(partial, target)
+    return target
+
+
+async def run_key_retention(
+    db: AsyncSession, settings: Settings, now: datetime | None = None
+) -> tuple[list[date], list[date]]:
+    """
+    Creates the monthly key partitions up to `KEY_PARTITIONS_AHEAD_MONTHS`
+    ahead, plus those of any month waiting in the default partition. With
+    `KEY_RETENTION_ENABLED`, then archives (to `KEY_ARCHIVE_DIR`, unless
+    empty) and drops every partition whose keys all expired more than
+    `KEY_RETENTION_DAYS` ago. Callers hold `KEY_RETENTION_LOCK`.
+
+    Returns the created and the dropped months. Does nothing while
+    `bootstrap_keys` is not partitioned (see the ReadMe for its conversion).
+    """
+    if not await is_partitioned(db, KEYS_TABLE):
+        logger.warning("%s is not partitioned, skipping its maintenance", KEYS_TABLE)
+        return [], []
+    now = now or datetime.now(timezone.utc)
+    month = now.date().replace(day=1)
+    months = [add_months(month, n) for n in range(settings.KEY_PARTITIONS_AHEAD_MONTHS + 1)]
+    months += [m for m in await default_partition_months(db) if m <= months[-1]]
+    created = await ensure_partitions(db, months)
+    if not settings.KEY_RETENTION_ENABLED:
+        return created, []
+
+    dropped = []
+    for expired in await expired_partitions(db, now - timedelta(days=settings.KEY_RETENTION_DAYS)):
+        # Dropped by hand meanwhile: there is nothing left to archive
+        if expired not in await list_partitions(db, KEYS_TABLE):
+            continue
+        if settings.KEY_ARCHIVE_DIR:
+            archive = await archive_partition(db, expired, settings.KEY_ARCHIVE_DIR)
+            logger.info("Archived expired bootstrap keys to %s", archive)
+        await drop_partition(db, expired)
+        dropped.append(expired)
+    return created, dropped
+
+
+class KeyRetentionJob:
+    """
+    Background loop running the key partition maintenance every `interval`
+    seconds. Only one worker runs a pass at a time; the others skip it.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.interval = settings.KEY_RETENTION_INTERVAL_H * 3600
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> None:
+        # Session-level lock held on its own connection for the whole pass, so
+        # no other worker drops a partition between its archive and its drop
+        async with engine.connect() as lock_connection:
+            acquired = await lock_connection.scalar(
+                text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": KEY_RETENTION_LOCK}
+            )
+            await lock_connection.commit()
+            if not acquired:
+                return
+            try:
+                async with SessionLocal() as db:
+                    created, dropped = await run_key_retention(db, self.settings)
+            finally:
+                await lock_connection.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": KEY_RETENTION_LOCK}
+                )
+                await lock_connection.commit()
+        for month in created:
+            logger.info("Created bootstrap key partition for %s", month.strftime("%Y-%m"))
+        for month in dropped:
+            logger.info("Dropped bootstrap key partition for %s", month.strftime("%Y-%m"))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception(f"Bootstrap key retention failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+@lru_cache()
+def get_key_retention_job() -> KeyRetentionJob:
+    """
+    Retention job started by the application lifespan.
+    """
+    return KeyRetentionJob(get_settings())
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+
+from app.core.metrics import EVENT_LOOP_LAG
+from app.core.profiling import frame_stack
+from app.core.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag and catches blocking calls.
+
+    A probe task sleeps `interval` seconds and records how late it wakes up in
+    the `event_loop_lag_seconds` histogram. A watchdog thread checks that the
+    probe keeps ticking: once it has not run for `threshold` seconds past its
+    due time, the loop is blocked and the loop thread's stack is logged, which
+    points at the offending synchronous call (a boto3 request, bcrypt, ...).
+    Each stall is reported once.
+    """
+
+    def __init__(self, interval: float, threshold: float) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._loop_thread_id: int | None = None
+        self._last_tick = time.monotonic()
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "LoopLagMonitor":
+        return cls(
+            settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+            settings.LOOP_MONITOR_BLOCK_THRESHOLD_MS / 1000,
+        )
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(loop.time() - due, 0.0))
+            self._last_tick = time.monotonic()
+
+    def _watch(self) -> None:
+        reported_tick = None
+        while not self._stop.wait(min(self.interval, self.threshold) / 2):
+            last_tick = self._last_tick
+            stalled = time.monotonic() - last_tick - self.interval
+            if stalled < self.threshold or reported_tick == last_tick:
+                continue
+            reported_tick = last_tick
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "\n  ".join(frame_stack(frame)) if frame is not None else "<unavailable>"
+            logger.warning(f"Event loop blocked for {stalled * 1000:.0f}ms in:\n  {stack}")
+
+    def start(self) -> None:
+        """Starts monitoring the running event loop."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        # The watchdog may be mid-way through formatting a stack: wait off the loop
+        await asyncio.to_thread(self._watchdog.join)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
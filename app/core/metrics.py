@@ -0,0 +1,105 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Finer low end than the prometheus default, bcrypt and AWS calls sit in 10ms-1s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, until the last body byte is sent.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+KEY_VALIDATION_LATENCY = Histogram(
+    "bootstrap_key_validation_seconds",
+    "Time validate_bootstrap_key spends per stage (db_query, hash_verify).",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+AWS_CALL_LATENCY = Histogram(
+    "aws_iot_call_duration_seconds",
+    "Latency of each AWS IoT API call; error is the AWS error code or exception class.",
+    ["operation", "error"],
+    buckets=LATENCY_BUCKETS,
+)
+
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to check a connection out of the SQLAlchemy pool (queueing plus connect).",
+    buckets=LATENCY_BUCKETS,
+)
+
+REGISTRATIONS_IN_FLIGHT = Gauge(
+    "registrations_in_flight",
+    "Device registration requests currently being processed.",
+    multiprocess_mode="livesum",
+)
+
+REGISTRATIONS = Counter(
+    "registrations_total",
+    "Device registration outcomes.",
+    ["outcome"],
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for an admission slot.",
+    ["limiter"],
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Requests shed by admission control (queue_full or queue_timeout).",
+    ["limiter", "reason"],
+)
+
+AUDIT_RECORDS_DROPPED = Counter(
+    "audit_records_dropped_total",
+    "Audit records dropped because the write buffer was full.",
+)
+
+OUTBOX_DEAD_LETTERED = Counter(
+    "outbox_events_dead_lettered_total",
+    "Outbox events given up after OUTBOX_MAX_ATTEMPTS failed deliveries.",
+)
+
+OUTBOX_DEAD_LETTERS = Gauge(
+    "outbox_dead_letters",
+    "Dead-lettered outbox events waiting to be requeued.",
+    multiprocess_mode="max",
+)
+
+OUTBOX_QUEUE_DROPPED = Counter(
+    "outbox_queue_dropped_total",
+    "Outbox events dropped because the in-process queue sink was full.",
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between when a periodic event-loop probe was due and when it ran.",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """
+    Renders all metrics in the Prometheus text format. When running several
+    workers with PROMETHEUS_MULTIPROC_DIR set, aggregates across processes.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,224 @@
+import asyncio
+import importlib
+import json
+import logging
+import threading
+import urllib.request
+from functools import lru_cache
+
+from app.core import metrics
+from app.core.crud.outbox import (
+    claim_batch,
+    count_dead_letters,
+    delete_delivered,
+    mark_delivered,
+    mark_failed,
+)
+from app.core.db.database import SessionLocal
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxSink:
+    """
+    Destination of outbox events. `send` receives a batch, oldest first, and
+    must raise if any event was not accepted: the whole batch is then retried,
+    so consumers deduplicate on the event `id`. Retried events may arrive
+    after newer ones.
+    """
+
+    async def send(self, events: list[dict]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class WebhookSink(OutboxSink):
+    """POSTs each batch as a JSON array; any non-2xx answer fails the batch."""
+
+    def __init__(self, url: str, timeout: float) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, body: bytes) -> None:
+        request = urllib.request.Request(
+            self.url, data=body, method="POST", headers={"Content-Type": "application/json"}
+        )
+        # urlopen raises HTTPError on 4xx/5xx
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+    async def send(self, events: list[dict]) -> None:
+        body = json.dumps(events, default=str).encode()
+        await asyncio.to_thread(self._post, body)
+
+
+class FileSink(OutboxSink):
+    """Appends one JSON object per event to a file (JSON lines)."""
+
+    def __init__(self, path: str) -> None:
+        self._lock = threading.Lock()
+        self._stream = open(path, "a", encoding="utf-8")
+
+    def _write(self, lines: str) -> None:
+        with self._lock:
+            self._stream.write(lines)
+            self._stream.flush()
+
+    async def send(self, events: list[dict]) -> None:
+        lines = "".join(json.dumps(event, default=str) + "\n" for event in events)
+        await asyncio.to_thread(self._write, lines)
+
+    async def close(self) -> None:
+        self._stream.close()
+
+
+class QueueSink(OutboxSink):
+    """
+    Hands events to in-process consumers through an asyncio queue, read from
+    `get_outbox_dispatcher().queue`. Never fails a batch: when the queue is
+    full, events are dropped and counted, so a slow consumer cannot hold up
+    the other sinks. Consumers needing every event use another sink.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize)
+
+    async def send(self, events: list[dict]) -> None:
+        dropped = 0
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                dropped += 1
+        if dropped:
+            logger.warning("Outbox queue is full: dropped %d events", dropped)
+            metrics.OUTBOX_QUEUE_DROPPED.inc(dropped)
+
+
+def build_sink(name: str, settings: Settings) -> OutboxSink:
+    """
+    Resolves an `OUTBOX_SINKS` entry: "webhook" (`OUTBOX_WEBHOOK_URL`), "file"
+    (`OUTBOX_FILE_PATH`), "queue" (`OUTBOX_QUEUE_MAXSIZE`) or the dotted path
+    of any OutboxSink class, e.g. "mypackage.sinks:KafkaSink".
+    """
+    if name == "webhook":
+        return WebhookSink(settings.OUTBOX_WEBHOOK_URL, settings.OUTBOX_WEBHOOK_TIMEOUT_S)
+    if name == "file":
+        return FileSink(settings.OUTBOX_FILE_PATH)
+    if name == "queue":
+        return QueueSink(settings.OUTBOX_QUEUE_MAXSIZE)
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown outbox sink {name!r}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def _event_record(event) -> dict:
+    return {
+        "id": event.id,
+        "type": event.event_type,
+        "created_date": event.created_date.isoformat(),
+        "payload": event.payload,
+    }
+
+
+class OutboxDispatcher:
+    """
+    Background loop delivering outbox events to the sinks in batches of
+    `OUTBOX_BATCH_SIZE`, polling every `OUTBOX_POLL_INTERVAL_S` when idle.
+    A failed batch is retried with exponential backoff, up to
+    `OUTBOX_MAX_ATTEMPTS` times, then dead-lettered until requeued through
+    the admin API; the request path never waits on a sink.
+    """
+
+    def __init__(self, sinks: list[OutboxSink], settings: Settings) -> None:
+        self.sinks = sinks
+        self.settings = settings
+        self._task: asyncio.Task | None = None
+
+    @property
+    def queue(self) -> asyncio.Queue[dict] | None:
+        """Events of the "queue" sink, for in-process consumers; None without one."""
+        for sink in self.sinks:
+            if isinstance(sink, QueueSink):
+                return sink.queue
+        return None
+
+    async def dispatch_batch(self, db) -> int:
+        """Delivers one batch of due events; returns how many were claimed."""
+        settings = self.settings
+        events = await claim_batch(db, settings.OUTBOX_BATCH_SIZE)
+        if not events:
+            await db.commit()
+            return 0
+        event_ids = [event.id for event in events]
+        records = [_event_record(event) for event in events]
+        try:
+            for sink in self.sinks:
+                await sink.send(records)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning("Outbox delivery of %d events failed: %s", len(events), error)
+            dead_letters = await mark_failed(
+                db,
+                event_ids,
+                error,
+                settings.OUTBOX_RETRY_BASE_S,
+                settings.OUTBOX_RETRY_MAX_S,
+                settings.OUTBOX_MAX_ATTEMPTS,
+            )
+            if dead_letters:
+                logger.error(
+                    "Gave up delivering outbox events %s after %d attempts",
+                    dead_letters,
+                    settings.OUTBOX_MAX_ATTEMPTS,
+                )
+                metrics.OUTBOX_DEAD_LETTERED.inc(len(dead_letters))
+        else:
+            await mark_delivered(db, event_ids)
+        await db.commit()
+        return len(events)
+
+    async def run_once(self) -> None:
+        async with SessionLocal() as db:
+            while await self.dispatch_batch(db) == self.settings.OUTBOX_BATCH_SIZE:
+                pass
+            await delete_delivered(db, self.settings.OUTBOX_RETENTION_H * 3600)
+            await db.commit()
+            metrics.OUTBOX_DEAD_LETTERS.set(await count_dead_letters(db))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception(f"Outbox dispatcher failed: {str(e)}")
+            await asyncio.sleep(self.settings.OUTBOX_POLL_INTERVAL_S)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for sink in self.sinks:
+            await sink.close()
+
+
+@lru_cache()
+def get_outbox_dispatcher() -> OutboxDispatcher:
+    """
+    Dispatcher of the sinks configured in `OUTBOX_SINKS`, started by the
+    application lifespan.
+    """
+    settings = get_settings()
+    return OutboxDispatcher(
+        [build_sink(name, settings) for name in settings.OUTBOX_SINKS], settings
+    )
@@ -0,0 +1,132 @@
+import os
+import re
+import sys
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from types import FrameType
+
+from app.core.settings import get_settings
+
+# Deepest stack recorded per sample
+MAX_STACK_DEPTH = 128
+
+PROFILE_NAME_PATTERN = re.compile(r"^[0-9TZ]+_[A-Z]+_[A-Za-z0-9_.-]*_[0-9a-f]{8}\.folded$")
+
+
+def frame_label(frame: FrameType, with_line: bool = True) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    if with_line:
+        return f"{module}:{code.co_name}:{frame.f_lineno}"
+    return f"{module}:{code.co_name}"
+
+
+def frame_stack(
+    frame: FrameType | None, limit: int = MAX_STACK_DEPTH, with_line: bool = True
+) -> list[str]:
+    """Returns the labels of a frame and its callers, outermost first."""
+    labels = []
+    while frame is not None and len(labels) < limit:
+        labels.append(frame_label(frame, with_line))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class StackSampler:
+    """
+    Statistical profiler: a daemon thread that snapshots the stack of one
+    target thread (the event loop) every `interval` seconds and counts
+    identical stacks. Cost is independent of how much code runs in between.
+    """
+
+    def __init__(self, target_thread_id: int, interval: float) -> None:
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is not None:
+                # Function granularity keeps flame graphs readable
+                self.samples[";".join(frame_stack(frame, with_line=False))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+def render_folded(samples: Counter[str]) -> str:
+    """Collapsed-stack format read by flamegraph.pl, speedscope and inferno."""
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class ProfileStore:
+    """
+    Bounded on-disk ring of profiles: once `max_files` is exceeded, the
+    oldest profiles are deleted.
+    """
+
+    def __init__(self, directory: str, max_files: int) -> None:
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    @staticmethod
+    def new_name(method: str, path: str) -> str:
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        slug = re.sub(r"[^A-Za-z0-9.-]+", "-", path).strip("-")[:80]
+        return f"{timestamp}_{method}_{slug}_{uuid.uuid4().hex[:8]}.folded"
+
+    def save(self, name: str, samples: Counter[str]) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.directory / name
+        target.write_text(render_folded(samples), encoding="utf-8")
+        self._prune()
+        return target
+
+    def _prune(self) -> None:
+        profiles = sorted(self.directory.glob("*.folded"))
+        for stale in profiles[: max(len(profiles) - self.max_files, 0)]:
+            stale.unlink(missing_ok=True)
+
+    def list(self) -> list[dict]:
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for profile in sorted(self.directory.glob("*.folded"), reverse=True):
+            stat = profile.stat()
+            profiles.append(
+                {
+                    "name": profile.name,
+                    "size_bytes": stat.st_size,
+                    "created_date": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                }
+            )
+        return profiles
+
+    def path(self, name: str) -> Path | None:
+        """Resolves a profile name, refusing anything that is not a stored profile."""
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        profile = self.directory / name
+        return profile if profile.is_file() else None
+
+
+@lru_cache()
+def get_profile_store() -> ProfileStore:
+    """
+    FastAPI dependency to get the profile store configured in settings.
+    """
+    settings = get_settings()
+    return ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
@@ -0,0 +1,152 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.crud import auth_failures
+from app.core.settings import Settings, get_settings
+
+
+class TokenBucketMap:
+    """
+    Token buckets by key, in memory. A bucket holds up to `burst` tokens
+    and refills at `rate` tokens per second.
+
+    Memory stays bounded: buckets idle for `ttl` seconds are dropped (they
+    would be full again anyway) and beyond `max_entries` the least recently
+    used bucket is evicted.
+    """
+
+    def __init__(self, rate: float, burst: float, ttl: float, max_entries: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> [tokens, last update], least recently used first
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _expire(self, now: float) -> None:
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated <= self.ttl:
+                break
+            del self._buckets[key]
+
+    def tokens(self, key: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return self.burst
+            return min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+
+    def consume(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            bucket = self._buckets.pop(key, None)
+            tokens = self.burst if bucket is None else bucket[0] + (now - bucket[1]) * self.rate
+            self._buckets[key] = [max(min(self.burst, tokens) - 1, 0.0), now]
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+
+
+class FailureThrottle:
+    """
+    Throttles clients that keep failing bootstrap key authentication.
+
+    Every failed attempt takes a token from the bucket of the client IP and
+    from the bucket of the key hint (last 4 characters of the key). While
+    either bucket is empty, requests are rejected before any database query
+    or hash verification. Successful attempts cost nothing.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.limits = {
+            "ip": (settings.AUTH_THROTTLE_IP_RATE, settings.AUTH_THROTTLE_IP_BURST),
+            "hint": (settings.AUTH_THROTTLE_HINT_RATE, settings.AUTH_THROTTLE_HINT_BURST),
+        }
+        self.ttl = settings.AUTH_THROTTLE_TTL_S
+        self.buckets = {
+            scope: TokenBucketMap(rate, burst, self.ttl, settings.AUTH_THROTTLE_MAX_ENTRIES)
+            for scope, (rate, burst) in self.limits.items()
+        }
+
+    @staticmethod
+    def bucket_keys(client_ip: str | None, api_key: str | None) -> dict[str, str]:
+        keys = {}
+        if client_ip:
+            keys["ip"] = client_ip
+        if api_key and len(api_key) >= 4:
+            keys["hint"] = api_key[-4:]
+        return keys
+
+    async def _tokens(self, db: AsyncSession, scope: str, key: str) -> float:
+        return self.buckets[scope].tokens(key)
+
+    async def _consume(self, db: AsyncSession, scope: str, key: str) -> None:
+        self.buckets[scope].consume(key)
+
+    async def retry_after(self, db: AsyncSession, keys: dict[str, str]) -> int | None:
+        """Seconds until the client may try again, or None if it is not throttled."""
+        wait = 0.0
+        for scope, key in keys.items():
+            rate = self.limits[scope][0]
+            tokens = await self._tokens(db, scope, key)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+        return math.ceil(wait) if wait else None
+
+    async def record_failure(self, db: AsyncSession, keys: dict[str, str]) -> None:
+        for scope, key in keys.items():
+            await self._consume(db, scope, key)
+
+
+class SharedFailureThrottle(FailureThrottle):
+    """
+    FailureThrottle whose buckets live in Postgres (`auth_failure_buckets`),
+    so every worker and replica sees the same counts. A rejected request
+    still costs one primary key lookup, but no bcrypt work.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        super().__init__(settings)
+        self._last_prune = time.monotonic()
+
+    async def _tokens(self, db: AsyncSession, scope: str, key: str) -> float:
+        rate, burst = self.limits[scope]
+        return await auth_failures.get_tokens(db, f"{scope}:{key}", rate, burst)
+
+    async def _consume(self, db: AsyncSession, scope: str, key: str) -> None:
+        rate, burst = self.limits[scope]
+        await auth_failures.consume_token(db, f"{scope}:{key}", rate, burst)
+
+    async def record_failure(self, db: AsyncSession, keys: dict[str, str]) -> None:
+        await super().record_failure(db, keys)
+        now = time.monotonic()
+        if now - self._last_prune > self.ttl:
+            self._last_prune = now
+            await auth_failures.delete_expired(db, self.ttl)
+        await db.commit()
+
+
+@lru_cache()
+def get_failure_throttle() -> FailureThrottle | None:
+    """
+    FastAPI dependency to get the failed-attempt throttle ("memory" or "shared"
+    mode), None when throttling is disabled.
+    """
+    settings = get_settings()
+    if not settings.AUTH_THROTTLE_ENABLED:
+        return None
+    if settings.AUTH_THROTTLE_MODE == "shared":
+        return SharedFailureThrottle(settings)
+    return FailureThrottle(settings)
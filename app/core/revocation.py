@@ -0,0 +1,113 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import aws_iot_client
+from app.core.crud.change_versions import DEVICES, bump_version
+from app.core.crud.device_registrations import (
+    claim_revocation_job,
+    mark_revoked,
+    pending_registrations,
+)
+from app.core.db import models
+from app.core.db.database import SessionLocal
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Jobs started by this process, so they are not garbage collected mid-run
+_running: dict[int, asyncio.Task] = {}
+
+
+class RevocationJobBusyError(Exception):
+    pass
+
+
+async def _revoke(registration: models.DeviceRegistration, semaphore: asyncio.Semaphore) -> bool:
+    async with semaphore:
+        try:
+            await aws_iot_client.revoke_device_certificate(
+                certificate_id=registration.certificate_id, region=registration.region
+            )
+        except Exception as e:
+            logger.exception(
+                f"Failed to revoke certificate {registration.certificate_id}: {str(e)}"
+            )
+            return False
+    return True
+
+
+async def run_revocation_job(
+    db: AsyncSession, job_id: int, settings: Settings
+) -> models.RevocationJob:
+    """
+    Revokes every certificate issued under the job's key or key group.
+
+    Registrations are read `REVOCATION_BATCH_SIZE` at a time, with at most
+    `REVOCATION_CONCURRENCY` revocations in flight. Each batch commits the
+    revoked registrations together with the job's progress counters, so an
+    interrupted job resumes where it stopped; failed revocations are retried
+    by the next run (revoking twice is harmless).
+    """
+    job = await claim_revocation_job(db, job_id, settings.REVOCATION_STALE_AFTER_S)
+    if job is None:
+        raise RevocationJobBusyError(f"Revocation job {job_id} is already running")
+    logger.info("Revocation job %d started: %d/%d revoked", job.id, job.revoked, job.total)
+
+    semaphore = asyncio.Semaphore(settings.REVOCATION_CONCURRENCY)
+    after_id = 0
+    while batch := await pending_registrations(db, job, after_id, settings.REVOCATION_BATCH_SIZE):
+        after_id = batch[-1].id
+        results = await asyncio.gather(*(_revoke(r, semaphore) for r in batch))
+        revoked = [r for r, ok in zip(batch, results) if ok]
+        await mark_revoked(db, revoked)
+        if revoked:
+            await bump_version(db, DEVICES)
+        job.revoked += len(revoked)
+        job.failed += len(batch) - len(revoked)
+        await db.commit()
+        await db.refresh(job)
+        logger.info(
+            "Revocation job %d: %d/%d revoked, %d failed",
+            job.id,
+            job.revoked,
+            job.total,
+            job.failed,
+        )
+
+    job.status = "completed" if job.failed == 0 else "incomplete"
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def _run_in_background(job_id: int) -> None:
+    try:
+        async with SessionLocal() as db:
+            await run_revocation_job(db, job_id, get_settings())
+    except RevocationJobBusyError as e:
+        logger.warning(str(e))
+    except Exception as e:
+        logger.exception(f"Revocation job {job_id} failed: {str(e)}")
+
+
+def start_revocation_job(job_id: int) -> None:
+    """
+    Runs a job in a background task of this process, unless it already runs here.
+    """
+    if job_id in _running:
+        return
+    task = asyncio.create_task(_run_in_background(job_id))
+    _running[job_id] = task
+    task.add_done_callback(lambda _: _running.pop(job_id, None))
+
+
+async def cancel_revocation_jobs() -> None:
+    """
+    Stops the jobs running in this process; they are resumed through the API.
+    """
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,364 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import aws_iot_client
+from app.core.aws_iot_client import ROTATION_JOB_FAILED_STATUSES
+from app.core.crud.change_versions import DEVICES, bump_version
+from app.core.crud.rotation_campaigns import (
+    claim_campaign,
+    due_campaign_ids,
+    due_deactivations,
+    mark_deactivated,
+    mark_stalled,
+    pending_registrations,
+    pending_rotations,
+    record_failure,
+    record_issued,
+    record_pending,
+    update_progress,
+)
+from app.core.db import models
+from app.core.db.database import SessionLocal
+from app.core.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class Pacer:
+    """
+    Spaces out operations to at most `rate` per second, however many tasks
+    wait on it, so a campaign stays under the AWS IoT API throttling limits.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        await asyncio.sleep(start - now)
+
+
+async def _paced(pacer: Pacer, operation, **kwargs):
+    """Runs an AWS operation in its paced slot; returns its result or the exception."""
+    await pacer.wait()
+    try:
+        return await operation(**kwargs)
+    except Exception as e:
+        return e
+
+
+async def _checkpoint(
+    db: AsyncSession, campaign: models.RotationCampaign, settings: Settings
+) -> None:
+    """Commits a batch together with the campaign counters and extends the lease."""
+    await update_progress(db, campaign, settings.ROTATION_MAX_ATTEMPTS)
+    await bump_version(db, DEVICES)
+    campaign.lease_expires = datetime.now(timezone.utc) + timedelta(
+        seconds=settings.ROTATION_LEASE_S
+    )
+    await db.commit()
+    await db.refresh(campaign)
+    logger.info(
+        "Rotation campaign %d: %d/%d rotated, %d deactivated, %d failed",
+        campaign.id,
+        campaign.rotated,
+        campaign.total,
+        campaign.deactivated,
+        campaign.failed,
+    )
+
+
+async def _settle_pending(
+    db: AsyncSession, campaign: models.RotationCampaign, pacer: Pacer, settings: Settings
+) -> None:
+    """
+    Settles the rotations an interrupted step left pending: recorded as
+    issued if their job was created, otherwise the new certificate is
+    discarded and the device retried. Any still unsettled stay pending.
+    """
+    pending = await pending_rotations(db, campaign)
+    if not pending:
+        return
+    for rotation, registration in pending:
+        exists = await _paced(
+            pacer,
+            aws_iot_client.rotation_job_exists,
+            certificate_id=rotation.new_certificate_id,
+            region=rotation.region,
+        )
+        if exists is True:
+            await record_issued(db, campaign.id, registration, rotation.new_certificate_id)
+            continue
+        if exists is False:
+            exists = await _paced(
+                pacer,
+                aws_iot_client.discard_replacement_certificate,
+                certificate_id=rotation.new_certificate_id,
+                region=rotation.region,
+            )
+        if isinstance(exists, Exception):
+            logger.error(
+                "Failed to settle pending certificate %s: %s", rotation.new_certificate_id, exists
+            )
+            continue
+        await record_failure(
+            db, campaign.id, registration, "Interrupted before the job was created", False
+        )
+    await _checkpoint(db, campaign, settings)
+
+
+async def _issue_pending(
+    db: AsyncSession, campaign: models.RotationCampaign, pacer: Pacer, settings: Settings
+) -> bool:
+    """
+    One pass over the registrations left to rotate; True once none are left.
+
+    Each new certificate is checkpointed as pending before the job carrying
+    it is created, and deleted again if that fails, so none is left active
+    without a record.
+    """
+    await _settle_pending(db, campaign, pacer, settings)
+    after_id = 0
+    while batch := await pending_registrations(
+        db, campaign, after_id, settings.ROTATION_BATCH_SIZE, settings.ROTATION_MAX_ATTEMPTS
+    ):
+        after_id = batch[-1].id
+        results = await asyncio.gather(
+            *(
+                _paced(
+                    pacer,
+                    aws_iot_client.issue_replacement_certificate,
+                    device_id=registration.device_id,
+                    policy_name=settings.IOT_POLICY_NAME,
+                    region=registration.region,
+                )
+                for registration in batch
+            )
+        )
+        issued = []
+        for registration, result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to rotate certificate %s: %s", registration.certificate_id, result
+                )
+                await record_failure(db, campaign.id, registration, str(result))
+            else:
+                await record_pending(db, campaign.id, registration, result["certificate_id"])
+                issued.append((registration, result))
+        await _checkpoint(db, campaign, settings)
+
+        results = await asyncio.gather(
+            *(
+                _paced(
+                    pacer, aws_iot_client.deliver_replacement_certificate, certificate=certificate
+                )
+                for _, certificate in issued
+            )
+        )
+        for (registration, certificate), result in zip(issued, results):
+            certificate_id = certificate["certificate_id"]
+            if not isinstance(result, Exception):
+                await record_issued(db, campaign.id, registration, certificate_id)
+                continue
+            logger.error("Failed to deliver certificate %s: %s", certificate_id, result)
+            try:
+                await aws_iot_client.discard_replacement_certificate(
+                    certificate_id, certificate["region"]
+                )
+            except Exception as e:
+                # Left pending: the next step settles it
+                logger.error("Failed to discard certificate %s: %s", certificate_id, e)
+                continue
+            await record_failure(db, campaign.id, registration, str(result), False)
+        await _checkpoint(db, campaign, settings)
+
+    remaining = await pending_registrations(db, campaign, 0, 1, settings.ROTATION_MAX_ATTEMPTS)
+    return not remaining and not await pending_rotations(db, campaign)
+
+
+async def _switch_over(rotation: models.CertificateRotation) -> None:
+    """Deactivates the old certificate, then deletes the job holding the new private key."""
+    await aws_iot_client.deactivate_certificate(
+        certificate_id=rotation.old_certificate_id, region=rotation.region
+    )
+    await aws_iot_client.delete_rotation_job(
+        certificate_id=rotation.new_certificate_id, region=rotation.region
+    )
+
+
+async def _deactivate_due(
+    db: AsyncSession, campaign: models.RotationCampaign, pacer: Pacer, settings: Settings
+) -> None:
+    """
+    Deactivates the old certificates whose grace period is over, once the
+    device reported its job SUCCEEDED. Devices whose job failed keep their
+    old certificate: the job, with the private key it holds, and the new
+    certificate are deleted and the rotation marked stalled. Devices still
+    running their job are reported and checked again on the next step.
+    """
+    after_id = 0
+    while rotations := await due_deactivations(
+        db, campaign, after_id, settings.ROTATION_BATCH_SIZE
+    ):
+        after_id = rotations[-1].id
+        statuses = await asyncio.gather(
+            *(
+                _paced(
+                    pacer,
+                    aws_iot_client.rotation_job_status,
+                    certificate_id=rotation.new_certificate_id,
+                    thing_name=rotation.device_id,
+                    region=rotation.region,
+                )
+                for rotation in rotations
+            )
+        )
+        switched, failed = [], []
+        for rotation, job_status in zip(rotations, statuses):
+            if isinstance(job_status, Exception):
+                logger.error(
+                    "Failed to check rotation job of %s: %s", rotation.device_id, job_status
+                )
+            elif job_status == "SUCCEEDED":
+                switched.append(rotation)
+            elif job_status in ROTATION_JOB_FAILED_STATUSES:
+                logger.warning(
+                    "Device %s did not switch to certificate %s: job %s",
+                    rotation.device_id,
+                    rotation.new_certificate_id,
+                    job_status,
+                )
+                failed.append((rotation, job_status))
+            else:
+                logger.warning(
+                    "Device %s has not switched to certificate %s after the grace period: job %s",
+                    rotation.device_id,
+                    rotation.new_certificate_id,
+                    job_status,
+                )
+
+        results = await asyncio.gather(
+            *(_paced(pacer, _switch_over, rotation=rotation) for rotation in switched)
+        )
+        done = []
+        for rotation, result in zip(switched, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to deactivate certificate %s: %s", rotation.old_certificate_id, result
+                )
+            else:
+                done.append(rotation)
+        # Discarding deletes the job first, then the new certificate
+        results = await asyncio.gather(
+            *(
+                _paced(
+                    pacer,
+                    aws_iot_client.discard_replacement_certificate,
+                    certificate_id=rotation.new_certificate_id,
+                    region=rotation.region,
+                )
+                for rotation, _ in failed
+            )
+        )
+        stalled = []
+        for (rotation, job_status), result in zip(failed, results):
+            if isinstance(result, Exception):
+                logger.error(
+                    "Failed to discard certificate %s: %s", rotation.new_certificate_id, result
+                )
+            else:
+                stalled.append((rotation, job_status))
+        await mark_deactivated(db, done)
+        await mark_stalled(db, stalled)
+        await _checkpoint(db, campaign, settings)
+        if len(done) < len(switched) or len(stalled) < len(failed):
+            # Retried on the next step rather than spinning on a failing call
+            return
+
+
+async def run_campaign_step(
+    db: AsyncSession, campaign_id: int, settings: Settings
+) -> models.RotationCampaign | None:
+    """
+    Advances a campaign as far as it can go now, or returns None if another
+    worker holds it.
+
+    While "issuing", replacement certificates are issued for the selected
+    registrations, `tps` per second, and checkpointed every
+    `ROTATION_BATCH_SIZE` devices; failures are retried on later steps up to
+    `ROTATION_MAX_ATTEMPTS` times. Old certificates are deactivated once
+    their grace period is over and the device confirmed the switch, at the
+    same pace. The campaign is "grace" when everything is issued and
+    "completed" when every rotation is deactivated or stalled. A restarted
+    worker resumes from the last checkpoint.
+    """
+    campaign = await claim_campaign(db, campaign_id, settings.ROTATION_LEASE_S)
+    if campaign is None:
+        return None
+    pacer = Pacer(campaign.tps)
+    if campaign.status == "issuing" and await _issue_pending(db, campaign, pacer, settings):
+        campaign.status = "grace"
+    await _deactivate_due(db, campaign, pacer, settings)
+    if campaign.status == "grace" and campaign.deactivated + campaign.stalled == campaign.rotated:
+        campaign.status = "completed"
+    # On errors the lease is not released: it runs out and a later step retries
+    campaign.lease_expires = None
+    await db.commit()
+    await db.refresh(campaign)
+    return campaign
+
+
+class RotationScheduler:
+    """
+    Background loop advancing every unfinished rotation campaign each
+    `interval` seconds, so campaigns carry on after restarts and grace
+    periods expire without anyone calling the API.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.interval = settings.ROTATION_POLL_INTERVAL_S
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> None:
+        async with SessionLocal() as db:
+            for campaign_id in await due_campaign_ids(db):
+                try:
+                    await run_campaign_step(db, campaign_id, self.settings)
+                except Exception as e:
+                    await db.rollback()
+                    logger.exception(f"Rotation campaign {campaign_id} failed: {str(e)}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception(f"Rotation scheduler pass failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+@lru_cache()
+def get_rotation_scheduler() -> RotationScheduler:
+    """
+    Scheduler started by the application lifespan.
+    """
+    return RotationScheduler(get_settings())
@@ -1,6 +1,7 @@
 import datetime
+from typing import Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
 # ==============================================================================
 # Bootstrap Key Schemas (Admin)
@@ -43,12 +44,57 @@ class BootstrapKeyInfo(BaseModel):
     created_date: datetime.datetime
     expiration_date: datetime.datetime | None
     is_active: bool
+    last_used_date: datetime.datetime | None = None
 
 
 class BootstrapKeyUpdateRequest(BaseModel):
     activation_flag: bool
 
 
+class KeyGroupStats(BaseModel):
+    """
+    Key counts for one key group. `expired` keys are excluded from
+    `active`/`inactive`; `used` counts keys that registered at least one device.
+    """
+
+    group: str | None
+    active: int
+    inactive: int
+    expired: int
+    used: int
+    total: int
+
+
+class KeyImportRow(BaseModel):
+    """
+    One externally generated key in a bulk import file (CSV column / JSON field names).
+    """
+
+    key_hash: str = Field(min_length=1, max_length=255)
+    key_hint: str = Field(min_length=4, max_length=4)
+    group: str | None = Field(default=None, min_length=1, max_length=255)
+    created_date: datetime.datetime | None = None
+    expiration_date: datetime.datetime
+    is_active: bool = True
+
+
+class KeyImportRejection(BaseModel):
+    line: int
+    reason: str
+
+
+class KeyImportReport(BaseModel):
+    """
+    Outcome of a bulk import. Only the first rejections are listed in detail.
+    """
+
+    total_rows: int
+    imported: int
+    rejected: int
+    rejections: list[KeyImportRejection]
+    rejections_truncated: bool
+
+
 # ==============================================================================
 # Device Provisioning Schemas (Public)
 # ==============================================================================
@@ -78,6 +124,57 @@ class DeviceProvisionResponse(BaseModel):
     certificate_id: str
     thing_name: str
     thing_arn: str
+    # AWS region of the IoT endpoint the device must connect to
+    region: str | None = None
+
+
+class DeviceCsrRegistrationRequest(DeviceRegistrationRequest):
+    """
+    Request body for the /register/csr endpoint: the device keeps its private
+    key and sends a PEM CSR whose common name is its device_id.
+    """
+
+    csr: str = Field(..., min_length=1, max_length=16384, description="PEM encoded CSR")
+
+
+class DeviceCsrProvisionResponse(BaseModel):
+    """
+    Response for a successful CSR registration (no private key).
+    """
+
+    certificate_pem: str
+    certificate_id: str
+    thing_name: str
+    thing_arn: str
+    region: str | None = None
+
+
+class DeviceBatchRegistrationRequest(BaseModel):
+    """
+    Request body for the /register/batch endpoint, sent by a gateway on behalf
+    of its child devices. The maximum batch size is a service setting.
+    """
+
+    devices: list[DeviceRegistrationRequest] = Field(..., min_length=1)
+
+    @field_validator("devices")
+    @classmethod
+    def unique_device_ids(cls, devices: list[DeviceRegistrationRequest]):
+        device_ids = [device.device_id for device in devices]
+        if len(device_ids) != len(set(device_ids)):
+            raise ValueError("device_id values must be unique within a batch")
+        return devices
+
+
+class DeviceBatchRegistrationResult(BaseModel):
+    """
+    One line of the /register/batch NDJSON response.
+    """
+
+    device_id: str
+    status: Literal["provisioned", "failed"]
+    credentials: DeviceProvisionResponse | None = None
+    error: str | None = None
 
 
 # ==============================================================================
@@ -91,8 +188,12 @@ class IotDevice(BaseModel):
     """
 
     thing_name: str
-    thing_arn: str
+    # Not returned by fleet indexing searches
+    thing_arn: str | None = None
     attributes: dict
+    region: str | None = None
+    # Only known when answered from the fleet index
+    connected: bool | None = None
 
 
 class RevokeCertificateRequest(BaseModel):
@@ -101,3 +202,206 @@ class RevokeCertificateRequest(BaseModel):
     """
 
     certificate_id: str
+    # Region the certificate lives in, AWS_REGION when omitted
+    region: str | None = None
+
+
+class RevocationJobCreateRequest(BaseModel):
+    """
+    Revokes every device onboarded with one bootstrap key, or with any key of a group.
+    """
+
+    key_id: int | None = None
+    group: str | None = Field(default=None, min_length=1, max_length=255)
+
+    @model_validator(mode="after")
+    def exactly_one_target(self):
+        if (self.key_id is None) == (self.group is None):
+            raise ValueError("Give exactly one of key_id or group")
+        return self
+
+
+class RevocationJobInfo(BaseModel):
+    """
+    Progress of a bulk revocation. `total` counts the certificates issued
+    under the key or group, `revoked` those already revoked (also by earlier runs).
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    key_id: int | None
+    group: str | None = Field(default=None, alias="key_group")
+    status: Literal["pending", "running", "completed", "incomplete"]
+    total: int
+    revoked: int
+    failed: int
+    created_date: datetime.datetime
+    updated_date: datetime.datetime
+
+
+class RotationCampaignCreateRequest(BaseModel):
+    """
+    Selects the certificates to rotate by key group (all groups when omitted)
+    and by age. `tps` and `grace_period_hours` default to the service settings.
+    """
+
+    group: str | None = Field(default=None, min_length=1, max_length=255)
+    min_age_days: int = Field(default=0, ge=0)
+    tps: float | None = Field(default=None, gt=0, le=100)
+    grace_period_hours: float | None = Field(default=None, ge=0)
+
+
+class RotationCampaignInfo(BaseModel):
+    """
+    Progress of a rotation campaign: `rotated` devices have a new certificate,
+    `deactivated` ones also had the old one deactivated after the grace period
+    once the device reported the switch, `stalled` ones reported a failure
+    and keep their old certificate.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    group: str | None = Field(default=None, alias="key_group")
+    registered_before: datetime.datetime
+    tps: float
+    grace_period_s: float
+    status: Literal["issuing", "grace", "completed"]
+    total: int
+    rotated: int
+    deactivated: int
+    stalled: int
+    failed: int
+    created_date: datetime.datetime
+    updated_date: datetime.datetime
+
+
+class ReconciledCertificate(BaseModel):
+    """
+    A certificate found by the reconciler: left ACTIVE without a Thing or a
+    foreign policy ("unattached") or REVOKED, and what was done with it.
+    """
+
+    certificate_id: str
+    region: str
+    status: str
+    reason: Literal["unattached", "revoked"]
+    created_date: datetime.datetime
+    action: Literal["would_delete", "deleted", "failed"]
+    error: str | None = None
+
+
+class CertificateReconcileReport(BaseModel):
+    """
+    Outcome of a reconciler pass. Counters cover every certificate; the list
+    is capped at `CERT_RECONCILER_REPORT_LIMIT` entries. A dry run deletes
+    nothing.
+    """
+
+    dry_run: bool
+    scanned: int = 0
+    unattached: int = 0
+    revoked: int = 0
+    deleted: int = 0
+    failed: int = 0
+    certificates: list[ReconciledCertificate] = []
+
+
+class CertificateReconcileJobInfo(CertificateReconcileReport):
+    """
+    Progress of a reconciliation started through the admin API; counters
+    and the report are updated after each page of certificates.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    status: Literal["pending", "running", "completed", "failed", "skipped", "interrupted"]
+    error: str | None = None
+    created_date: datetime.datetime
+    updated_date: datetime.datetime
+
+
+class AuditRecordInfo(BaseModel):
+    """
+    One audit log entry: a registration attempt or an admin API request.
+    `outcome` is the registration outcome or the HTTP status code.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    created_date: datetime.datetime
+    category: Literal["registration", "admin"]
+    action: str
+    outcome: str
+    key_id: int | None = None
+    key_hint: str | None = None
+    device_id: str | None = None
+    client_ip: str | None = None
+    request_id: str | None = None
+    detail: dict | None = None
+
+
+class OutboxEventInfo(BaseModel):
+    """
+    A dead-lettered outbox event: delivery failed OUTBOX_MAX_ATTEMPTS times.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    event_type: str
+    payload: dict
+    created_date: datetime.datetime
+    attempts: int
+    last_error: str | None = None
+    dead_lettered_date: datetime.datetime
+
+
+class OutboxRequeueRequest(BaseModel):
+    """
+    Dead letters to deliver again, all of them when `event_ids` is omitted.
+    """
+
+    event_ids: list[int] | None = Field(default=None, min_length=1, max_length=1000)
+
+
+class OutboxRequeueResponse(BaseModel):
+    requeued: int
+
+
+# ==============================================================================
+# Diagnostics Schemas (Admin)
+# ==============================================================================
+
+
+class ProfileInfo(BaseModel):
+    """
+    A stored request profile (collapsed stacks, ready for flame graph tools).
+    """
+
+    name: str
+    size_bytes: int
+    created_date: datetime.datetime
+
+
+class DependencyHealth(BaseModel):
+    """
+    Last probe result of one dependency: ok, degraded, down or unknown.
+    """
+
+    status: str
+    detail: str | None = None
+    latency_ms: float | None = None
+    checked_date: datetime.datetime | None = None
+
+
+class ReadinessResponse(BaseModel):
+    """
+    Overall readiness (the worst dependency status) and the status of each dependency.
+    """
+
+    status: str
+    checks: dict[str, DependencyHealth]
@@ -1,13 +1,40 @@
+import asyncio
 import datetime
+import time
+from contextlib import contextmanager
 
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.core import metrics
 from app.core.db import models
+from app.core.settings import Settings, get_settings
+from app.core.tracing import tracer
+
+
+def build_crypt_context(settings: Settings) -> CryptContext:
+    """
+    Hashing policy from settings. Hashes made with another scheme, or the
+    same scheme with other cost parameters, verify but report `needs_update`.
+    """
+    options = {
+        "bcrypt": {"bcrypt__rounds": settings.BCRYPT_ROUNDS},
+        "argon2": {
+            "argon2__time_cost": settings.ARGON2_TIME_COST,
+            "argon2__memory_cost": settings.ARGON2_MEMORY_COST_KIB,
+            "argon2__parallelism": settings.ARGON2_PARALLELISM,
+        },
+        "pbkdf2_sha256": {"pbkdf2_sha256__rounds": settings.PBKDF2_ROUNDS},
+    }
+    kwargs = {}
+    for scheme in settings.PASSWORD_SCHEMES:
+        kwargs.update(options.get(scheme, {}))
+    return CryptContext(schemes=settings.PASSWORD_SCHEMES, deprecated="auto", **kwargs)
+
 
 # Password hashing context for bootstrap keys
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = build_crypt_context(get_settings())
 
 
 def get_password_hash(password: str) -> str:
@@ -23,27 +50,53 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 # --- Device Security ---
 
 
-async def validate_bootstrap_key(db: AsyncSession, key: str) -> bool:
+@contextmanager
+def _validation_stage(stage: str):
+    """Times a stage of key validation as both a metric and a trace span."""
+    start = time.perf_counter()
+    with tracer.start_as_current_span(f"security.{stage}"):
+        try:
+            yield
+        finally:
+            metrics.KEY_VALIDATION_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+@tracer.start_as_current_span("security.validate_bootstrap_key")
+async def validate_bootstrap_key(db: AsyncSession, key: str) -> models.BootstrapKey | None:
     """
     Validates a device's bootstrap key.
 
     Iterates through stored hashes to find a match.
     Checks if the key is active and not expired.
+    Returns the matching key, or None if the key is not valid.
+
+    A valid key whose hash does not follow the current hashing policy is
+    rehashed; the new hash is saved with the caller's next commit, so a
+    policy change rolls out as keys are used.
     """
 
     if not key or len(key) < 4:
-        return False
-
-    result = await db.execute(
-        select(models.BootstrapKey)
-        .filter(models.BootstrapKey.is_active)
-        .filter(models.BootstrapKey.key_hint == key[-4:])
-    )
-    keys = result.scalars().all()
+        return None
+
+    with _validation_stage("db_query"):
+        # The expiration bound skips the partitions of expired keys
+        result = await db.execute(
+            select(models.BootstrapKey)
+            .filter(models.BootstrapKey.is_active)
+            .filter(models.BootstrapKey.key_hint == key[-4:])
+            .filter(
+                models.BootstrapKey.expiration_date >= datetime.datetime.now(datetime.timezone.utc)
+            )
+        )
+        keys = result.scalars().all()
 
     for db_key in keys:
         try:
-            is_match = verify_password(key, db_key.key_hash)
+            with _validation_stage("hash_verify"):
+                # Off the event loop: a verify, plus a full new hash when rehashing
+                is_match, new_hash = await asyncio.to_thread(
+                    pwd_context.verify_and_update, key, db_key.key_hash
+                )
         except Exception:
             continue
         if is_match:
@@ -53,10 +106,13 @@ async def validate_bootstrap_key(db: AsyncSession, key: str) -> bool:
                 expiration = expiration.replace(tzinfo=datetime.timezone.utc)
             if expiration < datetime.datetime.now(datetime.timezone.utc):
                 # Key is expired
-                return False
+                return None
+
+            if new_hash is not None:
+                db_key.key_hash = new_hash
 
             # Key is valid, active, and not expired
-            return True
+            return db_key
 
     # No key matched
-    return False
+    return None
@@ -1,8 +1,8 @@
 import os
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 
-from pydantic import PostgresDsn, SecretStr, ValidationInfo, field_validator
+from pydantic import PostgresDsn, SecretStr, ValidationInfo, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".env"))
@@ -26,11 +26,208 @@ class Settings(BaseSettings):
     postgres_port: int = 5432
     postgres_sslmode: str = "disable"
 
+    # Connection pool of each worker: DB_POOL_SIZE connections kept open, up
+    # to DB_MAX_OVERFLOW more opened under load
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+
+    # Online migrations (`alembic -x online=true upgrade head`): DDL waiting
+    # longer than this for a lock fails instead of queueing registrations
+    # behind it
+    MIGRATION_LOCK_TIMEOUT_MS: int = 5000
+
     AWS_REGION: str = "eu-west-1"
     IOT_POLICY_NAME: str = ""
 
+    # Further IoT regions next to AWS_REGION, and the region serving each key
+    # group (unmapped groups use AWS_REGION). Connections per regional client
+    AWS_REGIONS: list[str] = []
+    KEY_GROUP_REGIONS: dict[str, str] = {}
+    AWS_MAX_POOL_CONNECTIONS: int = 50
+
+    # Provisioning: "steps" (one IoT call per step) or "template" (one
+    # register_thing call; the built-in template unless a file is given)
+    IOT_PROVISIONING_MODE: Literal["steps", "template"] = "steps"
+    IOT_PROVISIONING_TEMPLATE_FILE: str = ""
+
+    # CSR registration: "aws" (create_certificate_from_csr) or "local" (signed
+    # by the CA below in a process pool, then registered with IoT)
+    CSR_SIGNING_MODE: Literal["aws", "local"] = "aws"
+    LOCAL_CA_CERT_FILE: str = ""
+    LOCAL_CA_KEY_FILE: str = ""
+    LOCAL_CA_KEY_PASSWORD: SecretStr = SecretStr("")
+    DEVICE_CERT_VALIDITY_DAYS: int = 365
+    CSR_SIGNING_WORKERS: int = 2
+
+    # Gateway batch registration
+    REGISTRATION_BATCH_MAX_DEVICES: int = 50
+    REGISTRATION_BATCH_CONCURRENCY: int = 8
+
+    # Bulk revocation of the devices onboarded with a key or key group: revocations
+    # in flight, registrations read per batch, and after how long without
+    # progress a "running" job is considered crashed and may be resumed
+    REVOCATION_CONCURRENCY: int = 8
+    REVOCATION_BATCH_SIZE: int = 200
+    REVOCATION_STALE_AFTER_S: float = 300.0
+
+    # Certificate rotation campaigns: default pace (replacement certificates
+    # per second, kept under the IoT API limits) and grace period before old
+    # certificates are deactivated; devices checkpointed per batch; issuing
+    # attempts per device; scheduler poll interval and campaign lease
+    ROTATION_SCHEDULER_ENABLED: bool = True
+    ROTATION_TPS: float = 5.0
+    ROTATION_GRACE_PERIOD_H: float = 72.0
+    ROTATION_BATCH_SIZE: int = 50
+    ROTATION_MAX_ATTEMPTS: int = 3
+    ROTATION_POLL_INTERVAL_S: float = 60.0
+    ROTATION_LEASE_S: float = 300.0
+
+    # Transactional outbox: events are only recorded when at least one sink is
+    # configured ("webhook", "file", "queue" or "module:SinkClass"). Failed
+    # batches are retried with exponential backoff, then dead-lettered after
+    # the maximum attempts; delivered events are kept for the retention period.
+    # The in-process queue drops events when full instead of failing batches
+    OUTBOX_SINKS: list[str] = []
+    OUTBOX_WEBHOOK_URL: str = ""
+    OUTBOX_WEBHOOK_TIMEOUT_S: float = 5.0
+    OUTBOX_FILE_PATH: str = "outbox_events.jsonl"
+    OUTBOX_QUEUE_MAXSIZE: int = 10000
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_S: float = 1.0
+    OUTBOX_RETRY_BASE_S: float = 1.0
+    OUTBOX_RETRY_MAX_S: float = 300.0
+    OUTBOX_MAX_ATTEMPTS: int = 20
+    OUTBOX_RETENTION_H: float = 24.0
+
+    # Certificate reconciler: every CERT_RECONCILER_INTERVAL_H, deletes the
+    # certificates left ACTIVE but unattached (failed provisioning) or
+    # REVOKED, once older than CERT_RECONCILER_GRACE_H; at most
+    # CERT_RECONCILER_TPS certificates per second, CERT_RECONCILER_CONCURRENCY
+    # at a time. Only reports what it would delete while
+    # CERT_RECONCILER_DRY_RUN is set. Reports list at most
+    # CERT_RECONCILER_REPORT_LIMIT certificates.
+    CERT_RECONCILER_ENABLED: bool = True
+    CERT_RECONCILER_DRY_RUN: bool = True
+    CERT_RECONCILER_INTERVAL_H: float = 24.0
+    CERT_RECONCILER_GRACE_H: float = 24.0
+    CERT_RECONCILER_TPS: float = 5.0
+    CERT_RECONCILER_CONCURRENCY: int = 8
+    CERT_RECONCILER_REPORT_LIMIT: int = 1000
+
+    # Bootstrap key partitions (by expiration month): created
+    # KEY_PARTITIONS_AHEAD_MONTHS ahead every KEY_RETENTION_INTERVAL_H. With
+    # KEY_RETENTION_ENABLED, once all keys of a month expired KEY_RETENTION_DAYS
+    # ago, its partition is archived as NDJSON to KEY_ARCHIVE_DIR and dropped.
+    # KEY_ARCHIVE_DIR must then be set explicitly: an absolute path on durable
+    # storage, or "" to drop without archiving.
+    KEY_PARTITIONS_ENABLED: bool = True
+    KEY_RETENTION_ENABLED: bool = False
+    KEY_RETENTION_INTERVAL_H: float = 24.0
+    KEY_PARTITIONS_AHEAD_MONTHS: int = 13
+    KEY_RETENTION_DAYS: int = 90
+    KEY_ARCHIVE_DIR: Optional[str] = None
+
+    # Audit log: records are buffered in memory and written with COPY every
+    # AUDIT_FLUSH_INTERVAL_S or AUDIT_BATCH_SIZE records; at most
+    # AUDIT_MAX_BUFFER wait while the database is down. Monthly partitions
+    # older than AUDIT_RETENTION_MONTHS are dropped. Queries without a window
+    # cover the last AUDIT_QUERY_DEFAULT_DAYS.
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_S: float = 1.0
+    AUDIT_MAX_BUFFER: int = 100_000
+    AUDIT_RETENTION_MONTHS: int = 13
+    AUDIT_QUERY_DEFAULT_DAYS: int = 30
+
+    # Registration admission control: concurrent AWS provisioning chains (a
+    # batch counts its REGISTRATION_BATCH_CONCURRENCY), how many may wait for
+    # a slot and for how long before being shed with a 503
+    REGISTRATION_MAX_CONCURRENCY: int = 32
+    REGISTRATION_MAX_QUEUE: int = 256
+    REGISTRATION_QUEUE_TIMEOUT_S: float = 5.0
+
+    # Load balancer / proxy networks (CIDRs) whose X-Forwarded-For is trusted
+    # for the client address. Behind an ALB, set it to the ALB subnets: when
+    # empty, every device behind it shares the ALB's address
+    TRUSTED_PROXY_CIDRS: list[str] = []
+
+    # Failed bootstrap key attempts: token buckets per client IP and per key
+    # hint, refilled at RATE per second. "memory" is per worker, "shared"
+    # keeps the buckets in Postgres for all workers
+    AUTH_THROTTLE_ENABLED: bool = True
+    AUTH_THROTTLE_MODE: Literal["memory", "shared"] = "memory"
+    AUTH_THROTTLE_IP_RATE: float = 0.2
+    AUTH_THROTTLE_IP_BURST: float = 20.0
+    AUTH_THROTTLE_HINT_RATE: float = 0.1
+    AUTH_THROTTLE_HINT_BURST: float = 5.0
+    AUTH_THROTTLE_TTL_S: float = 900.0
+    AUTH_THROTTLE_MAX_ENTRIES: int = 100000
+
+    # Tracing: "none", "stdout", "file" or "package.module:SpanExporterClass"
+    TRACING_EXPORTER: str = "none"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+
+    # Sampling profiler: a random share of requests, plus private API requests
+    # sending the token in the X-Profile-Token header
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_TOKEN: SecretStr = SecretStr("")
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 50
+
+    # Event-loop lag monitor: probes the loop every interval and logs the stack
+    # of any callback blocking it for longer than the threshold
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_MONITOR_INTERVAL_MS: float = 50.0
+    LOOP_MONITOR_BLOCK_THRESHOLD_MS: float = 100.0
+
+    # Logging: "json" or "text"; rate limits map a logger name to the records
+    # per second each of its call sites may emit
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_RATE_LIMITS: dict[str, float] = {"app.api.public.v1.registration": 10.0}
+
+    # Readiness prober: results older than the TTL are reported as unknown
+    HEALTH_PROBE_INTERVAL_S: float = 10.0
+    HEALTH_PROBE_TTL_S: float = 30.0
+    HEALTH_PROBE_TIMEOUT_S: float = 3.0
+    HEALTH_DEGRADED_LATENCY_MS: float = 500.0
+
+    # Bootstrap key hashing: new hashes use the first scheme, the others are
+    # still verified and rehashed on the next successful validation.
+    # Schemes: "bcrypt", "argon2" (needs the argon2 extra), "pbkdf2_sha256"
+    PASSWORD_SCHEMES: list[str] = ["bcrypt"]
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 2
+    ARGON2_MEMORY_COST_KIB: int = 19456
+    ARGON2_PARALLELISM: int = 1
+    PBKDF2_ROUNDS: int = 600000
+
     sqlalchemy_postgres_uri: Optional[PostgresDsn] = None
 
+    @model_validator(mode="after")
+    def check_key_group_regions(self) -> "Settings":
+        unknown = set(self.KEY_GROUP_REGIONS.values()) - {self.AWS_REGION, *self.AWS_REGIONS}
+        if unknown:
+            raise ValueError(
+                f"KEY_GROUP_REGIONS maps groups to regions missing from AWS_REGIONS: "
+                f"{', '.join(sorted(unknown))}"
+            )
+        return self
+
+    @model_validator(mode="after")
+    def check_key_archive_dir(self) -> "Settings":
+        if not self.KEY_RETENTION_ENABLED:
+            return self
+        if self.KEY_ARCHIVE_DIR is None:
+            raise ValueError(
+                'KEY_RETENTION_ENABLED needs KEY_ARCHIVE_DIR: an absolute path, or "" to drop '
+                "expired keys without archiving them"
+            )
+        if self.KEY_ARCHIVE_DIR and not os.path.isabs(self.KEY_ARCHIVE_DIR):
+            raise ValueError("KEY_ARCHIVE_DIR must be an absolute path")
+        return self
+
     @field_validator("sqlalchemy_postgres_uri", mode="after")
     def assemble_postgres_connection(
         cls, v: Optional[PostgresDsn], values: ValidationInfo # noqa: N805
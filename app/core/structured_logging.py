@@ -0,0 +1,153 @@
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import TextIO
+
+from opentelemetry import trace
+
+from app.core.settings import Settings
+
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+device_id_var: ContextVar[str | None] = ContextVar("device_id", default=None)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# Loggers whose handlers are replaced so everything goes through the queue
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+def bind_device_id(device_id: str) -> None:
+    """Tags the log records of the current request (or task) with a device id."""
+    device_id_var.set(device_id)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Stamps records with the request id, device id and trace id of the
+    emitting context. Runs in the caller, before the record is queued.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.device_id = device_id_var.get()
+        span_context = trace.get_current_span().get_span_context()
+        record.trace_id = f"{span_context.trace_id:032x}" if span_context.is_valid else None
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site for hot-path loggers. `limits` maps a logger
+    name (children included) to the records per second each of its call
+    sites may emit; records over budget are dropped and counted, and the
+    next record let through carries the count in `suppressed`.
+    """
+
+    def __init__(self, limits: dict[str, float]) -> None:
+        super().__init__()
+        self.limits = limits
+        self._buckets: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def _limit_for(self, name: str) -> float | None:
+        while name:
+            if name in self.limits:
+                return self.limits[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self._limit_for(record.name)
+        if rate is None:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            # [tokens, last refill, suppressed since last emitted record]
+            bucket = self._buckets.setdefault(key, [max(rate, 1.0), now, 0])
+            bucket[0] = min(max(rate, 1.0), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1.0
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in ("request_id", "device_id", "trace_id", "suppressed"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    Queues records with their message merged but their fields intact, so the
+    listener thread can still format them as JSON.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(settings: Settings, stream: TextIO | None = None) -> QueueListener:
+    """
+    Routes all logging through a queue: request handlers only enqueue
+    records and a listener thread formats and writes them, so a slow
+    stderr never blocks the event loop. Returns the started listener,
+    which must be stopped on shutdown to flush the queue.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    if settings.LOG_RATE_LIMITS:
+        queue_handler.addFilter(RateLimitFilter(settings.LOG_RATE_LIMITS))
+
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL)
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
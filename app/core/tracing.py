@@ -0,0 +1,132 @@
+import importlib
+import json
+import sys
+import threading
+from collections.abc import Sequence
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.trace import Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.settings import Settings
+
+tracer = trace.get_tracer("onboarding_service")
+
+# Longest SQL statement recorded on a span
+MAX_STATEMENT_LENGTH = 2048
+
+
+def _span_record(span: ReadableSpan) -> dict:
+    context = span.get_span_context()
+    return {
+        "name": span.name,
+        "trace_id": f"{context.trace_id:032x}",
+        "span_id": f"{context.span_id:016x}",
+        "parent_span_id": f"{span.parent.span_id:016x}" if span.parent else None,
+        "start_time_unix_nano": span.start_time,
+        "end_time_unix_nano": span.end_time,
+        "duration_ms": (span.end_time - span.start_time) / 1e6,
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+        "events": [
+            {"name": e.name, "timestamp": e.timestamp, "attributes": dict(e.attributes or {})}
+            for e in span.events
+        ],
+    }
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """
+    Writes one compact JSON object per finished span, to a file or stdout,
+    so traces can be collected offline and loaded into any trace viewer.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        self._lock = threading.Lock()
+        self._stream = open(path, "a", encoding="utf-8") if path else sys.stdout
+        self._owns_stream = path is not None
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(_span_record(span), default=str) + "\n" for span in spans)
+        with self._lock:
+            self._stream.write(lines)
+            self._stream.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        if self._owns_stream:
+            self._stream.close()
+
+
+def build_exporter(settings: Settings) -> SpanExporter | None:
+    """
+    Resolves `TRACING_EXPORTER`: "none", "stdout", "file" (JSON lines at
+    `TRACING_FILE_PATH`) or the dotted path of any SpanExporter class,
+    e.g. "opentelemetry.exporter.otlp.proto.http.trace_exporter:OTLPSpanExporter".
+    """
+    name = settings.TRACING_EXPORTER
+    if name == "none":
+        return None
+    if name == "stdout":
+        return JsonLinesSpanExporter()
+    if name == "file":
+        return JsonLinesSpanExporter(settings.TRACING_FILE_PATH)
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown TRACING_EXPORTER {name!r}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def configure_tracing(settings: Settings) -> None:
+    """
+    Installs the SDK tracer provider. Without an exporter, spans stay
+    non-recording but incoming W3C trace context is still propagated.
+    """
+    exporter = build_exporter(settings)
+    if exporter is None:
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.app_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Wraps every statement executed by a (sync or async) engine in a span.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_span(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.start_span(
+            "db.query",
+            kind=trace.SpanKind.CLIENT,
+            attributes={
+                "db.system": "postgresql",
+                "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            },
+        )
+        conn.info.setdefault("tracing_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_span(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("tracing_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def _fail_span(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("tracing_spans") if conn is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_exception(exception_context.original_exception)
+            span.set_status(Status(StatusCode.ERROR))
+            span.end()
@@ -1,17 +1,97 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from app.api.middleware import (
+    AuditMiddleware,
+    ForwardedClientMiddleware,
+    MetricsMiddleware,
+    ProfilingMiddleware,
+    RequestContextMiddleware,
+    TracingMiddleware,
+)
 from app.api.private.v1.private_router import private_router
 from app.api.public.v1.public_router import public_router
 from app.api.root_path import base_router
+from app.core.audit import get_audit_writer
+from app.core.ca import get_local_ca
+from app.core.cert_reconciler import cancel_reconcile_jobs, get_cert_reconciler
+from app.core.health import get_health_prober
+from app.core.key_retention import get_key_retention_job
+from app.core.loop_monitor import LoopLagMonitor
+from app.core.outbox import get_outbox_dispatcher
+from app.core.profiling import get_profile_store
+from app.core.revocation import cancel_revocation_jobs
+from app.core.rotation import get_rotation_scheduler
 from app.core.settings import get_settings
+from app.core.structured_logging import configure_logging
+from app.core.tracing import configure_tracing
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener = configure_logging(settings)
+    loop_monitor = None
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor = LoopLagMonitor.from_settings(settings)
+        loop_monitor.start()
+    health_prober = get_health_prober()
+    health_prober.start()
+    audit_writer = get_audit_writer()
+    audit_writer.start()
+    # The CA is parsed and its worker processes started now, so a bad key or
+    # password fails the startup rather than the first CSR
+    local_ca = get_local_ca() if settings.CSR_SIGNING_MODE == "local" else None
+    if local_ca is not None:
+        await local_ca.start()
+    outbox_dispatcher = get_outbox_dispatcher() if settings.OUTBOX_SINKS else None
+    if outbox_dispatcher is not None:
+        outbox_dispatcher.start()
+    rotation_scheduler = get_rotation_scheduler() if settings.ROTATION_SCHEDULER_ENABLED else None
+    if rotation_scheduler is not None:
+        rotation_scheduler.start()
+    key_retention = get_key_retention_job() if settings.KEY_PARTITIONS_ENABLED else None
+    if key_retention is not None:
+        key_retention.start()
+    cert_reconciler = get_cert_reconciler() if settings.CERT_RECONCILER_ENABLED else None
+    if cert_reconciler is not None:
+        cert_reconciler.start()
+    yield
+    if cert_reconciler is not None:
+        await cert_reconciler.stop()
+    if key_retention is not None:
+        await key_retention.stop()
+    if rotation_scheduler is not None:
+        await rotation_scheduler.stop()
+    await cancel_revocation_jobs()
+    await cancel_reconcile_jobs()
+    if outbox_dispatcher is not None:
+        await outbox_dispatcher.stop()
+    await audit_writer.stop()
+    await health_prober.stop()
+    if local_ca is not None:
+        local_ca.shutdown()
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    log_listener.stop()
+
 
 app = FastAPI(
     title=get_settings().app_name,
     description="Manages device bootstrapping and provides an admin API for AWS IoT Core",
     version="1.0",
+    lifespan=lifespan,
 )
 
 settings = get_settings()
+configure_tracing(settings)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, settings=settings, store=get_profile_store())
+app.add_middleware(AuditMiddleware, prefix=settings.API_PRIVATE_V1_STR, writer=get_audit_writer())
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(RequestContextMiddleware)
+app.add_middleware(ForwardedClientMiddleware, trusted_proxies=settings.TRUSTED_PROXY_CIDRS)
 app.include_router(base_router)
 app.include_router(public_router, prefix=settings.API_PUBLIC_V1_STR)
 app.include_router(private_router, prefix=settings.API_PRIVATE_V1_STR)
@@ -0,0 +1,61 @@
+"""
+Compares the cost of hashing and verifying a bootstrap key under each
+supported scheme and cost parameter, to pick PASSWORD_SCHEMES and its
+cost settings. Verify time bounds registration throughput per core.
+
+    python benchmarks/hash_schemes.py [--repeat 5]
+"""
+
+import argparse
+import secrets
+import statistics
+import time
+
+from passlib.context import CryptContext
+from passlib.exc import MissingBackendError
+
+CANDIDATES = [
+    ("bcrypt", {"bcrypt__rounds": 10}),
+    ("bcrypt", {"bcrypt__rounds": 12}),
+    ("bcrypt", {"bcrypt__rounds": 14}),
+    ("argon2", {"argon2__time_cost": 2, "argon2__memory_cost": 19456, "argon2__parallelism": 1}),
+    ("argon2", {"argon2__time_cost": 3, "argon2__memory_cost": 65536, "argon2__parallelism": 4}),
+    ("pbkdf2_sha256", {"pbkdf2_sha256__rounds": 29000}),
+    ("pbkdf2_sha256", {"pbkdf2_sha256__rounds": 600000}),
+]
+
+
+def _median_ms(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Timings per measurement")
+    args = parser.parse_args()
+
+    key = secrets.token_urlsafe(32)
+    print(f"{'scheme':<15} {'parameters':<48} {'hash ms':>9} {'verify ms':>10} {'verify/s':>9}")
+    for scheme, options in CANDIDATES:
+        parameters = ", ".join(f"{k.split('__')[1]}={v}" for k, v in options.items())
+        context = CryptContext(schemes=[scheme], **options)
+        try:
+            key_hash = context.hash(key)
+        except MissingBackendError:
+            print(f"{scheme:<15} {parameters:<48} {'backend not installed':>30}")
+            continue
+        hash_ms = _median_ms(lambda: context.hash(key), args.repeat)
+        verify_ms = _median_ms(lambda: context.verify(key, key_hash), args.repeat)
+        print(
+            f"{scheme:<15} {parameters:<48} {hash_ms:>9.1f} {verify_ms:>10.1f}"
+            f" {1000 / verify_ms:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compares the "steps" and "template" provisioning modes against the in-process
+IoT stand-in (benchmarks/fake_iot.py) with a simulated AWS round-trip time.
+Runs with the application settings, so the service environment must be set.
+
+    python benchmarks/provisioning_modes.py [--devices 200] [--concurrency 16] [--latency-ms 40]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core import aws_iot_client  # noqa: E402
+from benchmarks.fake_iot import FakeIotClient, FakeIotClientRegistry  # noqa: E402
+
+
+async def run(mode: str, devices: int, concurrency: int, latency: float) -> None:
+    client = FakeIotClient(latency)
+    aws_iot_client.clients = FakeIotClientRegistry(client)
+    aws_iot_client.settings.IOT_PROVISIONING_MODE = mode
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def provision(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await aws_iot_client.provision_device(f"bench-{mode}-{i}", "bench-policy")
+            timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(provision(i) for i in range(devices)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{mode:<9} {client.calls / devices:>10.1f} {statistics.mean(timings) * 1000:>12.1f}"
+        f" {sorted(timings)[int(len(timings) * 0.99) - 1] * 1000:>11.1f}"
+        f" {devices / elapsed:>12.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'calls/dev':>10} {'mean ms':>12} {'p99 ms':>11} {'devices/s':>12}")
+    for mode in ("steps", "template"):
+        asyncio.run(run(mode, args.devices, args.concurrency, args.latency_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
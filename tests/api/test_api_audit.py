@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.audit import ADMIN, REGISTRATION, get_audit_writer
+from app.core.crud.audit_log import copy_records, ensure_partitions
+
+
+@pytest.fixture
+def audit_buffer():
+    writer = get_audit_writer()
+    writer._buffer.clear()
+    yield writer._buffer
+    writer._buffer.clear()
+
+
+@pytest.mark.asyncio
+class TestAuditRecording:
+    @mock.patch("app.api.public.v1.registration.security")
+    async def test_rejected_registration_is_audited(self, mocked_security, client, audit_buffer):
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=None)
+        resp = await client.post(
+            "/public/v1/register",
+            json={"device_id": "sensor-1"},
+            headers={"X-Api-Key": "fake_api_key", "X-Request-ID": "req-1"},
+        )
+        assert resp.status_code == 401
+
+        (entry,) = audit_buffer
+        assert entry[1:6] == (REGISTRATION, "register_device", "invalid_key", None, "_key")
+        assert entry[6] == "sensor-1"
+        assert entry[8] == "req-1"
+
+    async def test_admin_request_is_audited(self, client, audit_buffer):
+        resp = await client.delete("/private/v1/admin/keys/424242?verbose=1")
+        assert resp.status_code == 404
+
+        (entry,) = audit_buffer
+        assert entry[1:5] == (ADMIN, "DELETE /private/v1/admin/keys/{key_id}", "404", 424242)
+        assert entry[9] == '{"query": "verbose=1"}'
+
+    async def test_public_requests_are_not_audited_as_admin(self, client, audit_buffer):
+        await client.get("/ping")
+        assert list(audit_buffer) == []
+
+
+@pytest.mark.asyncio
+class TestAuditQuery:
+    async def test_records_are_paged_newest_first(self, client, db_session):
+        now = datetime.now(timezone.utc)
+        await ensure_partitions(db_session, now.date().replace(day=1), 1)
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        await copy_records(
+            db_session,
+            [
+                (start + timedelta(seconds=n), ADMIN, "GET /x", "200", 5, *[None] * 5)
+                for n in range(3)
+            ],
+        )
+
+        resp = await client.get("/private/v1/admin/audit", params={"key_id": 5, "limit": 2})
+        assert resp.status_code == 200
+        first = resp.json()
+        assert [r["created_date"] for r in first] == sorted(
+            (r["created_date"] for r in first), reverse=True
+        )
+        assert len(first) == 2
+
+        resp = await client.get(
+            "/private/v1/admin/audit",
+            params={"key_id": 5, "limit": 2, "next_token": resp.headers["X-Next-Token"]},
+        )
+        (last,) = resp.json()
+        assert "X-Next-Token" not in resp.headers
+        assert last["created_date"] < first[-1]["created_date"]
+
+    async def test_other_keys_and_windows_are_excluded(self, client):
+        resp = await client.get(
+            "/private/v1/admin/audit",
+            params={"key_id": 6, "until": "2000-01-01T00:00:00Z"},
+        )
+        assert resp.status_code == 200
+        assert resp.json() == []
+
+    async def test_invalid_token_is_rejected(self, client):
+        resp = await client.get("/private/v1/admin/audit", params={"next_token": "garbage"})
+        assert resp.status_code == 400
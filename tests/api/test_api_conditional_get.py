@@ -0,0 +1,79 @@
+from unittest import mock
+from unittest.mock import AsyncMock
+
+import pytest
+
+
+async def stream_devices():
+    return
+    yield
+
+
+@pytest.mark.asyncio
+class TestKeysConditionalGet:
+    async def test_list_keys_returns_etag(self, client):
+        resp = await client.get("/private/v1/admin/keys")
+        assert resp.status_code == 200
+        assert resp.headers["ETag"].startswith('W/"bootstrap_keys-')
+
+    async def test_list_keys_not_modified(self, client):
+        etag = (await client.get("/private/v1/admin/keys")).headers["ETag"]
+        resp = await client.get("/private/v1/admin/keys", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+        assert resp.content == b""
+
+    async def test_list_keys_etag_changes_on_write(self, client):
+        etag = (await client.get("/private/v1/admin/keys")).headers["ETag"]
+        created = await client.post("/private/v1/admin/keys", json={"group": "etag"})
+        resp = await client.get("/private/v1/admin/keys", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+
+        etag = resp.headers["ETag"]
+        key_id = created.json()["id"]
+        await client.put(f"/private/v1/admin/keys/{key_id}", json={"activation_flag": False})
+        resp = await client.get("/private/v1/admin/keys", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+
+        etag = resp.headers["ETag"]
+        await client.delete(f"/private/v1/admin/keys/{key_id}")
+        resp = await client.get("/private/v1/admin/keys", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+
+    @pytest.mark.parametrize("expired", ["true", "false"])
+    async def test_expired_filter_is_not_cacheable(self, client, expired):
+        etag = (await client.get("/private/v1/admin/keys")).headers["ETag"]
+        resp = await client.get(
+            "/private/v1/admin/keys",
+            params={"expired": expired},
+            headers={"If-None-Match": etag},
+        )
+        assert resp.status_code == 200
+        assert "ETag" not in resp.headers
+
+
+@mock.patch("app.api.private.v1.device_management.aws_iot_client")
+@pytest.mark.asyncio
+class TestDevicesConditionalGet:
+    async def test_list_devices_not_modified_skips_aws(self, mocked_iot_client, client):
+        mocked_iot_client.iter_provisioned_devices = mock.Mock(side_effect=lambda: stream_devices())
+        etag = (await client.get("/private/v1/admin/devices")).headers["ETag"]
+        mocked_iot_client.iter_provisioned_devices.reset_mock()
+
+        resp = await client.get("/private/v1/admin/devices", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        mocked_iot_client.iter_provisioned_devices.assert_not_called()
+
+    async def test_revoke_changes_devices_etag(self, mocked_iot_client, client):
+        mocked_iot_client.iter_provisioned_devices = mock.Mock(side_effect=lambda: stream_devices())
+        mocked_iot_client.revoke_device_certificate = AsyncMock(return_value=None)
+        etag = (await client.get("/private/v1/admin/devices")).headers["ETag"]
+
+        resp = await client.post(
+            "/private/v1/admin/devices/revoke", json={"certificate_id": "fake_id"}
+        )
+        assert resp.status_code == 204
+        resp = await client.get("/private/v1/admin/devices", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
@@ -0,0 +1,163 @@
+from unittest import mock
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.aws_iot_client import InvalidDeviceQueryError
+
+DEVICE = {"thing_name": "sensor-1", "attributes": {"floor": "2"}, "region": "eu-west-1"}
+
+
+async def stream_devices(*devices: dict, error: Exception | None = None):
+    for device in devices:
+        yield device
+    if error is not None:
+        raise error
+
+
+@mock.patch("app.api.private.v1.device_management.aws_iot_client")
+@pytest.mark.asyncio
+class TestDeviceListing:
+    async def test_unfiltered_lists_everything(self, mocked_iot_client, client):
+        mocked_iot_client.iter_provisioned_devices = mock.Mock(
+            side_effect=lambda: stream_devices(DEVICE, {**DEVICE, "thing_name": "sensor-2"})
+        )
+        resp = await client.get("/private/v1/admin/devices")
+        assert resp.status_code == 200
+        assert [d["thing_name"] for d in resp.json()] == ["sensor-1", "sensor-2"]
+        assert resp.headers["X-Device-Query-Path"] == "list_things"
+        assert "ETag" in resp.headers
+        assert "X-Next-Token" not in resp.headers
+
+    async def test_unfiltered_listing_fails_up_front(self, mocked_iot_client, client):
+        mocked_iot_client.iter_provisioned_devices = mock.Mock(
+            side_effect=lambda: stream_devices(error=RuntimeError("throttled"))
+        )
+        resp = await client.get("/private/v1/admin/devices")
+        assert resp.status_code == 500
+
+    async def test_unfiltered_listing_is_aborted_when_a_region_fails(
+        self, mocked_iot_client, client
+    ):
+        mocked_iot_client.iter_provisioned_devices = mock.Mock(
+            side_effect=lambda: stream_devices(DEVICE, error=RuntimeError("throttled"))
+        )
+        with pytest.raises(RuntimeError):
+            await client.get("/private/v1/admin/devices")
+
+    async def test_filters_are_answered_server_side(self, mocked_iot_client, client):
+        mocked_iot_client.query_devices = AsyncMock(
+            return_value=([DEVICE], "tok", "search_index", [])
+        )
+        resp = await client.get(
+            "/private/v1/admin/devices",
+            params={"name_prefix": "sensor-", "attribute": ["floor=2"], "page_size": 10},
+        )
+        assert resp.status_code == 200
+        assert resp.json()[0]["thing_name"] == "sensor-1"
+        assert resp.headers["X-Device-Query-Path"] == "search_index"
+        assert resp.headers["X-Next-Token"] == "tok"
+        assert "ETag" in resp.headers
+        mocked_iot_client.query_devices.assert_called_once_with(
+            {
+                "name_prefix": "sensor-",
+                "attributes": {"floor": "2"},
+                "connected": None,
+                "thing_group": None,
+            },
+            10,
+            None,
+        )
+
+    async def test_connectivity_queries_are_not_cached(self, mocked_iot_client, client):
+        mocked_iot_client.query_devices = AsyncMock(return_value=([], None, "search_index", []))
+        resp = await client.get("/private/v1/admin/devices", params={"connected": "true"})
+        assert resp.status_code == 200
+        assert "ETag" not in resp.headers
+
+    async def test_truncated_regions_are_reported(self, mocked_iot_client, client):
+        mocked_iot_client.query_devices = AsyncMock(
+            return_value=([DEVICE], None, "search_index", ["us-east-1"])
+        )
+        resp = await client.get("/private/v1/admin/devices", params={"page_size": 10})
+        assert resp.status_code == 200
+        assert resp.headers["X-Truncated-Regions"] == "us-east-1"
+        assert "ETag" not in resp.headers
+
+    async def test_malformed_attribute_filter(self, mocked_iot_client, client):
+        resp = await client.get("/private/v1/admin/devices", params={"attribute": "floor"})
+        assert resp.status_code == 400
+
+    async def test_unsupported_query(self, mocked_iot_client, client):
+        mocked_iot_client.query_devices = AsyncMock(
+            side_effect=InvalidDeviceQueryError("needs fleet indexing")
+        )
+        resp = await client.get("/private/v1/admin/devices", params={"thing_group": "lab"})
+        assert resp.status_code == 400
+        assert resp.json()["detail"] == "needs fleet indexing"
+
+
+@mock.patch("app.api.private.v1.device_management.start_revocation_job")
+@pytest.mark.asyncio
+class TestBulkRevocation:
+    async def test_creates_and_starts_a_job(self, mocked_start, client):
+        resp = await client.post("/private/v1/admin/devices/revocations", json={"key_id": 7})
+        assert resp.status_code == 202
+        job = resp.json()
+        assert (job["key_id"], job["status"]) == (7, "pending")
+        mocked_start.assert_called_once_with(job["id"])
+
+        resp = await client.get(f"/private/v1/admin/devices/revocations/{job['id']}")
+        assert resp.status_code == 200
+        assert resp.json()["id"] == job["id"]
+
+        resp = await client.post(f"/private/v1/admin/devices/revocations/{job['id']}/resume")
+        assert resp.status_code == 202
+        assert mocked_start.call_count == 2
+
+    @pytest.mark.parametrize("body", [{}, {"key_id": 7, "group": "factory-a"}])
+    async def test_needs_exactly_one_target(self, mocked_start, client, body):
+        resp = await client.post("/private/v1/admin/devices/revocations", json=body)
+        assert resp.status_code == 422
+        mocked_start.assert_not_called()
+
+    async def test_unknown_job(self, mocked_start, client):
+        resp = await client.get("/private/v1/admin/devices/revocations/999999")
+        assert resp.status_code == 404
+        resp = await client.post("/private/v1/admin/devices/revocations/999999/resume")
+        assert resp.status_code == 404
+        mocked_start.assert_not_called()
+
+
+@mock.patch("app.api.private.v1.device_management.start_reconcile_job")
+@pytest.mark.asyncio
+class TestCertificateReconciliation:
+    async def test_dry_run_by_default(self, mocked_start, client):
+        resp = await client.post("/private/v1/admin/devices/certificates/reconcile")
+        assert resp.status_code == 202
+        job = resp.json()
+        assert job["dry_run"] is True
+        assert job["status"] == "pending"
+        mocked_start.assert_called_once_with(job["id"])
+
+        resp = await client.post("/private/v1/admin/devices/certificates/reconcile?dry_run=false")
+        assert resp.json()["dry_run"] is False
+
+        resp = await client.get(f"/private/v1/admin/devices/certificates/reconcile/{job['id']}")
+        assert resp.status_code == 200
+        assert resp.json()["scanned"] == 0
+        assert resp.json()["certificates"] == []
+
+    async def test_unknown_job(self, mocked_start, client):
+        resp = await client.get("/private/v1/admin/devices/certificates/reconcile/999999")
+        assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_revoke_rejects_unknown_region(client):
+    resp = await client.post(
+        "/private/v1/admin/devices/revoke",
+        json={"certificate_id": "fake_id", "region": "mars-north-1"},
+    )
+    assert resp.status_code == 400
+    assert "mars-north-1" in resp.json()["detail"]
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.core import export
+
+
+@pytest.mark.asyncio
+class TestKeyExportEndpoint:
+    async def seed(self, client):
+        for group in ["export-a", "export-a", "export-b"]:
+            await client.post("/private/v1/admin/keys", json={"group": group})
+
+    async def test_export_ndjson_filtered(self, client):
+        await self.seed(client)
+        resp = await client.get(
+            "/private/v1/admin/keys/export", params={"group": "export-a", "format": "ndjson"}
+        )
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in resp.text.splitlines()]
+        assert len(records) == 2
+        assert {r["group"] for r in records} == {"export-a"}
+        assert all(r["status"] == "active" for r in records)
+        assert "key_hash" not in records[0]
+
+    async def test_export_csv(self, client, monkeypatch):
+        # Force several chunks to check the header is written once
+        monkeypatch.setattr(export, "CHUNK_ROWS", 1)
+        await self.seed(client)
+        resp = await client.get("/private/v1/admin/keys/export", params={"format": "csv"})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(resp.text)))
+        assert len(rows) == 3
+        assert list(rows[0].keys()) == export.EXPORT_FIELDS
+
+    async def test_export_empty_csv_has_header(self, client):
+        resp = await client.get(
+            "/private/v1/admin/keys/export", params={"format": "csv", "group": "missing"}
+        )
+        assert resp.status_code == 200
+        assert resp.text.strip() == ",".join(export.EXPORT_FIELDS)
+
+    async def test_export_rejects_unknown_format(self, client):
+        resp = await client.get("/private/v1/admin/keys/export", params={"format": "xml"})
+        assert resp.status_code == 422
+
+    async def test_list_keys_filtered(self, client):
+        await self.seed(client)
+        resp = await client.get("/private/v1/admin/keys", params={"group": "export-b"})
+        assert resp.status_code == 200
+        assert [key["key_group"] for key in resp.json()] == ["export-b"]
+        resp = await client.get("/private/v1/admin/keys", params={"expired": True})
+        assert resp.json() == []
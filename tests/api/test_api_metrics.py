@@ -0,0 +1,23 @@
+import pytest
+from prometheus_client import REGISTRY
+
+
+@pytest.mark.asyncio
+class TestMetricsEndpoint:
+    async def test_metrics_exposes_route_latency(self, client):
+        await client.get("/ping")
+        await client.delete("/private/v1/admin/keys/9999")
+
+        resp = await client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain")
+        assert 'route="/ping",status="200"' in resp.text
+        assert 'route="/private/v1/admin/keys/{key_id}",status="404"' in resp.text
+
+    async def test_unmatched_routes_share_one_label(self, client):
+        await client.get("/no/such/path")
+        count = REGISTRY.get_sample_value(
+            "http_request_duration_seconds_count",
+            {"method": "GET", "route": "unmatched", "status": "404"},
+        )
+        assert count >= 1
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import func
+
+from app.core.db import models
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_can_be_listed_and_requeued(client, db_session):
+    db_session.add_all(
+        [
+            models.OutboxEvent(
+                event_type="key.created",
+                payload={"key_id": i},
+                attempts=20,
+                last_error="ConnectionError: consumer down",
+                dead_lettered_date=func.now(),
+            )
+            for i in range(2)
+        ]
+    )
+    db_session.add(models.OutboxEvent(event_type="key.deleted", payload={"key_id": 3}))
+    await db_session.commit()
+
+    resp = await client.get("/private/v1/admin/outbox/dead-letters")
+    assert resp.status_code == 200
+    dead_letters = resp.json()
+    assert [e["payload"]["key_id"] for e in dead_letters] == [0, 1]
+    assert dead_letters[0]["last_error"] == "ConnectionError: consumer down"
+
+    resp = await client.post(
+        "/private/v1/admin/outbox/dead-letters/requeue",
+        json={"event_ids": [dead_letters[0]["id"]]},
+    )
+    assert resp.json() == {"requeued": 1}
+    resp = await client.post("/private/v1/admin/outbox/dead-letters/requeue", json={})
+    assert resp.json() == {"requeued": 1}
+    resp = await client.get("/private/v1/admin/outbox/dead-letters")
+    assert resp.json() == []
@@ -0,0 +1,88 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from pydantic import SecretStr
+
+from app.api.middleware import ProfilingMiddleware
+from app.core.profiling import ProfileStore, get_profile_store
+from app.core.settings import Settings
+from app.main import app
+
+
+@pytest.fixture
+def store(tmp_path):
+    profile_store = ProfileStore(str(tmp_path), max_files=2)
+    app.dependency_overrides[get_profile_store] = lambda: profile_store
+    yield profile_store
+    app.dependency_overrides.pop(get_profile_store, None)
+
+
+async def slow_app(scope, receive, send):
+    await asyncio.sleep(0.02)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def profiled_client(store: ProfileStore, **overrides) -> AsyncClient:
+    settings = Settings(
+        PROFILING_ENABLED=True,
+        PROFILING_TOKEN=SecretStr("secret"),
+        PROFILING_INTERVAL_MS=1,
+        **overrides,
+    )
+    middleware = ProfilingMiddleware(slow_app, settings=settings, store=store)
+    return AsyncClient(transport=ASGITransport(app=middleware), base_url="http://test")
+
+
+@pytest.mark.asyncio
+class TestProfilingMiddleware:
+    async def test_privileged_header_profiles_private_requests(self, store):
+        async with profiled_client(store) as client:
+            resp = await client.get("/private/v1/admin/keys", headers={"X-Profile-Token": "secret"})
+        name = resp.headers["x-profile-id"]
+        assert [p["name"] for p in store.list()] == [name]
+        assert store.path(name).read_text().strip()
+
+    @pytest.mark.parametrize(
+        "path,token", [("/private/v1/admin/keys", "wrong"), ("/public/v1/register", "secret")]
+    )
+    async def test_requests_not_profiled_without_privilege(self, store, path, token):
+        async with profiled_client(store) as client:
+            resp = await client.get(path, headers={"X-Profile-Token": token})
+        assert "x-profile-id" not in resp.headers
+        assert store.list() == []
+
+    async def test_sample_rate_profiles_any_request(self, store):
+        async with profiled_client(store, PROFILING_SAMPLE_RATE=1.0) as client:
+            resp = await client.get("/ping")
+        assert "x-profile-id" in resp.headers
+
+
+def test_profile_store_is_a_bounded_ring(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    names = [store.new_name("GET", f"/path/{i}") for i in range(3)]
+    for name in names:
+        store.save(name, Counter({"a;b": 1}))
+    assert [p["name"] for p in store.list()] == names[:0:-1]
+    assert store.path(names[0]) is None
+
+
+@pytest.mark.asyncio
+class TestProfilesEndpoints:
+    async def test_list_and_download(self, client, store):
+        name = store.new_name("GET", "/private/v1/admin/keys")
+        store.save(name, Counter({"app.main:handler;app.core:work": 3}))
+
+        resp = await client.get("/private/v1/admin/profiles")
+        assert resp.status_code == 200
+        assert [p["name"] for p in resp.json()] == [name]
+
+        resp = await client.get(f"/private/v1/admin/profiles/{name}")
+        assert resp.status_code == 200
+        assert resp.text == "app.main:handler;app.core:work 3\n"
+
+    async def test_download_rejects_unknown_names(self, client, store):
+        resp = await client.get("/private/v1/admin/profiles/..%2F..%2Fetc%2Fpasswd")
+        assert resp.status_code == 404
@@ -0,0 +1,51 @@
+import pytest
+
+from app.core.health import HealthProber, get_health_prober
+from app.main import app
+
+
+async def healthy():
+    pass
+
+
+async def failing():
+    raise ConnectionError("unreachable")
+
+
+@pytest.fixture
+def prober_with():
+    def install(aws_check) -> HealthProber:
+        prober = HealthProber(
+            {"database": healthy, "aws_iot": aws_check},
+            interval=1.0,
+            ttl=60.0,
+            timeout=1.0,
+            degraded_latency=1.0,
+        )
+        app.dependency_overrides[get_health_prober] = lambda: prober
+        return prober
+
+    yield install
+    app.dependency_overrides.pop(get_health_prober, None)
+
+
+@pytest.mark.asyncio
+class TestReadyEndpoint:
+    async def test_ready_when_dependencies_are_healthy(self, client, prober_with):
+        await prober_with(healthy).run_once()
+        resp = await client.get("/ready")
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["status"] == "ok"
+        assert set(body["checks"]) == {"database", "aws_iot"}
+
+    async def test_not_ready_when_a_dependency_is_down(self, client, prober_with):
+        await prober_with(failing).run_once()
+        resp = await client.get("/ready")
+        assert resp.status_code == 503
+        assert resp.json()["checks"]["aws_iot"]["detail"] == "ConnectionError: unreachable"
+
+    async def test_not_ready_before_first_probe(self, client, prober_with):
+        prober_with(healthy)
+        resp = await client.get("/ready")
+        assert resp.status_code == 503
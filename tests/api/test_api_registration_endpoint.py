@@ -1,31 +1,49 @@
+import asyncio
+import json
 import secrets
+import threading
 from datetime import datetime, timedelta, timezone
 from unittest import mock
 from unittest.mock import AsyncMock
 
 import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
 
+from app.api.middleware import ForwardedClientMiddleware
+from app.api.public.v1.registration import _provision_batch
+from app.core.admission import AdmissionLimiter, get_registration_limiter
+from app.core.ca import InvalidCsrError, SigningUnavailableError
 from app.core.db import models
 from app.core.schemas import schemas
-from app.core.security import get_password_hash, validate_bootstrap_key
+from app.core.security import build_crypt_context, get_password_hash, validate_bootstrap_key
+from app.core.settings import Settings, get_settings
+from app.main import app
+from tests.core.test_ca import make_csr
+
+FAKE_DB_KEY = models.BootstrapKey(id=9999, key_hint="fake", key_group="fake_group")
 
 
 @mock.patch("app.api.public.v1.registration.security")
 @mock.patch("app.api.public.v1.registration.aws_iot_client")
 @pytest.mark.asyncio
 class TestRegistrationEndpointApi:
-    async def test_register_device_happy_path(self, mocked_iot_client, mocked_security, client):
+    async def test_register_device_happy_path(
+        self, mocked_iot_client, mocked_security, client, db_session
+    ):
         device_certs = schemas.DeviceProvisionResponse(
             certificate_pem="fake_pem",
             private_key="fake_key",
             certificate_id="fake_id",
             thing_name="fake_name",
             thing_arn="fake_arn",
+            region="us-east-1",
         )
 
-        mocked_iot_client.provision_device = AsyncMock(return_value=device_certs)
+        mocked_iot_client.provision_device = AsyncMock(return_value=device_certs.model_dump())
+        mocked_iot_client.region_for_group = mock.Mock(return_value="us-east-1")
 
-        mocked_security.validate_bootstrap_key = AsyncMock(return_value=True)
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
         resp = await client.post(
             "/public/v1/register",
             json={"device_id": "fake_device_id"},
@@ -34,14 +52,20 @@ class TestRegistrationEndpointApi:
         assert resp.status_code == 200
         assert resp.json() == device_certs.model_dump()
         mocked_iot_client.provision_device.assert_called_once_with(
-            device_id="fake_device_id", policy_name=mock.ANY
+            device_id="fake_device_id", policy_name=mock.ANY, region="us-east-1"
         )
+        mocked_iot_client.region_for_group.assert_called_once_with("fake_group")
         mocked_security.validate_bootstrap_key.assert_called_once_with(mock.ANY, "fake_api_key")
+        registration = await db_session.scalar(select(models.DeviceRegistration))
+        assert registration.device_id == "fake_device_id"
+        assert registration.certificate_id == "fake_id"
+        assert (registration.key_id, registration.key_group) == (9999, "fake_group")
+        assert registration.region == "us-east-1"
 
     async def test_registration_device_invalid_key(
         self, mocked_iot_client, mocked_security, client
     ):
-        mocked_security.validate_bootstrap_key = AsyncMock(return_value=False)
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=None)
         resp = await client.post(
             "/public/v1/register",
             json={"device_id": "fake_device_id"},
@@ -57,7 +81,7 @@ class TestRegistrationEndpointApi:
     ):
         mocked_iot_client.provision_device = AsyncMock(side_effect=Exception())
 
-        mocked_security.validate_bootstrap_key = AsyncMock(return_value=True)
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
         resp = await client.post(
             "/public/v1/register",
             json={"device_id": "fake_device_id"},
@@ -67,12 +91,12 @@ class TestRegistrationEndpointApi:
         detail = resp.json()["detail"]
         assert "Failed to provision device in AWS" in detail
         mocked_iot_client.provision_device.assert_called_once_with(
-            device_id="fake_device_id", policy_name=mock.ANY
+            device_id="fake_device_id", policy_name=mock.ANY, region=mock.ANY
         )
         mocked_security.validate_bootstrap_key.assert_called_once_with(mock.ANY, "fake_api_key")
 
     async def test_registration_missing_device_id(self, mocked_iot_client, mocked_security, client):
-        mocked_security.validate_bootstrap_key = AsyncMock(return_value=True)
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
         resp = await client.post(
             "/public/v1/register", json={}, headers={"X-Api-Key": "fake_api_key"}
         )
@@ -83,6 +107,111 @@ class TestRegistrationEndpointApi:
         assert resp.status_code == 401
 
 
+@mock.patch("app.api.public.v1.registration.security")
+@mock.patch("app.api.public.v1.registration.aws_iot_client")
+@pytest.mark.asyncio
+class TestBatchRegistrationEndpointApi:
+    @staticmethod
+    async def fake_provision(device_id: str, policy_name: str, region: str) -> dict:
+        if device_id == "broken":
+            raise Exception("boom")
+        return {
+            "certificate_pem": "fake_pem",
+            "private_key": "fake_key",
+            "certificate_id": f"cert-{device_id}",
+            "thing_name": device_id,
+            "thing_arn": f"arn:{device_id}",
+            "region": region,
+        }
+
+    async def test_register_batch_streams_per_device_results(
+        self, mocked_iot_client, mocked_security, client, db_session
+    ):
+        mocked_iot_client.provision_device = AsyncMock(side_effect=self.fake_provision)
+        mocked_iot_client.region_for_group = mock.Mock(return_value="us-east-1")
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
+        resp = await client.post(
+            "/public/v1/register/batch",
+            json={"devices": [{"device_id": "sensor-1"}, {"device_id": "broken"}]},
+            headers={"X-Api-Key": "fake_api_key"},
+        )
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        results = {r["device_id"]: r for r in map(json.loads, resp.text.splitlines())}
+        assert results["sensor-1"]["status"] == "provisioned"
+        assert results["sensor-1"]["credentials"]["certificate_id"] == "cert-sensor-1"
+        assert results["sensor-1"]["credentials"]["region"] == "us-east-1"
+        assert results["broken"]["status"] == "failed"
+        assert results["broken"]["error"] == "Failed to provision device in AWS"
+        assert mocked_iot_client.provision_device.call_count == 2
+        mocked_security.validate_bootstrap_key.assert_called_once_with(mock.ANY, "fake_api_key")
+        # Only provisioned devices are recorded
+        recorded = await db_session.scalars(select(models.DeviceRegistration.certificate_id))
+        assert recorded.all() == ["cert-sensor-1"]
+
+    async def test_register_batch_records_started_devices_when_the_client_leaves(
+        self, mocked_iot_client, mocked_security, db_session
+    ):
+        async def provision(device_id, policy_name, region):
+            # sensor-2 is still in AWS when the first result is streamed
+            await asyncio.sleep(0.05 if device_id == "sensor-2" else 0)
+            return await self.fake_provision(device_id, policy_name, region)
+
+        mocked_iot_client.provision_device = AsyncMock(side_effect=provision)
+        devices = [schemas.DeviceRegistrationRequest(device_id=f"sensor-{i}") for i in (1, 2, 3)]
+        results = _provision_batch(
+            mock.MagicMock(), db_session, FAKE_DB_KEY, devices, "policy", "eu-west-1", 1
+        )
+        first = await anext(results)
+        assert first.device_id == "sensor-1"
+        await results.aclose()
+
+        recorded = await db_session.scalars(select(models.DeviceRegistration.device_id))
+        # sensor-3 never got a slot
+        assert sorted(recorded.all()) == ["sensor-1", "sensor-2"]
+        assert mocked_iot_client.provision_device.call_count == 2
+
+    async def test_register_batch_invalid_key(self, mocked_iot_client, mocked_security, client):
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=None)
+        resp = await client.post(
+            "/public/v1/register/batch",
+            json={"devices": [{"device_id": "sensor-1"}]},
+            headers={"X-Api-Key": "fake_api_key"},
+        )
+        assert resp.status_code == 401
+        mocked_iot_client.provision_device.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "devices",
+        [
+            [],
+            [{"device_id": "same"}, {"device_id": "same"}],
+        ],
+    )
+    async def test_register_batch_rejects_invalid_batches(
+        self, mocked_iot_client, mocked_security, client, devices
+    ):
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
+        resp = await client.post(
+            "/public/v1/register/batch",
+            json={"devices": devices},
+            headers={"X-Api-Key": "fake_api_key"},
+        )
+        assert resp.status_code == 422
+        mocked_iot_client.provision_device.assert_not_called()
+
+    async def test_register_batch_too_large(self, mocked_iot_client, mocked_security, client):
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
+        resp = await client.post(
+            "/public/v1/register/batch",
+            json={"devices": [{"device_id": f"sensor-{i}"} for i in range(51)]},
+            headers={"X-Api-Key": "fake_api_key"},
+        )
+        assert resp.status_code == 400
+        mocked_security.validate_bootstrap_key.assert_not_called()
+        mocked_iot_client.provision_device.assert_not_called()
+
+
 @pytest.mark.asyncio
 class TestRegistrationEndpointSecurity:
     @staticmethod
@@ -135,3 +264,209 @@ class TestRegistrationEndpointSecurity:
         _, _ = await self.create_bootstrap_key(db_session)
         wrong_key = secrets.token_urlsafe(32)
         assert not await validate_bootstrap_key(db_session, wrong_key)
+
+    async def test_registration_device_key_rehashed_on_policy_change(self, db_session):
+        db_key, raw_key = await self.create_bootstrap_key(db_session)
+        old_hash = db_key.key_hash
+        policy = build_crypt_context(
+            Settings(PASSWORD_SCHEMES=["pbkdf2_sha256", "bcrypt"], PBKDF2_ROUNDS=1000)
+        )
+        with mock.patch("app.core.security.pwd_context", policy):
+            assert await validate_bootstrap_key(db_session, raw_key)
+            await db_session.commit()
+            assert db_key.key_hash != old_hash
+            assert policy.identify(db_key.key_hash) == "pbkdf2_sha256"
+            assert not policy.needs_update(db_key.key_hash)
+            # Once migrated the key keeps validating without another rehash
+            assert await validate_bootstrap_key(db_session, raw_key)
+            assert not db_session.dirty
+
+    async def test_registration_device_key_hashing_runs_off_the_event_loop(self, db_session):
+        _, raw_key = await self.create_bootstrap_key(db_session)
+        policy = build_crypt_context(
+            Settings(PASSWORD_SCHEMES=["pbkdf2_sha256", "bcrypt"], PBKDF2_ROUNDS=1000)
+        )
+        threads = []
+
+        def verify_and_update(*args):
+            threads.append(threading.get_ident())
+            return policy.verify_and_update(*args)
+
+        with mock.patch("app.core.security.pwd_context") as mocked_context:
+            mocked_context.verify_and_update = verify_and_update
+            assert await validate_bootstrap_key(db_session, raw_key)
+        assert threads and threading.get_ident() not in threads
+
+    async def test_registration_device_key_not_rehashed_under_current_policy(self, db_session):
+        db_key, raw_key = await self.create_bootstrap_key(db_session)
+        old_hash = db_key.key_hash
+        assert await validate_bootstrap_key(db_session, raw_key)
+        assert db_key.key_hash == old_hash
+
+
+@pytest.mark.asyncio
+async def test_register_sheds_load_when_saturated(client):
+    limiter = AdmissionLimiter("registration", max_concurrency=1, max_queue=0, queue_timeout=1.0)
+    app.dependency_overrides[get_registration_limiter] = lambda: limiter
+    try:
+        async with limiter.slot():
+            resp = await client.post(
+                "/public/v1/register",
+                json={"device_id": "fake_device_id"},
+                headers={"X-Api-Key": "fake_api_key"},
+            )
+    finally:
+        app.dependency_overrides.pop(get_registration_limiter, None)
+    assert resp.status_code == 503
+    assert int(resp.headers["retry-after"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_register_batch_is_admitted_by_its_fan_out(client):
+    limiter = AdmissionLimiter("registration", max_concurrency=4, max_queue=0, queue_timeout=1.0)
+    app.dependency_overrides[get_registration_limiter] = lambda: limiter
+    try:
+        # Two slots left: enough for a single registration, not for three chains
+        async with limiter.slot(2):
+            resp = await client.post(
+                "/public/v1/register/batch",
+                json={"devices": [{"device_id": f"sensor-{i}"} for i in range(3)]},
+                headers={"X-Api-Key": "fake_api_key"},
+            )
+    finally:
+        app.dependency_overrides.pop(get_registration_limiter, None)
+    assert resp.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_register_throttles_repeated_failures(client):
+    with mock.patch("app.api.public.v1.registration.security") as mocked_security:
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=None)
+        statuses = []
+        for _ in range(7):
+            resp = await client.post(
+                "/public/v1/register",
+                json={"device_id": "fake_device_id"},
+                headers={"X-Api-Key": "fake_api_key"},
+            )
+            statuses.append(resp.status_code)
+    # The key hint bucket allows a burst of 5 failures
+    assert statuses == [401] * 5 + [429] * 2
+    assert int(resp.headers["retry-after"]) >= 1
+    assert mocked_security.validate_bootstrap_key.call_count == 5
+
+
+def test_forwarded_client_trusts_only_proxy_hops():
+    middleware = ForwardedClientMiddleware(app, ["10.0.0.0/16"])
+    # The device prepended a fake address; the ALB appended the real one
+    assert middleware.forwarded_client("10.0.1.5", ["1.1.1.1, 203.0.113.7"]) == "203.0.113.7"
+    assert middleware.forwarded_client("10.0.1.5", ["203.0.113.7, 10.0.2.9"]) == "203.0.113.7"
+    # Only trusted peers may set the address
+    assert middleware.forwarded_client("198.51.100.1", ["203.0.113.7"]) == "198.51.100.1"
+
+
+@pytest.mark.asyncio
+async def test_register_throttles_forwarded_clients_separately():
+    # The test client connects from 127.0.0.1, standing in for the load balancer
+    proxied = ForwardedClientMiddleware(app, ["127.0.0.0/8"])
+    async with AsyncClient(transport=ASGITransport(app=proxied), base_url="http://test") as ac:
+
+        async def register(client_ip: str, attempt: int) -> int:
+            resp = await ac.post(
+                "/public/v1/register",
+                json={"device_id": "fake_device_id"},
+                # A different key hint each time, so only the IP bucket fills up
+                headers={"X-Api-Key": f"fake_api_key_{attempt:04d}", "X-Forwarded-For": client_ip},
+            )
+            return resp.status_code
+
+        with mock.patch("app.api.public.v1.registration.security") as mocked_security:
+            mocked_security.validate_bootstrap_key = AsyncMock(return_value=None)
+            statuses = [await register("203.0.113.7", attempt) for attempt in range(21)]
+            other = await register("203.0.113.8", 21)
+    # The client IP bucket allows a burst of 20 failures
+    assert statuses == [401] * 20 + [429]
+    assert other == 401
+
+
+CSR_CERTS = {
+    "certificate_pem": "signed_pem",
+    "certificate_id": "fake_id",
+    "thing_name": "fake_device_id",
+    "thing_arn": "fake_arn",
+    "region": "eu-west-1",
+}
+
+
+@mock.patch("app.api.public.v1.registration.security")
+@mock.patch("app.api.public.v1.registration.aws_iot_client")
+@pytest.mark.asyncio
+class TestCsrRegistrationEndpointApi:
+    async def register(self, client, csr: str = "fake_csr"):
+        return await client.post(
+            "/public/v1/register/csr",
+            json={"device_id": "fake_device_id", "csr": csr},
+            headers={"X-Api-Key": "fake_api_key"},
+        )
+
+    async def test_aws_signs_the_csr(self, mocked_iot_client, mocked_security, client):
+        mocked_iot_client.provision_device_from_csr = AsyncMock(return_value=CSR_CERTS)
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
+        csr = make_csr("fake_device_id")
+        resp = await self.register(client, csr)
+        assert resp.status_code == 200
+        assert resp.json() == CSR_CERTS
+        assert "private_key" not in resp.json()
+        kwargs = mocked_iot_client.provision_device_from_csr.call_args.kwargs
+        assert kwargs["csr_pem"] == csr
+        assert kwargs["certificate_pem"] is None
+
+    async def test_aws_mode_rejects_malformed_csrs(
+        self, mocked_iot_client, mocked_security, client
+    ):
+        mocked_iot_client.provision_device_from_csr = AsyncMock()
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
+        resp = await self.register(client)
+        assert resp.status_code == 400
+        mocked_iot_client.provision_device_from_csr.assert_not_called()
+
+    async def test_signing_pool_failure_is_a_503(self, mocked_iot_client, mocked_security, client):
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
+        local_ca = mock.Mock(sign=AsyncMock(side_effect=SigningUnavailableError("unavailable")))
+        app.dependency_overrides[get_settings] = lambda: Settings(CSR_SIGNING_MODE="local")
+        try:
+            with mock.patch("app.api.public.v1.registration.get_local_ca", return_value=local_ca):
+                resp = await self.register(client)
+        finally:
+            app.dependency_overrides.pop(get_settings, None)
+        assert resp.status_code == 503
+        assert resp.headers["retry-after"] == "1"
+
+    async def test_local_ca_signs_the_csr(self, mocked_iot_client, mocked_security, client):
+        mocked_iot_client.provision_device_from_csr = AsyncMock(return_value=CSR_CERTS)
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
+        local_ca = mock.Mock(ca_certificate_pem="ca_pem", sign=AsyncMock(return_value="signed_pem"))
+        app.dependency_overrides[get_settings] = lambda: Settings(CSR_SIGNING_MODE="local")
+        try:
+            with mock.patch("app.api.public.v1.registration.get_local_ca", return_value=local_ca):
+                resp = await self.register(client)
+        finally:
+            app.dependency_overrides.pop(get_settings, None)
+        assert resp.status_code == 200
+        local_ca.sign.assert_called_once_with("fake_csr", "fake_device_id")
+        kwargs = mocked_iot_client.provision_device_from_csr.call_args.kwargs
+        assert kwargs["certificate_pem"] == "signed_pem"
+        assert kwargs["ca_certificate_pem"] == "ca_pem"
+
+    async def test_invalid_csr(self, mocked_iot_client, mocked_security, client):
+        mocked_iot_client.provision_device_from_csr = AsyncMock()
+        mocked_security.validate_bootstrap_key = AsyncMock(return_value=FAKE_DB_KEY)
+        local_ca = mock.Mock(sign=AsyncMock(side_effect=InvalidCsrError("CSR is not valid PEM")))
+        app.dependency_overrides[get_settings] = lambda: Settings(CSR_SIGNING_MODE="local")
+        try:
+            with mock.patch("app.api.public.v1.registration.get_local_ca", return_value=local_ca):
+                resp = await self.register(client)
+        finally:
+            app.dependency_overrides.pop(get_settings, None)
+        assert resp.status_code == 400
+        mocked_iot_client.provision_device_from_csr.assert_not_called()
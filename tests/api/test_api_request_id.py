@@ -0,0 +1,16 @@
+import pytest
+
+
+@pytest.mark.asyncio
+class TestRequestId:
+    async def test_request_id_is_generated(self, client):
+        resp = await client.get("/ping")
+        assert len(resp.headers["x-request-id"]) == 32
+
+    async def test_caller_request_id_is_kept(self, client):
+        resp = await client.get("/ping", headers={"X-Request-ID": "lb-1234"})
+        assert resp.headers["x-request-id"] == "lb-1234"
+
+    async def test_oversized_request_id_is_replaced(self, client):
+        resp = await client.get("/ping", headers={"X-Request-ID": "x" * 200})
+        assert resp.headers["x-request-id"] != "x" * 200
@@ -0,0 +1,32 @@
+import pytest
+
+from app.core.settings import Settings, get_settings
+from app.main import app
+
+
+@pytest.mark.asyncio
+class TestRotationCampaigns:
+    async def test_create_uses_the_configured_defaults(self, client):
+        app.dependency_overrides[get_settings] = lambda: Settings(
+            ROTATION_TPS=2.5, ROTATION_GRACE_PERIOD_H=1
+        )
+        resp = await client.post(
+            "/private/v1/admin/devices/rotations", json={"group": "factory-a", "min_age_days": 30}
+        )
+        assert resp.status_code == 201
+        campaign = resp.json()
+        assert (campaign["tps"], campaign["grace_period_s"]) == (2.5, 3600)
+        assert (campaign["status"], campaign["total"]) == ("issuing", 0)
+
+        resp = await client.get(f"/private/v1/admin/devices/rotations/{campaign['id']}")
+        assert resp.status_code == 200
+        resp = await client.get("/private/v1/admin/devices/rotations")
+        assert [c["id"] for c in resp.json()] == [campaign["id"]]
+
+    async def test_rejects_a_zero_pace(self, client):
+        resp = await client.post("/private/v1/admin/devices/rotations", json={"tps": 0})
+        assert resp.status_code == 422
+
+    async def test_unknown_campaign(self, client):
+        resp = await client.get("/private/v1/admin/devices/rotations/999999")
+        assert resp.status_code == 404
@@ -1,3 +1,4 @@
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import event
@@ -7,6 +8,7 @@ from sqlalchemy.pool import NullPool
 from app.api.deps import get_db
 from app.core.crud import bootstrap_keys
 from app.core.db.database import Base
+from app.core.rate_limit import get_failure_throttle
 from app.core.schemas import schemas
 from app.core.settings import get_settings
 from app.main import app
@@ -82,6 +84,16 @@ async def override_get_db(db_session):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(autouse=True)
+def reset_failure_throttle():
+    """
+    Failed attempts must not leak between tests and throttle later ones.
+    """
+    get_failure_throttle.cache_clear()
+    yield
+    get_failure_throttle.cache_clear()
+
+
 @pytest_asyncio.fixture(scope="function")
 async def seed_bootstrap_keys_20(db_session):
     keys_data = []
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionLimiter, AdmissionRejectedError
+
+
+def make_limiter(max_concurrency=1, max_queue=1, queue_timeout=1.0) -> AdmissionLimiter:
+    return AdmissionLimiter("test", max_concurrency, max_queue, queue_timeout)
+
+
+async def hold(
+    limiter: AdmissionLimiter, release: asyncio.Event, order: list | None = None, tag=None
+):
+    async with limiter.slot():
+        if order is not None:
+            order.append(tag)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+class TestAdmissionLimiter:
+    async def test_waiters_are_admitted_in_order(self):
+        limiter = make_limiter(max_concurrency=1, max_queue=3)
+        release, order = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(limiter, release, order, i)) for i in range(3)]
+        await asyncio.sleep(0)
+        assert limiter.in_flight == 1
+        assert limiter.queue_depth == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order == [0, 1, 2]
+        assert limiter.in_flight == 0
+        assert limiter.queue_depth == 0
+
+    async def test_full_queue_is_rejected_immediately(self):
+        limiter = make_limiter(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(limiter, release)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            async with limiter.slot():
+                pass
+        assert rejected.value.reason == "queue_full"
+        assert rejected.value.retry_after >= 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    async def test_queue_timeout(self):
+        limiter = make_limiter(max_concurrency=1, max_queue=1, queue_timeout=0.01)
+        release = asyncio.Event()
+        task = asyncio.create_task(hold(limiter, release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            async with limiter.slot():
+                pass
+        assert rejected.value.reason == "queue_timeout"
+        assert limiter.queue_depth == 0
+
+        release.set()
+        await task
+        assert limiter.in_flight == 0
+
+    async def test_cancelled_waiter_frees_its_place(self):
+        limiter = make_limiter(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(limiter, release))
+        waiter = asyncio.create_task(hold(limiter, release))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.queue_depth == 0
+
+        release.set()
+        await holder
+        assert limiter.in_flight == 0
+
+    async def test_retry_after_grows_with_backlog(self):
+        limiter = make_limiter(max_concurrency=2)
+        limiter._service_time = 4.0
+        limiter.in_flight = 2
+        assert limiter.retry_after() == 4
+        limiter._waiters.append((object(), 2))
+        assert limiter.retry_after() == 8
+
+    async def test_weighted_requests_hold_their_slots(self):
+        limiter = make_limiter(max_concurrency=4, max_queue=8)
+        release, order = asyncio.Event(), []
+
+        async def hold_weighted(weight, tag):
+            async with limiter.slot(weight):
+                order.append(tag)
+                await release.wait()
+
+        batch = asyncio.create_task(hold_weighted(3, "batch"))
+        await asyncio.sleep(0)
+        singles = [asyncio.create_task(hold_weighted(1, i)) for i in range(2)]
+        second_batch = asyncio.create_task(hold_weighted(3, "second batch"))
+        late = asyncio.create_task(hold_weighted(1, "late"))
+        await asyncio.sleep(0)
+        # The second single waits: it would exceed 4 slots
+        assert (limiter.in_flight, limiter.queue_depth) == (4, 5)
+        assert order == ["batch", 0]
+
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            async with limiter.slot(4):
+                pass
+        assert rejected.value.reason == "queue_full"
+
+        release.set()
+        await asyncio.gather(batch, *singles, second_batch, late)
+        # Waiters are admitted in arrival order, a small one never overtakes
+        assert order == ["batch", 0, 1, "second batch", "late"]
+        assert (limiter.in_flight, limiter.queue_depth) == (0, 0)
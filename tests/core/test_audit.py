@@ -0,0 +1,130 @@
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.core import audit, metrics
+from app.core.audit import ADMIN, REGISTRATION, AuditWriter
+from app.core.crud.audit_log import (
+    AUDIT_TABLE,
+    copy_records,
+    drop_partitions_before,
+    ensure_partitions,
+    query_records,
+)
+from app.core.crud.partitions import add_months, list_partitions, partition_name
+
+
+def this_month() -> date:
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
+@pytest.fixture
+def writer(db_session, monkeypatch) -> AuditWriter:
+    @asynccontextmanager
+    async def session_local():
+        yield db_session
+
+    monkeypatch.setattr(audit, "SessionLocal", session_local)
+    return AuditWriter(batch_size=2, flush_interval=1, max_buffer=3, retention_months=2)
+
+
+def record(created_date: datetime, key_id: int | None = None, device_id: str | None = None):
+    return (
+        created_date,
+        REGISTRATION,
+        "register_device",
+        "provisioned",
+        key_id,
+        None,
+        device_id,
+        "10.0.0.1",
+        None,
+        None,
+    )
+
+
+def test_add_months_and_partition_names():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -13) == date(2022, 12, 1)
+    assert partition_name(AUDIT_TABLE, date(2025, 2, 1)) == "audit_log_y2025m02"
+
+
+@pytest.mark.asyncio
+class TestPartitions:
+    async def test_partitions_are_created_and_dropped_by_month(self, db_session):
+        await ensure_partitions(db_session, date(2020, 1, 1), 3)
+        assert {date(2020, 1, 1), date(2020, 2, 1), date(2020, 3, 1)} <= set(
+            await list_partitions(db_session, AUDIT_TABLE)
+        )
+
+        dropped = await drop_partitions_before(db_session, date(2020, 3, 1))
+
+        assert dropped == [date(2020, 1, 1), date(2020, 2, 1)]
+        assert date(2020, 3, 1) in await list_partitions(db_session, AUDIT_TABLE)
+
+    async def test_writer_keeps_partitions_ahead(self, writer, db_session):
+        await writer.maintain_partitions(this_month().replace(day=15))
+
+        partitions = await list_partitions(db_session, AUDIT_TABLE)
+        assert [add_months(this_month(), n) for n in range(3)] == partitions[-3:]
+
+
+@pytest.mark.asyncio
+class TestAuditWriter:
+    async def test_records_are_written_in_batches(self, writer, db_session):
+        await ensure_partitions(db_session, this_month(), 1)
+        writer.record(REGISTRATION, "register_device", "provisioned", key_id=7, device_id="s-1")
+        writer.record(REGISTRATION, "register_device", "invalid_key", key_hint="abcd")
+        writer.record(ADMIN, "GET /private/v1/admin/keys", "200", detail={"query": "group=a"})
+
+        assert await writer.flush() == 2
+        assert await writer.flush() == 1
+        assert await writer.flush() == 0
+
+        now = datetime.now(timezone.utc)
+        records = await query_records(db_session, now - timedelta(minutes=1), now)
+        assert [r.outcome for r in records] == ["200", "invalid_key", "provisioned"]
+        assert records[0].detail == {"query": "group=a"}
+        assert records[2].key_id == 7
+        assert records[2].device_id == "s-1"
+
+    async def test_full_buffer_drops_new_records(self, writer):
+        dropped = metrics.AUDIT_RECORDS_DROPPED._value.get()
+        for _ in range(5):
+            writer.record(ADMIN, "GET /private/v1/admin/keys", "200")
+
+        assert writer.pending == 3
+        assert metrics.AUDIT_RECORDS_DROPPED._value.get() == dropped + 2
+
+    async def test_failed_flush_keeps_the_records(self, writer):
+        # No partition covers year 1990: the COPY fails
+        writer._buffer.append(record(datetime(1990, 1, 1, tzinfo=timezone.utc)))
+
+        with pytest.raises(Exception):
+            await writer.flush()
+
+        assert writer.pending == 1
+
+
+@pytest.mark.asyncio
+class TestQueryRecords:
+    async def test_filters_and_pages_newest_first(self, db_session):
+        await ensure_partitions(db_session, date(2021, 1, 1), 2)
+        start = datetime(2021, 1, 31, 23, 0, tzinfo=timezone.utc)
+        await copy_records(
+            db_session,
+            [record(start + timedelta(minutes=20 * n), key_id=n % 2) for n in range(6)],
+        )
+        since, until = start, start + timedelta(days=1)
+
+        first = await query_records(db_session, since, until, key_id=1, limit=2)
+        last = first[-1]
+        rest = await query_records(
+            db_session, since, until, key_id=1, before=(last.created_date, last.id), limit=2
+        )
+
+        minutes = [int((r.created_date - start).total_seconds() // 60) for r in first + rest]
+        assert minutes == [100, 60, 20]
+        assert await query_records(db_session, since, start + timedelta(hours=1)) != []
+        assert await query_records(db_session, since, until, device_id="nope") == []
@@ -0,0 +1,505 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+from prometheus_client import REGISTRY
+from pydantic import ValidationError
+
+from app.core import aws_iot_client
+from app.core.settings import Settings
+
+
+def sample(operation: str, error: str) -> float:
+    value = REGISTRY.get_sample_value(
+        "aws_iot_call_duration_seconds_count", {"operation": operation, "error": error}
+    )
+    return value or 0
+
+
+@pytest.mark.asyncio
+class TestAwsCallInstrumentation:
+    async def test_call_records_success(self):
+        def describe_thing(thingName):  # noqa: N803 - boto3 argument name
+            return {"thingName": thingName}
+
+        before = sample("describe_thing", "none")
+        assert await aws_iot_client._call(describe_thing, thingName="t1") == {"thingName": "t1"}
+        assert sample("describe_thing", "none") == before + 1
+
+    async def test_call_labels_aws_error_code(self):
+        def create_thing(thingName):  # noqa: N803 - boto3 argument name
+            raise ClientError({"Error": {"Code": "ThrottlingException"}}, "CreateThing")
+
+        before = sample("create_thing", "ThrottlingException")
+        with pytest.raises(ClientError):
+            await aws_iot_client._call(create_thing, thingName="t1")
+        assert sample("create_thing", "ThrottlingException") == before + 1
+
+
+class FakeIotClient:
+    """Pages list_things over a fixed set of thing names."""
+
+    def __init__(self, region: str, names: list[str], page_size: int = 2, fail: bool = False):
+        self.region = region
+        self.names = names
+        self.page_size = page_size
+        self.fail = fail
+
+    def list_things(self, maxResults, nextToken=None):  # noqa: N803 - boto3 argument names
+        if self.fail:
+            raise ClientError({"Error": {"Code": "AccessDeniedException"}}, "ListThings")
+        start = int(nextToken or 0)
+        end = start + self.page_size
+        page = {
+            "things": [
+                {"thingName": name, "thingArn": f"arn:{self.region}:{name}"}
+                for name in self.names[start:end]
+            ]
+        }
+        if end < len(self.names):
+            page["nextToken"] = str(end)
+        return page
+
+
+class FakeRegistry:
+    def __init__(self, clients: dict[str, FakeIotClient]):
+        self.regions = list(clients)
+        self._clients = clients
+
+    def get(self, region=None):
+        return self._clients[region or self.regions[0]]
+
+
+@pytest.mark.asyncio
+class TestMultiRegion:
+    async def test_listing_merges_all_regions(self, monkeypatch):
+        registry = FakeRegistry(
+            {
+                "eu-west-1": FakeIotClient("eu-west-1", ["a", "b", "c"]),
+                "us-east-1": FakeIotClient("us-east-1", ["d", "e"]),
+            }
+        )
+        monkeypatch.setattr(aws_iot_client, "clients", registry)
+        devices = [device async for device in aws_iot_client.iter_provisioned_devices()]
+        assert sorted((d["region"], d["thing_name"]) for d in devices) == [
+            ("eu-west-1", "a"),
+            ("eu-west-1", "b"),
+            ("eu-west-1", "c"),
+            ("us-east-1", "d"),
+            ("us-east-1", "e"),
+        ]
+
+    async def test_listing_fails_if_a_region_fails(self, monkeypatch):
+        registry = FakeRegistry(
+            {
+                "eu-west-1": FakeIotClient("eu-west-1", ["a"]),
+                "us-east-1": FakeIotClient("us-east-1", [], fail=True),
+            }
+        )
+        monkeypatch.setattr(aws_iot_client, "clients", registry)
+        with pytest.raises(ClientError):
+            async for _ in aws_iot_client.iter_provisioned_devices():
+                pass
+
+
+def test_region_for_group(monkeypatch):
+    monkeypatch.setattr(aws_iot_client.settings, "KEY_GROUP_REGIONS", {"us-fleet": "us-east-1"})
+    assert aws_iot_client.region_for_group("us-fleet") == "us-east-1"
+    assert aws_iot_client.region_for_group("other") == aws_iot_client.settings.AWS_REGION
+    assert aws_iot_client.region_for_group(None) == aws_iot_client.settings.AWS_REGION
+
+
+def test_registry_reuses_one_client_per_region():
+    registry = aws_iot_client.IotClientRegistry("eu-west-1", ["us-east-1", "eu-west-1"], 10)
+    assert registry.regions == ["eu-west-1", "us-east-1"]
+    assert registry.get() is registry.get("eu-west-1")
+    assert registry.get("us-east-1").meta.region_name == "us-east-1"
+    with pytest.raises(aws_iot_client.UnknownRegionError):
+        registry.get("mars-north-1")
+
+
+def test_key_group_regions_must_be_configured():
+    with pytest.raises(ValidationError, match="mars-north-1"):
+        Settings(AWS_REGION="eu-west-1", KEY_GROUP_REGIONS={"fleet": "mars-north-1"})
+    settings = Settings(
+        AWS_REGION="eu-west-1", AWS_REGIONS=["us-east-1"], KEY_GROUP_REGIONS={"us": "us-east-1"}
+    )
+    assert settings.KEY_GROUP_REGIONS == {"us": "us-east-1"}
+
+
+class FakeIndexedIotClient(FakeIotClient):
+    """Answers search_index, or fails as when fleet indexing is off."""
+
+    def __init__(self, region: str, names: list[str], indexed: bool = True):
+        super().__init__(region, names, page_size=10)
+        self.indexed = indexed
+        self.queries = []
+
+    def search_index(self, indexName, queryString, maxResults, nextToken=None):  # noqa: N803
+        if not self.indexed:
+            raise ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "SearchIndex")
+        self.queries.append(queryString)
+        start = int(nextToken or 0)
+        end = start + maxResults
+        page = {
+            "things": [
+                {"thingName": name, "connectivity": {"connected": True}}
+                for name in self.names[start:end]
+            ]
+        }
+        if end < len(self.names):
+            page["nextToken"] = str(end)
+        return page
+
+
+def device_query(**overrides) -> aws_iot_client.DeviceQuery:
+    query = {"name_prefix": None, "attributes": {}, "connected": None, "thing_group": None}
+    query.update(overrides)
+    return query
+
+
+def test_build_search_query():
+    query = device_query(
+        name_prefix="sensor-", attributes={"floor": "2"}, connected=True, thing_group="lab"
+    )
+    assert aws_iot_client.build_search_query(query) == (
+        "thingName:sensor\\-* AND attributes.floor:2 AND connectivity.connected:true"
+        " AND thingGroupNames:lab"
+    )
+    assert aws_iot_client.build_search_query(device_query()) == "thingName:*"
+
+
+@pytest.mark.asyncio
+class TestQueryDevices:
+    @pytest.fixture(autouse=True)
+    def forget_index_state(self, monkeypatch):
+        monkeypatch.setattr(aws_iot_client, "_index_unavailable", {})
+
+    async def test_paginates_across_regions_with_one_token(self, monkeypatch):
+        eu = FakeIndexedIotClient("eu-west-1", ["a", "b", "c"])
+        us = FakeIndexedIotClient("us-east-1", ["d"])
+        monkeypatch.setattr(
+            aws_iot_client, "clients", FakeRegistry({"eu-west-1": eu, "us-east-1": us})
+        )
+
+        devices, token, path, _ = await aws_iot_client.query_devices(device_query(), page_size=2)
+        assert path == "search_index"
+        assert [d["thing_name"] for d in devices] == ["a", "b", "d"]
+        assert devices[0]["connected"] is True
+
+        devices, token, path, _ = await aws_iot_client.query_devices(device_query(), 2, token)
+        assert [d["thing_name"] for d in devices] == ["c"]
+        assert token is None
+
+    async def test_falls_back_to_list_things_without_indexing(self, monkeypatch):
+        eu = FakeIndexedIotClient("eu-west-1", ["sensor-1", "gateway-1", "sensor-2"])
+        us = FakeIndexedIotClient("us-east-1", ["sensor-3"], indexed=False)
+        monkeypatch.setattr(
+            aws_iot_client, "clients", FakeRegistry({"eu-west-1": eu, "us-east-1": us})
+        )
+
+        query = device_query(name_prefix="sensor-")
+        devices, _, path, _ = await aws_iot_client.query_devices(query, page_size=10)
+        assert path == "mixed"
+        assert {d["thing_name"] for d in devices if d["region"] == "us-east-1"} == {"sensor-3"}
+
+        eu.indexed = False
+        devices, _, path, _ = await aws_iot_client.query_devices(query, page_size=10)
+        assert path == "list_things"
+        assert sorted(d["thing_name"] for d in devices) == ["sensor-1", "sensor-2", "sensor-3"]
+
+    async def test_connectivity_needs_indexing(self, monkeypatch):
+        eu = FakeIndexedIotClient("eu-west-1", ["a"], indexed=False)
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": eu}))
+        with pytest.raises(aws_iot_client.InvalidDeviceQueryError):
+            await aws_iot_client.query_devices(device_query(connected=True), page_size=10)
+
+    async def test_rejects_forged_tokens(self, monkeypatch):
+        eu = FakeIndexedIotClient("eu-west-1", ["a"])
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": eu}))
+        with pytest.raises(aws_iot_client.InvalidDeviceQueryError):
+            await aws_iot_client.query_devices(device_query(), 10, "not-a-token")
+
+    @pytest.mark.parametrize(
+        "state",
+        [
+            {"eu-west-1": 5},
+            {"eu-west-1": {"token": "2"}},
+            {"eu-west-1": {"path": "scan", "token": "2"}},
+            {"eu-west-1": {"path": "list_things", "token": 2}},
+        ],
+    )
+    async def test_rejects_malformed_cursors(self, monkeypatch, state):
+        eu = FakeIndexedIotClient("eu-west-1", ["a"])
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": eu}))
+        token = aws_iot_client._encode_page_token(device_query(), state)
+        with pytest.raises(aws_iot_client.InvalidDeviceQueryError):
+            await aws_iot_client.query_devices(device_query(), 10, token)
+
+    async def test_lost_index_ends_the_region_instead_of_restarting(self, monkeypatch):
+        eu = FakeIndexedIotClient("eu-west-1", ["a", "b", "c"])
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": eu}))
+        devices, token, _, truncated = await aws_iot_client.query_devices(
+            device_query(), page_size=2
+        )
+        assert [d["thing_name"] for d in devices] == ["a", "b"]
+        assert truncated == []
+
+        eu.indexed = False
+        devices, token, path, truncated = await aws_iot_client.query_devices(
+            device_query(), 2, token
+        )
+        assert devices == []
+        assert token is None
+        assert truncated == ["eu-west-1"]
+
+    async def test_tokens_only_continue_their_filters(self, monkeypatch):
+        eu = FakeIndexedIotClient("eu-west-1", ["sensor-1", "sensor-2", "sensor-3"])
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": eu}))
+        query = device_query(name_prefix="sensor-")
+        _, token, _, _ = await aws_iot_client.query_devices(query, page_size=2)
+        with pytest.raises(aws_iot_client.InvalidDeviceQueryError, match="other filters"):
+            await aws_iot_client.query_devices(device_query(name_prefix="gw-"), 2, token)
+        devices, _, _, _ = await aws_iot_client.query_devices(query, 2, token)
+        assert [d["thing_name"] for d in devices] == ["sensor-3"]
+
+
+class FakeProvisioningClient:
+    """Records the provisioning calls made against it."""
+
+    class exceptions:  # noqa: N801 - mirrors the boto3 client attribute
+        class ResourceAlreadyExistsException(Exception):  # noqa: N818 - boto3 name
+            pass
+
+    class meta:  # noqa: N801
+        region_name = "eu-west-1"
+
+    def __init__(self, template_error: str | None = None):
+        self.calls = []
+        self.template_error = template_error
+
+    def create_keys_and_certificate(self, setAsActive):  # noqa: N803
+        self.calls.append("create_keys_and_certificate")
+        return {
+            "certificateId": "cert-1",
+            "certificateArn": "arn:cert/cert-1",
+            "certificatePem": "pem",
+            "keyPair": {"PrivateKey": "key"},
+        }
+
+    def create_thing(self, thingName):  # noqa: N803
+        self.calls.append("create_thing")
+        return {"thingName": thingName, "thingArn": f"arn:thing/{thingName}"}
+
+    def attach_thing_principal(self, thingName, principal):  # noqa: N803
+        self.calls.append("attach_thing_principal")
+
+    def attach_policy(self, policyName, target):  # noqa: N803
+        self.calls.append("attach_policy")
+
+    def register_thing(self, templateBody, parameters):  # noqa: N803
+        self.calls.append("register_thing")
+        if self.template_error:
+            raise ClientError({"Error": {"Code": self.template_error}}, "RegisterThing")
+        assert parameters == {
+            "ThingName": "sensor-1",
+            "CertificateId": "cert-1",
+            "PolicyName": "policy",
+        }
+        return {"resourceArns": {"thing": "arn:thing/sensor-1"}}
+
+
+@pytest.mark.asyncio
+class TestProvisioningModes:
+    async def provision(self, monkeypatch, mode: str, fake: FakeProvisioningClient) -> dict:
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": fake}))
+        monkeypatch.setattr(aws_iot_client.settings, "IOT_PROVISIONING_MODE", mode)
+        return await aws_iot_client.provision_device("sensor-1", "policy")
+
+    async def test_steps_mode(self, monkeypatch):
+        fake = FakeProvisioningClient()
+        result = await self.provision(monkeypatch, "steps", fake)
+        assert fake.calls == [
+            "create_keys_and_certificate",
+            "create_thing",
+            "attach_thing_principal",
+            "attach_policy",
+        ]
+        assert result["thing_arn"] == "arn:thing/sensor-1"
+
+    async def test_template_mode_is_one_call_after_the_certificate(self, monkeypatch):
+        fake = FakeProvisioningClient()
+        result = await self.provision(monkeypatch, "template", fake)
+        assert fake.calls == ["create_keys_and_certificate", "register_thing"]
+        assert result["thing_name"] == "sensor-1"
+        assert result["thing_arn"] == "arn:thing/sensor-1"
+        assert result["private_key"] == "key"
+
+    async def test_template_failure_falls_back_to_steps(self, monkeypatch):
+        fake = FakeProvisioningClient(template_error="InvalidRequestException")
+        result = await self.provision(monkeypatch, "template", fake)
+        assert fake.calls == [
+            "create_keys_and_certificate",
+            "register_thing",
+            "create_thing",
+            "attach_thing_principal",
+            "attach_policy",
+        ]
+        assert result["certificate_id"] == "cert-1"
+
+    async def test_template_throttling_is_not_retried_step_by_step(self, monkeypatch):
+        fake = FakeProvisioningClient(template_error="ThrottlingException")
+        with pytest.raises(ClientError):
+            await self.provision(monkeypatch, "template", fake)
+        assert fake.calls == ["create_keys_and_certificate", "register_thing"]
+
+
+def test_provisioning_modes_are_validated():
+    with pytest.raises(ValidationError):
+        Settings(IOT_PROVISIONING_MODE="Template")
+    with pytest.raises(ValidationError):
+        Settings(CSR_SIGNING_MODE="locale")
+
+
+class FakeRevocationClient:
+    class meta:  # noqa: N801
+        region_name = "eu-west-1"
+
+    def __init__(self):
+        self.calls = []
+
+    def describe_certificate(self, certificateId):  # noqa: N803
+        return {"certificateDescription": {"certificateArn": f"arn:cert/{certificateId}"}}
+
+    def update_certificate(self, certificateId, newStatus):  # noqa: N803
+        self.calls.append(("update_certificate", certificateId, newStatus))
+
+    def list_principal_things(self, principal):
+        return {"things": ["sensor-1"]}
+
+    def detach_thing_principal(self, thingName, principal):  # noqa: N803
+        self.calls.append(("detach_thing_principal", thingName, principal))
+
+
+@pytest.mark.asyncio
+async def test_revoke_detaches_the_certificate_from_its_things(monkeypatch):
+    fake = FakeRevocationClient()
+    monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": fake}))
+    await aws_iot_client.revoke_device_certificate("cert-1")
+    assert fake.calls == [
+        ("update_certificate", "cert-1", "REVOKED"),
+        ("detach_thing_principal", "sensor-1", "arn:cert/cert-1"),
+    ]
+
+
+class FakeCertificateClient(FakeRevocationClient):
+    def list_certificates(self, pageSize, ascendingOrder, marker=None):  # noqa: N803
+        if marker is None:
+            return {
+                "certificates": [
+                    {
+                        "certificateId": "cert-1",
+                        "certificateArn": "arn:cert/cert-1",
+                        "status": "ACTIVE",
+                        "creationDate": "2024-01-01",
+                    }
+                ],
+                "nextMarker": "page-2",
+            }
+        return {"certificates": []}
+
+    def detach_policy(self, policyName, target):  # noqa: N803
+        self.calls.append(("detach_policy", policyName, target))
+
+    def delete_certificate(self, certificateId):  # noqa: N803
+        self.calls.append(("delete_certificate", certificateId))
+
+
+@pytest.mark.asyncio
+async def test_certificates_are_listed_page_by_page(monkeypatch):
+    fake = FakeCertificateClient()
+    monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": fake}))
+    pages = [page async for page in aws_iot_client.iter_certificate_pages("eu-west-1")]
+    assert [len(page) for page in pages] == [1, 0]
+    assert pages[0][0]["certificate_arn"] == "arn:cert/cert-1"
+
+
+@pytest.mark.asyncio
+async def test_delete_detaches_and_deactivates_the_certificate_first(monkeypatch):
+    fake = FakeCertificateClient()
+    monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": fake}))
+    certificate = {"certificate_id": "cert-1", "certificate_arn": "arn:cert/cert-1"}
+    await aws_iot_client.delete_certificate(
+        {**certificate, "status": "ACTIVE"}, {"things": ["sensor-1"], "policies": ["policy"]}
+    )
+    assert fake.calls == [
+        ("detach_thing_principal", "sensor-1", "arn:cert/cert-1"),
+        ("detach_policy", "policy", "arn:cert/cert-1"),
+        ("update_certificate", "cert-1", "INACTIVE"),
+        ("delete_certificate", "cert-1"),
+    ]
+
+
+class FakeRotationClient(FakeProvisioningClient, FakeCertificateClient):
+    def __init__(self, attach_error: str | None = None, executions: dict | None = None):
+        super().__init__()
+        self.attach_error = attach_error
+        self.executions = executions or {}
+
+    def attach_policy(self, policyName, target):  # noqa: N803
+        if self.attach_error:
+            raise ClientError({"Error": {"Code": self.attach_error}}, "AttachPolicy")
+        super().attach_policy(policyName, target)
+
+    def list_attached_policies(self, target, pageSize):  # noqa: N803
+        return {"policies": [{"policyName": "policy"}]}
+
+    def create_job(self, jobId, targets, document):  # noqa: N803
+        self.calls.append("create_job")
+        self.job = {"jobId": jobId, "targets": targets, "document": json.loads(document)}
+
+    def describe_job_execution(self, jobId, thingName):  # noqa: N803
+        if jobId not in self.executions:
+            raise ClientError(
+                {"Error": {"Code": "ResourceNotFoundException"}}, "DescribeJobExecution"
+            )
+        return {"execution": {"status": self.executions[jobId]}}
+
+    def delete_job(self, jobId, force):  # noqa: N803
+        self.calls.append(("delete_job", jobId))
+
+
+@pytest.mark.asyncio
+class TestRotation:
+    @pytest.fixture(autouse=True)
+    def steps_mode(self, monkeypatch):
+        monkeypatch.setattr(aws_iot_client.settings, "IOT_PROVISIONING_MODE", "steps")
+
+    async def test_the_new_certificate_is_delivered_through_a_job(self, monkeypatch):
+        fake = FakeRotationClient()
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": fake}))
+        certificate = await aws_iot_client.issue_replacement_certificate("sensor-1", "policy")
+        assert (certificate["certificate_id"], certificate["region"]) == ("cert-1", "eu-west-1")
+        assert "create_job" not in fake.calls
+
+        await aws_iot_client.deliver_replacement_certificate(certificate)
+        assert fake.job["jobId"] == "rotate-cert-1"
+        assert fake.job["targets"] == ["arn:thing/sensor-1"]
+        assert fake.job["document"]["privateKey"] == "key"
+
+    async def test_a_certificate_that_cannot_be_bound_is_deleted(self, monkeypatch):
+        fake = FakeRotationClient(attach_error="ThrottlingException")
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": fake}))
+        with pytest.raises(ClientError):
+            await aws_iot_client.issue_replacement_certificate("sensor-1", "policy")
+        assert fake.calls[-3:] == [
+            ("detach_policy", "policy", "arn:cert/cert-1"),
+            ("update_certificate", "cert-1", "INACTIVE"),
+            ("delete_certificate", "cert-1"),
+        ]
+
+    async def test_job_status(self, monkeypatch):
+        fake = FakeRotationClient(executions={"rotate-cert-1": "SUCCEEDED"})
+        monkeypatch.setattr(aws_iot_client, "clients", FakeRegistry({"eu-west-1": fake}))
+        assert await aws_iot_client.rotation_job_status("cert-1", "sensor-1") == "SUCCEEDED"
+        assert await aws_iot_client.rotation_job_status("cert-2", "sensor-2") == "REMOVED"
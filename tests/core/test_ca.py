@@ -0,0 +1,97 @@
+import datetime
+import os
+import signal
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+from app.core.ca import InvalidCsrError, LocalCertificateAuthority, SigningUnavailableError
+
+
+def make_ca() -> tuple[bytes, bytes]:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Test Device CA")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return cert.public_bytes(serialization.Encoding.PEM), key_pem
+
+
+def make_csr(common_name: str, key=None) -> str:
+    key = key or ec.generate_private_key(ec.SECP256R1())
+    csr = (
+        x509.CertificateSigningRequestBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)]))
+        .sign(key, hashes.SHA256())
+    )
+    return csr.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture(scope="module")
+def local_ca():
+    ca_cert_pem, ca_key_pem = make_ca()
+    authority = LocalCertificateAuthority(ca_cert_pem, ca_key_pem, None, 30, workers=1)
+    yield authority
+    authority.shutdown()
+
+
+@pytest.mark.asyncio
+class TestLocalCertificateAuthority:
+    async def test_signs_device_certificate(self, local_ca):
+        certificate_pem = await local_ca.sign(make_csr("sensor-1"), "sensor-1")
+        certificate = x509.load_pem_x509_certificate(certificate_pem.encode())
+        ca_certificate = x509.load_pem_x509_certificate(local_ca.ca_certificate_pem.encode())
+
+        assert certificate.issuer == ca_certificate.subject
+        assert certificate.subject.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value == (
+            "sensor-1"
+        )
+        usage = certificate.extensions.get_extension_for_class(x509.ExtendedKeyUsage).value
+        assert list(usage) == [ExtendedKeyUsageOID.CLIENT_AUTH]
+        certificate.verify_directly_issued_by(ca_certificate)
+
+    @pytest.mark.parametrize(
+        "csr,message",
+        [
+            ("not a csr", "not valid PEM"),
+            (make_csr("someone-else"), "common name"),
+            (make_csr("sensor-1", rsa.generate_private_key(65537, 1024)), "at least 2048"),
+        ],
+    )
+    async def test_rejects_bad_csrs(self, local_ca, csr, message):
+        with pytest.raises(InvalidCsrError, match=message):
+            await local_ca.sign(csr, "sensor-1")
+
+    async def test_a_dead_worker_is_replaced(self, local_ca):
+        await local_ca.start()
+        for pid in list(local_ca._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        with pytest.raises(SigningUnavailableError):
+            await local_ca.sign(make_csr("sensor-1"), "sensor-1")
+        assert await local_ca.sign(make_csr("sensor-1"), "sensor-1")
+
+
+def test_a_bad_ca_fails_before_any_worker_starts():
+    ca_cert_pem, ca_key_pem = make_ca()
+    with pytest.raises(ValueError, match="Cannot load"):
+        LocalCertificateAuthority(ca_cert_pem, ca_key_pem, b"wrong password", 30, workers=1)
+    _, other_key_pem = make_ca()
+    with pytest.raises(ValueError, match="does not match"):
+        LocalCertificateAuthority(ca_cert_pem, other_key_pem, None, 30, workers=1)
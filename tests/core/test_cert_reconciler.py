@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.core import aws_iot_client, cert_reconciler
+from app.core.cert_reconciler import RECONCILER_LOCK, reconcile_certificates, run_reconcile_job
+from app.core.crud.reconcile_jobs import create_reconcile_job
+from app.core.db import models
+from app.core.settings import Settings
+
+SETTINGS = Settings(
+    CERT_RECONCILER_GRACE_H=24, CERT_RECONCILER_TPS=1000, IOT_POLICY_NAME="device-policy"
+)
+NOW = datetime.now(timezone.utc)
+OLD = NOW - timedelta(days=30)
+
+
+def certificate(certificate_id: str, status: str = "ACTIVE", created_date=OLD) -> dict:
+    return {
+        "certificate_id": certificate_id,
+        "certificate_arn": f"arn:cert/{certificate_id}",
+        "status": status,
+        "created_date": created_date,
+        "region": "eu-west-1",
+    }
+
+
+class FakeIot:
+    """Stands in for the certificate calls of aws_iot_client."""
+
+    def __init__(
+        self,
+        pages: list[list[dict]],
+        things: dict[str, list[str]],
+        fail: set = (),
+        policies: dict[str, list[str]] | None = None,
+    ):
+        self.pages = pages
+        self.things = things
+        self.policies = policies or {}
+        self.fail = fail
+        self.pages_read = 0
+        self.inspected: list[str] = []
+        self.deleted: list[str] = []
+
+    async def iter_certificate_pages(self, region):
+        for page in self.pages:
+            self.pages_read += 1
+            yield page
+
+    async def certificate_attachments(self, certificate_arn, region=None):
+        certificate_id = certificate_arn.removeprefix("arn:cert/")
+        self.inspected.append(certificate_id)
+        return {
+            "things": self.things.get(certificate_id, []),
+            "policies": self.policies.get(certificate_id, ["device-policy"]),
+        }
+
+    async def delete_certificate(self, certificate, attachments, region=None):
+        if certificate["certificate_id"] in self.fail:
+            raise RuntimeError("throttled")
+        self.deleted.append(certificate["certificate_id"])
+
+
+@pytest.fixture
+def fake_iot(monkeypatch):
+    def install(*args, **kwargs) -> FakeIot:
+        fake = FakeIot(*args, **kwargs)
+        monkeypatch.setattr(aws_iot_client.clients, "regions", ["eu-west-1"])
+        for name in ("iter_certificate_pages", "certificate_attachments", "delete_certificate"):
+            monkeypatch.setattr(aws_iot_client, name, getattr(fake, name))
+        return fake
+
+    return install
+
+
+@pytest.mark.asyncio
+class TestCertificateReconciler:
+    async def test_dry_run_reports_orphaned_and_revoked_certificates(self, db_session, fake_iot):
+        db_session.add(
+            models.DeviceRegistration(
+                device_id="sensor-1",
+                certificate_id="registered",
+                region="eu-west-1",
+                key_id=1,
+                key_group="factory-a",
+            )
+        )
+        await db_session.commit()
+        fake = fake_iot(
+            [
+                [
+                    certificate("orphan"),
+                    certificate("revoked", status="REVOKED"),
+                    certificate("rotated-out", status="INACTIVE"),
+                    certificate("registered"),
+                    certificate("foreign-in-use"),
+                ]
+            ],
+            things={"foreign-in-use": ["other-thing"]},
+        )
+
+        report = await reconcile_certificates(db_session, SETTINGS, dry_run=True)
+
+        assert (report.scanned, report.unattached, report.revoked, report.deleted) == (5, 1, 1, 0)
+        assert {(c.certificate_id, c.action) for c in report.certificates} == {
+            ("orphan", "would_delete"),
+            ("revoked", "would_delete"),
+        }
+        # Registered certificates need no API call; INACTIVE ones are kept for rollback
+        assert sorted(fake.inspected) == ["foreign-in-use", "orphan", "revoked"]
+        assert fake.deleted == []
+
+    async def test_apply_deletes_and_reports_failures(self, db_session, fake_iot):
+        fake = fake_iot(
+            [[certificate("orphan-1"), certificate("orphan-2"), certificate("orphan-3")]],
+            things={},
+            fail={"orphan-2"},
+        )
+
+        report = await reconcile_certificates(db_session, SETTINGS, dry_run=False)
+
+        assert sorted(fake.deleted) == ["orphan-1", "orphan-3"]
+        assert (report.deleted, report.failed) == (2, 1)
+        (failed,) = [c for c in report.certificates if c.action == "failed"]
+        assert failed.certificate_id == "orphan-2"
+        assert failed.error == "throttled"
+
+    async def test_certificates_of_other_workloads_are_kept(self, db_session, fake_iot):
+        fake = fake_iot(
+            [[certificate("orphan"), certificate("unused"), certificate("backend")]],
+            things={},
+            policies={"unused": [], "backend": ["backend-policy", "device-policy"]},
+        )
+
+        report = await reconcile_certificates(db_session, SETTINGS, dry_run=False)
+
+        assert sorted(fake.deleted) == ["orphan", "unused"]
+        assert report.unattached == 2
+
+    async def test_certificates_within_the_grace_period_end_the_scan(self, db_session, fake_iot):
+        fake = fake_iot(
+            [
+                [certificate("orphan"), certificate("provisioning", created_date=NOW)],
+                [certificate("later", created_date=NOW)],
+            ],
+            things={},
+        )
+
+        report = await reconcile_certificates(db_session, SETTINGS, dry_run=False)
+
+        assert fake.deleted == ["orphan"]
+        assert fake.pages_read == 1
+        assert report.scanned == 2
+
+    async def test_revoked_certificates_get_the_grace_period_from_their_revocation(
+        self, db_session, fake_iot
+    ):
+        db_session.add_all(
+            models.DeviceRegistration(
+                device_id=f"sensor-{certificate_id}",
+                certificate_id=certificate_id,
+                region="eu-west-1",
+                key_id=1,
+                key_group="factory-a",
+                revoked_date=revoked_date,
+            )
+            for certificate_id, revoked_date in [
+                ("revoked-today", NOW - timedelta(hours=1)),
+                ("revoked-long-ago", OLD),
+            ]
+        )
+        await db_session.commit()
+        fake = fake_iot(
+            [
+                [
+                    certificate("revoked-today", status="REVOKED"),
+                    certificate("revoked-long-ago", status="REVOKED"),
+                    certificate("revoked-elsewhere", status="REVOKED"),
+                ]
+            ],
+            things={},
+        )
+
+        report = await reconcile_certificates(db_session, SETTINGS, dry_run=False)
+
+        assert sorted(fake.deleted) == ["revoked-elsewhere", "revoked-long-ago"]
+        assert report.revoked == 2
+
+
+@pytest.mark.asyncio
+class TestReconcileJob:
+    async def test_records_progress_and_report(
+        self, db_session, test_engine, fake_iot, monkeypatch
+    ):
+        monkeypatch.setattr(cert_reconciler, "engine", test_engine)
+        fake_iot([[certificate("orphan-1")], [certificate("orphan-2")]], things={})
+        job = await create_reconcile_job(db_session, dry_run=True)
+
+        job = await run_reconcile_job(db_session, job.id, SETTINGS)
+
+        assert (job.status, job.scanned, job.unattached, job.deleted) == ("completed", 2, 2, 0)
+        assert [c["certificate_id"] for c in job.certificates] == ["orphan-1", "orphan-2"]
+
+    async def test_skipped_while_another_pass_holds_the_lock(
+        self, db_session, test_engine, fake_iot, monkeypatch
+    ):
+        monkeypatch.setattr(cert_reconciler, "engine", test_engine)
+        fake = fake_iot([[certificate("orphan")]], things={})
+        job = await create_reconcile_job(db_session, dry_run=False)
+        lock = {"name": RECONCILER_LOCK}
+        async with test_engine.connect() as other_worker:
+            await other_worker.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), lock)
+            job = await run_reconcile_job(db_session, job.id, SETTINGS)
+            await other_worker.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), lock)
+
+        assert job.status == "skipped"
+        assert fake.pages_read == 0
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.health import DegradedError, HealthProber, database_check
+from tests.conftest import TEST_DATABASE_URL
+
+
+async def healthy():
+    pass
+
+
+async def slow():
+    await asyncio.sleep(0.05)
+
+
+async def saturated():
+    raise DegradedError("pool saturated")
+
+
+async def failing():
+    raise ConnectionError("unreachable")
+
+
+async def hanging():
+    await asyncio.sleep(10)
+
+
+def make_prober(checks, ttl=60.0) -> HealthProber:
+    return HealthProber(checks, interval=1.0, ttl=ttl, timeout=0.1, degraded_latency=0.02)
+
+
+@pytest.mark.asyncio
+class TestHealthProber:
+    async def test_unknown_until_first_probe(self):
+        prober = make_prober({"database": healthy})
+        snapshot = prober.snapshot()
+        assert snapshot["status"] == "down"
+        assert snapshot["checks"]["database"]["status"] == "unknown"
+
+    async def test_all_healthy(self):
+        prober = make_prober({"database": healthy, "aws_iot": healthy})
+        await prober.run_once()
+        assert prober.snapshot()["status"] == "ok"
+
+    @pytest.mark.parametrize("check", [slow, saturated])
+    async def test_degraded_is_not_a_failure(self, check):
+        prober = make_prober({"database": healthy, "aws_iot": check})
+        await prober.run_once()
+        snapshot = prober.snapshot()
+        assert snapshot["status"] == "degraded"
+        assert snapshot["checks"]["aws_iot"]["status"] == "degraded"
+
+    @pytest.mark.parametrize("check", [failing, hanging])
+    async def test_errors_and_timeouts_are_down(self, check):
+        prober = make_prober({"database": healthy, "aws_iot": check})
+        await prober.run_once()
+        snapshot = prober.snapshot()
+        assert snapshot["status"] == "down"
+        assert snapshot["checks"]["aws_iot"]["status"] == "down"
+
+    async def test_stale_results_are_unknown(self):
+        prober = make_prober({"database": healthy}, ttl=0.0)
+        await prober.run_once()
+        await asyncio.sleep(0.01)
+        assert prober.snapshot()["checks"]["database"]["status"] == "unknown"
+
+    async def test_background_probing(self):
+        prober = make_prober({"database": healthy})
+        prober.start()
+        await asyncio.sleep(0.01)
+        await prober.stop()
+        assert prober.snapshot()["status"] == "ok"
+
+    async def test_database_check(self, test_engine):
+        await database_check(test_engine, max_overflow=10)()
+
+    async def test_database_check_counts_overflow_as_capacity(self, test_engine):
+        engine = create_async_engine(TEST_DATABASE_URL, pool_size=1, max_overflow=1)
+        check = database_check(engine, max_overflow=1)
+        try:
+            async with engine.connect():
+                await check()
+                async with engine.connect():
+                    with pytest.raises(DegradedError):
+                        await check()
+        finally:
+            await engine.dispose()
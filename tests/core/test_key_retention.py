@@ -0,0 +1,117 @@
+import gzip
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import select, text
+
+from app.core import key_retention
+from app.core.crud.key_partitions import KEYS_TABLE, default_partition_months
+from app.core.crud.partitions import list_partitions
+from app.core.db import models
+from app.core.key_retention import KEY_RETENTION_LOCK, KeyRetentionJob, run_key_retention
+from app.core.settings import Settings
+
+NOW = datetime(2031, 6, 15, tzinfo=timezone.utc)
+
+
+def settings(archive_dir: str = "", enabled: bool = True) -> Settings:
+    return Settings(
+        KEY_PARTITIONS_AHEAD_MONTHS=2,
+        KEY_RETENTION_DAYS=30,
+        KEY_RETENTION_ENABLED=enabled,
+        KEY_ARCHIVE_DIR=archive_dir,
+    )
+
+
+async def add_keys(db_session, *expiration_dates: datetime) -> list[int]:
+    keys = [
+        models.BootstrapKey(
+            key_hash=f"hash-{n}", key_hint=f"h{n:03d}", key_group="lot", expiration_date=expires
+        )
+        for n, expires in enumerate(expiration_dates)
+    ]
+    db_session.add_all(keys)
+    await db_session.flush()
+    return [key.id for key in keys]
+
+
+@pytest.mark.asyncio
+class TestKeyRetention:
+    async def test_partitions_are_created_ahead(self, db_session):
+        created, dropped = await run_key_retention(db_session, settings(), NOW)
+
+        assert created == [date(2031, 6, 1), date(2031, 7, 1), date(2031, 8, 1)]
+        assert dropped == []
+
+    async def test_waiting_keys_get_a_partition_up_to_the_horizon(self, db_session):
+        await add_keys(
+            db_session,
+            datetime(2031, 6, 20, tzinfo=timezone.utc),
+            datetime(2035, 1, 1, tzinfo=timezone.utc),
+        )
+
+        await run_key_retention(db_session, settings(), NOW)
+
+        assert await default_partition_months(db_session) == [date(2035, 1, 1)]
+
+    async def test_expired_partitions_are_archived_and_dropped(self, db_session, tmp_path):
+        expired_id, recent_id, live_id = await add_keys(
+            db_session,
+            datetime(2031, 4, 10, tzinfo=timezone.utc),
+            datetime(2031, 5, 20, tzinfo=timezone.utc),
+            datetime(2031, 7, 1, tzinfo=timezone.utc),
+        )
+
+        _, dropped = await run_key_retention(db_session, settings(str(tmp_path)), NOW)
+
+        # May ended less than KEY_RETENTION_DAYS ago: kept
+        assert dropped == [date(2031, 4, 1)]
+        assert date(2031, 5, 1) in await list_partitions(db_session, KEYS_TABLE)
+        remaining = set((await db_session.scalars(select(models.BootstrapKey.id))).all())
+        assert expired_id not in remaining
+        assert {recent_id, live_id} <= remaining
+
+        with gzip.open(tmp_path / "bootstrap_keys_y2031m04.ndjson.gz", "rt") as archive:
+            (record,) = [json.loads(line) for line in archive]
+        assert record["id"] == expired_id
+        assert record["expiration_date"].startswith("2031-04-10")
+        assert "key_hash" not in record
+
+    async def test_expired_partitions_are_kept_while_retention_is_disabled(self, db_session):
+        await add_keys(db_session, datetime(2031, 4, 10, tzinfo=timezone.utc))
+
+        _, dropped = await run_key_retention(db_session, settings(enabled=False), NOW)
+
+        assert dropped == []
+        assert date(2031, 4, 1) in await list_partitions(db_session, KEYS_TABLE)
+
+
+def test_retention_needs_an_explicit_archive_location():
+    with pytest.raises(ValidationError):
+        Settings(KEY_RETENTION_ENABLED=True)
+    with pytest.raises(ValidationError):
+        Settings(KEY_RETENTION_ENABLED=True, KEY_ARCHIVE_DIR="key_archive")
+    assert Settings(KEY_RETENTION_ENABLED=True, KEY_ARCHIVE_DIR="").KEY_ARCHIVE_DIR == ""
+
+
+@pytest.mark.asyncio
+async def test_only_one_worker_runs_a_pass(test_engine, monkeypatch):
+    passes = []
+
+    async def record_pass(db, settings):
+        passes.append(settings)
+        return [], []
+
+    monkeypatch.setattr(key_retention, "engine", test_engine)
+    monkeypatch.setattr(key_retention, "run_key_retention", record_pass)
+    job = KeyRetentionJob(Settings())
+    lock = {"name": KEY_RETENTION_LOCK}
+    async with test_engine.connect() as other_worker:
+        await other_worker.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), lock)
+        await job.run_once()
+        assert passes == []
+        await other_worker.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), lock)
+    await job.run_once()
+    assert len(passes) == 1
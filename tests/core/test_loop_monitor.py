@@ -0,0 +1,44 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+from app.core.loop_monitor import LoopLagMonitor
+from app.core.metrics import EVENT_LOOP_LAG
+
+
+def blocking_call():
+    time.sleep(0.2)
+
+
+def lag_count() -> float:
+    samples = EVENT_LOOP_LAG.collect()[0].samples
+    return next(s.value for s in samples if s.name == "event_loop_lag_seconds_count")
+
+
+@pytest.mark.asyncio
+async def test_blocking_call_is_logged_with_its_stack(caplog):
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    before = lag_count()
+    with caplog.at_level(logging.WARNING, logger="app.core.loop_monitor"):
+        await asyncio.sleep(0.05)
+        blocking_call()
+        await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    blocked = [r.getMessage() for r in caplog.records if "Event loop blocked" in r.getMessage()]
+    assert len(blocked) == 1
+    assert "test_loop_monitor:blocking_call" in blocked[0]
+    assert lag_count() > before
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_is_not_reported(caplog):
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    with caplog.at_level(logging.WARNING, logger="app.core.loop_monitor"):
+        await asyncio.sleep(0.1)
+    await monitor.stop()
+    assert not [r for r in caplog.records if "Event loop blocked" in r.getMessage()]
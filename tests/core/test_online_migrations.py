@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import text
+
+from app.core.db.online_migrations import (
+    backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+
+@pytest_asyncio.fixture
+async def migrate(test_engine):
+    """Runs a function as a migration operation, outside the test transaction."""
+    async with test_engine.connect() as connection:
+
+        def run_in_context(sync_connection, operation):
+            with Operations.context(MigrationContext.configure(sync_connection)):
+                return operation()
+
+        async def migrate(operation):
+            return await connection.run_sync(run_in_context, operation)
+
+        await connection.exec_driver_sql(
+            "CREATE TABLE migration_scratch (id integer PRIMARY KEY, value integer, copy integer)"
+        )
+        await connection.exec_driver_sql(
+            "INSERT INTO migration_scratch SELECT n, n * 2, NULL FROM generate_series(1, 25) n"
+        )
+        await connection.commit()
+        try:
+            yield migrate, connection
+        finally:
+            await connection.rollback()
+            await connection.exec_driver_sql("DROP TABLE IF EXISTS migration_scratch")
+            await connection.exec_driver_sql(
+                "DROP INDEX IF EXISTS ix_test_bootstrap_keys_group_hint"
+            )
+            await connection.commit()
+
+
+async def index_validity(connection, name: str) -> bool | None:
+    result = await connection.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    )
+    await connection.commit()
+    return result.scalar()
+
+
+@pytest.mark.asyncio
+class TestOnlineMigrations:
+    async def test_backfill_updates_every_row_in_batches(self, migrate):
+        run, connection = migrate
+
+        updated = await run(
+            lambda: backfill(
+                "migration_scratch", "copy = value", "copy IS NULL", batch_size=10, pause=0
+            )
+        )
+
+        assert updated == 25
+        result = await connection.execute(
+            text("SELECT count(*) FROM migration_scratch WHERE copy = value")
+        )
+        assert result.scalar() == 25
+        await connection.commit()
+        # Re-running only touches rows still to backfill
+        assert await run(lambda: backfill("migration_scratch", "copy = value", "copy IS NULL")) == 0
+
+    async def test_index_is_built_concurrently_and_idempotent(self, migrate):
+        run, connection = migrate
+
+        await run(
+            lambda: create_index_concurrently("ix_scratch_value", "migration_scratch", ["value"])
+        )
+        await run(
+            lambda: create_index_concurrently("ix_scratch_value", "migration_scratch", ["value"])
+        )
+        assert await index_validity(connection, "ix_scratch_value") is True
+
+        await run(lambda: drop_index_concurrently("ix_scratch_value"))
+        assert await index_validity(connection, "ix_scratch_value") is None
+
+    async def test_concurrent_build_outlasts_the_lock_timeout(self, migrate, test_engine):
+        run, connection = migrate
+        await connection.exec_driver_sql("SET lock_timeout = 100")
+        await connection.commit()
+
+        async with test_engine.connect() as writer:
+            # CREATE INDEX CONCURRENTLY waits for this transaction to end
+            await writer.exec_driver_sql("UPDATE migration_scratch SET copy = 0 WHERE id = 1")
+
+            async def commit_later():
+                await asyncio.sleep(0.5)
+                await writer.commit()
+
+            committing = asyncio.ensure_future(commit_later())
+            await run(
+                lambda: create_index_concurrently(
+                    "ix_scratch_value", "migration_scratch", ["value"]
+                )
+            )
+            await committing
+
+        assert await index_validity(connection, "ix_scratch_value") is True
+        # Ordinary DDL keeps failing fast
+        assert (await connection.exec_driver_sql("SHOW lock_timeout")).scalar() == "100ms"
+
+    async def test_invalid_index_is_rebuilt(self, migrate):
+        run, connection = migrate
+        await connection.exec_driver_sql(
+            "CREATE INDEX ix_scratch_value ON migration_scratch (value)"
+        )
+        await connection.exec_driver_sql(
+            "UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'ix_scratch_value'::regclass"
+        )
+        await connection.commit()
+
+        await run(
+            lambda: create_index_concurrently("ix_scratch_value", "migration_scratch", ["value"])
+        )
+
+        assert await index_validity(connection, "ix_scratch_value") is True
+
+    async def test_partitioned_table_is_indexed_partition_by_partition(self, migrate):
+        run, connection = migrate
+
+        await run(
+            lambda: create_index_concurrently(
+                "ix_test_bootstrap_keys_group_hint",
+                "bootstrap_keys",
+                ["key_group", "key_hint"],
+                where="is_active",
+            )
+        )
+
+        assert await index_validity(connection, "ix_test_bootstrap_keys_group_hint") is True
+        assert (
+            await index_validity(
+                connection, "bootstrap_keys_default_ix_test_bootstrap_keys_group_hint"
+            )
+            is True
+        )
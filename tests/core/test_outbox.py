@@ -0,0 +1,188 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.core import metrics
+from app.core.crud import outbox as outbox_crud
+from app.core.crud.bootstrap_keys import create_key, update_key_status
+from app.core.crud.device_registrations import record_registrations
+from app.core.crud.key_import import import_keys
+from app.core.db import models
+from app.core.outbox import FileSink, OutboxDispatcher, OutboxSink, build_sink
+from app.core.schemas import schemas
+from app.core.security import get_password_hash
+from app.core.settings import Settings
+
+SETTINGS = Settings(
+    OUTBOX_SINKS=["file"], OUTBOX_BATCH_SIZE=10, OUTBOX_RETRY_BASE_S=60, OUTBOX_MAX_ATTEMPTS=2
+)
+
+
+class RecordingSink(OutboxSink):
+    def __init__(self) -> None:
+        self.events = []
+
+    async def send(self, events: list[dict]) -> None:
+        self.events += events
+
+
+class FailingSink(OutboxSink):
+    async def send(self, events: list[dict]) -> None:
+        raise ConnectionError("consumer down")
+
+
+@pytest.fixture
+def outbox_enabled(monkeypatch):
+    monkeypatch.setattr(outbox_crud.settings, "OUTBOX_SINKS", ["file"])
+
+
+async def outbox_events(db_session) -> list[models.OutboxEvent]:
+    result = await db_session.scalars(select(models.OutboxEvent).order_by(models.OutboxEvent.id))
+    return list(result.all())
+
+
+@pytest.mark.asyncio
+class TestEventEmission:
+    async def test_nothing_is_recorded_without_sinks(self, db_session, monkeypatch):
+        monkeypatch.setattr(outbox_crud.settings, "OUTBOX_SINKS", [])
+        await create_key(db_session, schemas.BootstrapKeyCreateRequest(group="factory-a"))
+        assert await outbox_events(db_session) == []
+
+    async def test_key_changes_are_recorded_with_the_change(self, db_session, outbox_enabled):
+        db_key, _ = await create_key(
+            db_session, schemas.BootstrapKeyCreateRequest(group="factory-a")
+        )
+        await update_key_status(
+            db_key.id, schemas.BootstrapKeyUpdateRequest(activation_flag=False), db_session
+        )
+        events = await outbox_events(db_session)
+        assert [e.event_type for e in events] == ["key.created", "key.status_changed"]
+        assert events[0].payload["key_id"] == db_key.id
+        assert events[1].payload == {"key_id": db_key.id, "group": "factory-a", "is_active": False}
+
+    async def test_registrations_are_recorded(self, db_session, outbox_enabled):
+        db_key = models.BootstrapKey(id=1, key_hint="abcd", key_group="factory-a")
+        await record_registrations(db_session, db_key, [("sensor-1", "cert-1", "eu-west-1")])
+        (event,) = await outbox_events(db_session)
+        assert event.event_type == "device.provisioned"
+        assert event.payload["device_id"] == "sensor-1"
+        assert event.payload["key_id"] == 1
+
+    async def test_imports_are_summarized_by_group(self, db_session, outbox_enabled):
+        expires = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+        records = [
+            {"key_hash": get_password_hash(f"key-{i}-{hint}"), "key_hint": hint, **extra}
+            for i, (hint, extra) in enumerate(
+                [("aaaa", {"group": "factory-a"}), ("bbbb", {"group": "factory-a"}), ("cccc", {})]
+            )
+        ]
+
+        async def lines():
+            for record in records:
+                yield json.dumps({**record, "expiration_date": expires})
+
+        await import_keys(db_session, lines(), "ndjson")
+        (event,) = await outbox_events(db_session)
+        ids = await db_session.execute(
+            select(models.BootstrapKey.key_group, models.BootstrapKey.id).order_by(
+                models.BootstrapKey.id
+            )
+        )
+        ids = ids.all()
+        assert event.event_type == "keys.imported"
+        assert event.payload == {
+            "imported": 3,
+            "groups": [
+                {"group": None, "imported": 1, "first_key_id": ids[2].id, "last_key_id": ids[2].id},
+                {
+                    "group": "factory-a",
+                    "imported": 2,
+                    "first_key_id": ids[0].id,
+                    "last_key_id": ids[1].id,
+                },
+            ],
+        }
+
+
+@pytest.mark.asyncio
+class TestOutboxDispatcher:
+    async def seed(self, db_session, count: int) -> None:
+        await outbox_crud.emit_events(
+            db_session, [("device.provisioned", {"n": i}) for i in range(count)]
+        )
+        await db_session.commit()
+
+    async def test_delivers_batches_in_order(self, db_session, outbox_enabled):
+        await self.seed(db_session, 3)
+        sink = RecordingSink()
+        dispatcher = OutboxDispatcher([sink], SETTINGS)
+        assert await dispatcher.dispatch_batch(db_session) == 3
+        assert [event["payload"]["n"] for event in sink.events] == [0, 1, 2]
+        assert all(e.delivered_date is not None for e in await outbox_events(db_session))
+        assert await dispatcher.dispatch_batch(db_session) == 0
+
+    async def test_failed_batches_back_off(self, db_session, outbox_enabled):
+        await self.seed(db_session, 2)
+        dispatcher = OutboxDispatcher([FailingSink()], SETTINGS)
+        assert await dispatcher.dispatch_batch(db_session) == 2
+        events = await outbox_events(db_session)
+        assert [(e.attempts, e.delivered_date) for e in events] == [(1, None), (1, None)]
+        assert events[0].last_error == "ConnectionError: consumer down"
+        assert events[0].next_attempt_date > events[0].created_date
+        # Not due again before the backoff delay
+        assert await dispatcher.dispatch_batch(db_session) == 0
+
+    async def test_events_are_dead_lettered_after_the_last_attempt(
+        self, db_session, outbox_enabled
+    ):
+        await self.seed(db_session, 2)
+        dispatcher = OutboxDispatcher([FailingSink()], SETTINGS)
+        dead_lettered = metrics.OUTBOX_DEAD_LETTERED._value.get()
+        await dispatcher.dispatch_batch(db_session)
+        assert await outbox_crud.count_dead_letters(db_session) == 0
+
+        for event in await outbox_events(db_session):
+            event.next_attempt_date = event.created_date
+        await db_session.commit()
+        assert await dispatcher.dispatch_batch(db_session) == 2
+        assert await outbox_crud.count_dead_letters(db_session) == 2
+        assert metrics.OUTBOX_DEAD_LETTERED._value.get() == dead_lettered + 2
+        # Never claimed again, however long ago they were due
+        for event in await outbox_events(db_session):
+            event.next_attempt_date = event.created_date
+        await db_session.commit()
+        assert await dispatcher.dispatch_batch(db_session) == 0
+
+        first, second = await outbox_crud.get_dead_letters(db_session, 10)
+        assert await outbox_crud.requeue_dead_letters(db_session, [first.id]) == 1
+        await db_session.commit()
+        sink = RecordingSink()
+        assert await OutboxDispatcher([sink], SETTINGS).dispatch_batch(db_session) == 1
+        assert [event["id"] for event in sink.events] == [first.id]
+        assert [e.id for e in await outbox_crud.get_dead_letters(db_session, 10)] == [second.id]
+
+
+@pytest.mark.asyncio
+async def test_file_sink_writes_json_lines(tmp_path):
+    sink = FileSink(str(tmp_path / "events.jsonl"))
+    await sink.send([{"id": 1, "type": "key.deleted"}, {"id": 2, "type": "key.created"}])
+    await sink.close()
+    lines = (tmp_path / "events.jsonl").read_text().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_queue_sink_drops_events_when_full():
+    dispatcher = OutboxDispatcher([build_sink("queue", Settings(OUTBOX_QUEUE_MAXSIZE=2))], SETTINGS)
+    dropped = metrics.OUTBOX_QUEUE_DROPPED._value.get()
+    await dispatcher.sinks[0].send([{"id": 1}, {"id": 2}, {"id": 3}])
+    assert metrics.OUTBOX_QUEUE_DROPPED._value.get() == dropped + 1
+    assert [dispatcher.queue.get_nowait()["id"] for _ in range(2)] == [1, 2]
+    assert OutboxDispatcher([RecordingSink()], SETTINGS).queue is None
+
+
+def test_unknown_sink_is_rejected():
+    with pytest.raises(ValueError):
+        build_sink("carrier-pigeon", SETTINGS)
@@ -0,0 +1,67 @@
+import pytest
+
+from app.core.crud import auth_failures
+from app.core.rate_limit import FailureThrottle, SharedFailureThrottle, TokenBucketMap
+from app.core.settings import Settings
+
+SETTINGS = Settings(
+    AUTH_THROTTLE_IP_RATE=0.5,
+    AUTH_THROTTLE_IP_BURST=3,
+    AUTH_THROTTLE_HINT_RATE=0.25,
+    AUTH_THROTTLE_HINT_BURST=2,
+)
+
+
+def test_bucket_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.rate_limit.time.monotonic", lambda: now[0])
+    buckets = TokenBucketMap(rate=1.0, burst=2, ttl=60, max_entries=10)
+    buckets.consume("a")
+    buckets.consume("a")
+    buckets.consume("a")
+    assert buckets.tokens("a") == 0
+    now[0] += 1.5
+    assert buckets.tokens("a") == 1.5
+    assert buckets.tokens("unknown") == 2
+
+
+def test_buckets_expire_and_stay_bounded(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.rate_limit.time.monotonic", lambda: now[0])
+    buckets = TokenBucketMap(rate=0.001, burst=1, ttl=60, max_entries=3)
+    for key in "abcd":
+        buckets.consume(key)
+    # Least recently used bucket evicted
+    assert len(buckets) == 3
+    assert buckets.tokens("a") == 1
+    now[0] += 61
+    buckets.tokens("b")
+    assert len(buckets) == 0
+
+
+def test_bucket_keys():
+    assert FailureThrottle.bucket_keys("10.0.0.1", "secret-abcd") == {
+        "ip": "10.0.0.1",
+        "hint": "abcd",
+    }
+    assert FailureThrottle.bucket_keys(None, "ab") == {}
+
+
+@pytest.mark.asyncio
+class TestFailureThrottle:
+    @pytest.mark.parametrize("throttle_class", [FailureThrottle, SharedFailureThrottle])
+    async def test_hint_throttled_after_burst(self, db_session, throttle_class):
+        throttle = throttle_class(SETTINGS)
+        keys = throttle.bucket_keys("10.0.0.1", "wrong-key-abcd")
+        assert await throttle.retry_after(db_session, keys) is None
+        await throttle.record_failure(db_session, keys)
+        await throttle.record_failure(db_session, keys)
+        # The hint bucket (burst 2) is empty, the IP one (burst 3) is not
+        assert await throttle.retry_after(db_session, keys) == 4
+        other_hint = throttle.bucket_keys("10.0.0.1", "wrong-key-wxyz")
+        assert await throttle.retry_after(db_session, other_hint) is None
+
+    async def test_shared_buckets_expire(self, db_session):
+        throttle = SharedFailureThrottle(SETTINGS)
+        await throttle.record_failure(db_session, {"ip": "10.0.0.2"})
+        assert await auth_failures.delete_expired(db_session, ttl_seconds=0) == 1
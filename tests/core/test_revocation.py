@@ -0,0 +1,75 @@
+from unittest import mock
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.crud.device_registrations import create_revocation_job, record_registrations
+from app.core.db import models
+from app.core.revocation import RevocationJobBusyError, run_revocation_job
+from app.core.settings import Settings
+
+SETTINGS = Settings(REVOCATION_CONCURRENCY=2, REVOCATION_BATCH_SIZE=3)
+
+
+async def seed_registrations(db_session) -> None:
+    leaked = models.BootstrapKey(id=1, key_hint="leak", key_group="factory-a")
+    other = models.BootstrapKey(id=2, key_hint="safe", key_group="factory-a")
+    await record_registrations(
+        db_session,
+        leaked,
+        [(f"sensor-{i}", f"cert-{i}", "eu-west-1") for i in range(7)],
+    )
+    await record_registrations(db_session, other, [("sensor-x", "cert-x", "us-east-1")])
+    await db_session.commit()
+
+
+@pytest.mark.asyncio
+class TestRevocationJob:
+    async def test_revokes_every_certificate_of_the_key(self, db_session):
+        await seed_registrations(db_session)
+        job = await create_revocation_job(db_session, key_id=1, key_group=None)
+        with mock.patch("app.core.revocation.aws_iot_client") as mocked_iot_client:
+            mocked_iot_client.revoke_device_certificate = AsyncMock()
+            job = await run_revocation_job(db_session, job.id, SETTINGS)
+        assert (job.status, job.total, job.revoked, job.failed) == ("completed", 7, 7, 0)
+        revoked = {
+            c.kwargs["certificate_id"]
+            for c in mocked_iot_client.revoke_device_certificate.call_args_list
+        }
+        assert revoked == {f"cert-{i}" for i in range(7)}
+
+    async def test_group_covers_all_its_keys(self, db_session):
+        await seed_registrations(db_session)
+        job = await create_revocation_job(db_session, key_id=None, key_group="factory-a")
+        with mock.patch("app.core.revocation.aws_iot_client") as mocked_iot_client:
+            mocked_iot_client.revoke_device_certificate = AsyncMock()
+            job = await run_revocation_job(db_session, job.id, SETTINGS)
+        assert (job.total, job.revoked) == (8, 8)
+        mocked_iot_client.revoke_device_certificate.assert_any_call(
+            certificate_id="cert-x", region="us-east-1"
+        )
+
+    async def test_resume_retries_only_what_failed(self, db_session):
+        await seed_registrations(db_session)
+        job = await create_revocation_job(db_session, key_id=1, key_group=None)
+
+        async def flaky(certificate_id, region):
+            if certificate_id in ("cert-2", "cert-5"):
+                raise Exception("throttled")
+
+        with mock.patch("app.core.revocation.aws_iot_client") as mocked_iot_client:
+            mocked_iot_client.revoke_device_certificate = AsyncMock(side_effect=flaky)
+            job = await run_revocation_job(db_session, job.id, SETTINGS)
+            assert (job.status, job.revoked, job.failed) == ("incomplete", 5, 2)
+
+            mocked_iot_client.revoke_device_certificate = AsyncMock()
+            job = await run_revocation_job(db_session, job.id, SETTINGS)
+        assert (job.status, job.total, job.revoked, job.failed) == ("completed", 7, 7, 0)
+        assert mocked_iot_client.revoke_device_certificate.call_count == 2
+
+    async def test_running_job_cannot_be_claimed_twice(self, db_session):
+        job = await create_revocation_job(db_session, key_id=1, key_group=None)
+        job.status = "running"
+        await db_session.commit()
+        with pytest.raises(RevocationJobBusyError):
+            await run_revocation_job(db_session, job.id, SETTINGS)
@@ -0,0 +1,276 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import select
+
+from app.core.crud.rotation_campaigns import claim_campaign, create_campaign, record_pending
+from app.core.db import models
+from app.core.rotation import Pacer, RotationScheduler, run_campaign_step
+from app.core.settings import Settings
+
+SETTINGS = Settings(ROTATION_BATCH_SIZE=2, ROTATION_MAX_ATTEMPTS=2)
+LONG_AGO = datetime.now(timezone.utc) - timedelta(days=400)
+
+
+async def seed_registrations(db_session) -> None:
+    for i in range(3):
+        db_session.add(
+            models.DeviceRegistration(
+                device_id=f"sensor-{i}",
+                certificate_id=f"old-{i}",
+                region="eu-west-1",
+                key_id=1,
+                key_group="factory-a",
+                registered_date=LONG_AGO,
+            )
+        )
+    # Too recent, and another group
+    db_session.add(
+        models.DeviceRegistration(
+            device_id="fresh",
+            certificate_id="old-fresh",
+            region="eu-west-1",
+            key_id=1,
+            key_group="factory-a",
+        )
+    )
+    db_session.add(
+        models.DeviceRegistration(
+            device_id="other",
+            certificate_id="old-other",
+            region="eu-west-1",
+            key_id=2,
+            key_group="factory-b",
+            registered_date=LONG_AGO,
+        )
+    )
+    await db_session.commit()
+
+
+async def fake_issue(device_id, policy_name, region):
+    return {"certificate_id": f"new-{device_id}", "region": region}
+
+
+def fake_iot_client(mocked_iot_client, job_status="SUCCEEDED", **operations) -> None:
+    mocked_iot_client.issue_replacement_certificate = AsyncMock(side_effect=fake_issue)
+    mocked_iot_client.deliver_replacement_certificate = AsyncMock()
+    mocked_iot_client.discard_replacement_certificate = AsyncMock()
+    mocked_iot_client.rotation_job_exists = AsyncMock(return_value=False)
+    mocked_iot_client.rotation_job_status = AsyncMock(return_value=job_status)
+    mocked_iot_client.delete_rotation_job = AsyncMock()
+    mocked_iot_client.deactivate_certificate = AsyncMock()
+    for name, operation in operations.items():
+        setattr(mocked_iot_client, name, operation)
+
+
+@pytest.mark.asyncio
+async def test_pacer_spaces_out_concurrent_callers():
+    pacer = Pacer(rate=100)
+    start = asyncio.get_running_loop().time()
+    await asyncio.gather(*(pacer.wait() for _ in range(5)))
+    assert asyncio.get_running_loop().time() - start >= 0.04
+
+
+@pytest.mark.asyncio
+class TestRotationCampaign:
+    async def test_rotates_then_deactivates_after_the_grace_period(self, db_session):
+        await seed_registrations(db_session)
+        campaign = await create_campaign(
+            db_session, "factory-a", min_age_days=30, tps=1000, grace_period_s=3600
+        )
+        assert campaign.total == 3
+
+        with mock.patch("app.core.rotation.aws_iot_client") as mocked_iot_client:
+            fake_iot_client(mocked_iot_client)
+            campaign = await run_campaign_step(db_session, campaign.id, SETTINGS)
+            assert (campaign.status, campaign.rotated, campaign.deactivated) == ("grace", 3, 0)
+            assert mocked_iot_client.deliver_replacement_certificate.call_count == 3
+            mocked_iot_client.deactivate_certificate.assert_not_called()
+
+            # New certificates keep the key provenance
+            new = await db_session.scalars(
+                select(models.DeviceRegistration)
+                .where(models.DeviceRegistration.certificate_id.like("new-%"))
+                .order_by(models.DeviceRegistration.device_id)
+            )
+            assert [(r.device_id, r.key_id) for r in new] == [
+                ("sensor-0", 1),
+                ("sensor-1", 1),
+                ("sensor-2", 1),
+            ]
+
+            campaign.grace_period_s = 0
+            await db_session.commit()
+            campaign = await run_campaign_step(db_session, campaign.id, SETTINGS)
+        assert (campaign.status, campaign.deactivated, campaign.lease_expires) == (
+            "completed",
+            3,
+            None,
+        )
+        deactivated = {
+            c.kwargs["certificate_id"]
+            for c in mocked_iot_client.deactivate_certificate.call_args_list
+        }
+        assert deactivated == {"old-0", "old-1", "old-2"}
+        # The jobs holding the new private keys are gone
+        deleted = {
+            c.kwargs["certificate_id"] for c in mocked_iot_client.delete_rotation_job.call_args_list
+        }
+        assert deleted == {"new-sensor-0", "new-sensor-1", "new-sensor-2"}
+
+    async def test_failed_devices_are_retried_then_given_up(self, db_session):
+        await seed_registrations(db_session)
+        campaign = await create_campaign(
+            db_session, "factory-a", min_age_days=30, tps=1000, grace_period_s=0
+        )
+
+        async def flaky(device_id, policy_name, region):
+            if device_id == "sensor-1":
+                raise Exception("ThrottlingException")
+            return await fake_issue(device_id, policy_name, region)
+
+        with mock.patch("app.core.rotation.aws_iot_client") as mocked_iot_client:
+            fake_iot_client(
+                mocked_iot_client, issue_replacement_certificate=AsyncMock(side_effect=flaky)
+            )
+            campaign = await run_campaign_step(db_session, campaign.id, SETTINGS)
+            assert (campaign.status, campaign.rotated, campaign.failed) == ("issuing", 2, 0)
+
+            campaign = await run_campaign_step(db_session, campaign.id, SETTINGS)
+        assert (campaign.status, campaign.rotated, campaign.failed) == ("completed", 2, 1)
+        assert mocked_iot_client.issue_replacement_certificate.call_count == 4
+
+    async def test_a_failed_delivery_discards_the_new_certificate(self, db_session):
+        await seed_registrations(db_session)
+        campaign = await create_campaign(
+            db_session, "factory-a", min_age_days=30, tps=1000, grace_period_s=3600
+        )
+
+        async def throttled(certificate):
+            if certificate["certificate_id"] == "new-sensor-1":
+                raise Exception("ThrottlingException")
+
+        with mock.patch("app.core.rotation.aws_iot_client") as mocked_iot_client:
+            fake_iot_client(
+                mocked_iot_client, deliver_replacement_certificate=AsyncMock(side_effect=throttled)
+            )
+            campaign = await run_campaign_step(db_session, campaign.id, SETTINGS)
+        assert (campaign.status, campaign.rotated) == ("issuing", 2)
+        mocked_iot_client.discard_replacement_certificate.assert_awaited_once_with(
+            "new-sensor-1", "eu-west-1"
+        )
+        rotation = await db_session.scalar(
+            select(models.CertificateRotation).where(
+                models.CertificateRotation.device_id == "sensor-1"
+            )
+        )
+        assert (rotation.status, rotation.attempts) == ("failed", 1)
+        assert not await db_session.scalar(
+            select(models.DeviceRegistration).where(
+                models.DeviceRegistration.certificate_id == "new-sensor-1"
+            )
+        )
+
+    @pytest.mark.parametrize("job_created", [True, False])
+    async def test_an_interrupted_rotation_is_settled(self, db_session, job_created):
+        await seed_registrations(db_session)
+        campaign = await create_campaign(
+            db_session, "factory-a", min_age_days=30, tps=1000, grace_period_s=3600
+        )
+        registration = await db_session.scalar(
+            select(models.DeviceRegistration).where(
+                models.DeviceRegistration.device_id == "sensor-0"
+            )
+        )
+        # A worker crashed after checkpointing the certificate
+        await record_pending(db_session, campaign.id, registration, "crashed-0")
+        await db_session.commit()
+
+        with mock.patch("app.core.rotation.aws_iot_client") as mocked_iot_client:
+            fake_iot_client(
+                mocked_iot_client, rotation_job_exists=AsyncMock(return_value=job_created)
+            )
+            campaign = await run_campaign_step(db_session, campaign.id, SETTINGS)
+        assert (campaign.status, campaign.rotated) == ("grace", 3)
+        certificates = await db_session.scalars(
+            select(models.DeviceRegistration.certificate_id).where(
+                models.DeviceRegistration.device_id == "sensor-0",
+                models.DeviceRegistration.replaced_date.is_(None),
+            )
+        )
+        if job_created:
+            assert list(certificates) == ["crashed-0"]
+            mocked_iot_client.discard_replacement_certificate.assert_not_called()
+        else:
+            assert list(certificates) == ["new-sensor-0"]
+            mocked_iot_client.discard_replacement_certificate.assert_awaited_once_with(
+                certificate_id="crashed-0", region="eu-west-1"
+            )
+
+    async def test_old_certificates_are_only_deactivated_once_the_device_switched(self, db_session):
+        await seed_registrations(db_session)
+        campaign = await create_campaign(
+            db_session, "factory-a", min_age_days=30, tps=1000, grace_period_s=0
+        )
+        job_statuses = {
+            "new-sensor-0": "SUCCEEDED",
+            "new-sensor-1": "IN_PROGRESS",
+            "new-sensor-2": "FAILED",
+        }
+
+        async def job_status(certificate_id, thing_name, region):
+            return job_statuses[certificate_id]
+
+        with mock.patch("app.core.rotation.aws_iot_client") as mocked_iot_client:
+            fake_iot_client(
+                mocked_iot_client, rotation_job_status=AsyncMock(side_effect=job_status)
+            )
+            campaign = await run_campaign_step(db_session, campaign.id, SETTINGS)
+            assert (campaign.status, campaign.deactivated, campaign.stalled) == ("grace", 1, 1)
+            mocked_iot_client.deactivate_certificate.assert_awaited_once_with(
+                certificate_id="old-0", region="eu-west-1"
+            )
+
+            job_statuses["new-sensor-1"] = "SUCCEEDED"
+            campaign = await run_campaign_step(db_session, campaign.id, SETTINGS)
+        assert (campaign.status, campaign.deactivated, campaign.stalled) == ("completed", 2, 1)
+        stalled = await db_session.scalar(
+            select(models.CertificateRotation).where(models.CertificateRotation.status == "stalled")
+        )
+        assert (stalled.old_certificate_id, stalled.error) == ("old-2", "Rotation job FAILED")
+        mocked_iot_client.discard_replacement_certificate.assert_awaited_once_with(
+            certificate_id="new-sensor-2", region="eu-west-1"
+        )
+        # The device still uses its old certificate: a later campaign rotates that one
+        registrations = await db_session.execute(
+            select(
+                models.DeviceRegistration.certificate_id, models.DeviceRegistration.replaced_date
+            ).where(models.DeviceRegistration.device_id == "sensor-2")
+        )
+        assert registrations.all() == [("old-2", None)]
+
+    async def test_a_held_campaign_is_not_claimed_twice(self, db_session):
+        campaign = await create_campaign(db_session, None, min_age_days=0, tps=1, grace_period_s=0)
+        assert await claim_campaign(db_session, campaign.id, 300) is not None
+        assert await claim_campaign(db_session, campaign.id, 300) is None
+        assert await run_campaign_step(db_session, campaign.id, SETTINGS) is None
+
+
+@pytest.mark.asyncio
+async def test_the_scheduler_survives_a_failed_pass(monkeypatch):
+    passes = []
+
+    async def failing_pass():
+        passes.append(None)
+        raise ConnectionError("database unavailable")
+
+    scheduler = RotationScheduler(Settings(ROTATION_POLL_INTERVAL_S=0))
+    monkeypatch.setattr(scheduler, "run_once", failing_pass)
+    scheduler.start()
+    await asyncio.sleep(0.05)
+    assert not scheduler._task.done()
+    await scheduler.stop()
+    assert len(passes) > 1
@@ -0,0 +1,84 @@
+import io
+import json
+import logging
+
+import pytest
+
+from app.core.settings import Settings
+from app.core.structured_logging import (
+    ContextFilter,
+    JsonFormatter,
+    RateLimitFilter,
+    configure_logging,
+    device_id_var,
+    request_id_var,
+)
+
+
+def make_record(name="app.test", msg="hello %s", args=("world",), lineno=1) -> logging.LogRecord:
+    return logging.LogRecord(name, logging.INFO, "test.py", lineno, msg, args, None)
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    saved = {
+        name: (logging.getLogger(name).handlers[:], logging.getLogger(name).propagate)
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access")
+    }
+    handlers, level = root.handlers[:], root.level
+    yield
+    root.handlers, root.level = handlers, level
+    for name, (logger_handlers, propagate) in saved.items():
+        logging.getLogger(name).handlers = logger_handlers
+        logging.getLogger(name).propagate = propagate
+
+
+def test_json_formatter_includes_context_ids():
+    request_token = request_id_var.set("req-1")
+    device_token = device_id_var.set("sensor-1")
+    try:
+        record = make_record()
+        ContextFilter().filter(record)
+    finally:
+        request_id_var.reset(request_token)
+        device_id_var.reset(device_token)
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "hello world"
+    assert entry["request_id"] == "req-1"
+    assert entry["device_id"] == "sensor-1"
+    assert "trace_id" not in entry
+
+
+def test_rate_limit_filter_drops_and_counts_per_call_site():
+    rate_filter = RateLimitFilter({"app": 0.001})
+    assert rate_filter.filter(make_record(lineno=1))
+    assert not rate_filter.filter(make_record(lineno=1))
+    assert not rate_filter.filter(make_record(lineno=1))
+    # Other call sites and loggers have their own budget
+    assert rate_filter.filter(make_record(lineno=2))
+    assert rate_filter.filter(make_record(name="other", lineno=1))
+
+    rate_filter._buckets[("app.test", "test.py", 1)][0] = 1.0
+    record = make_record(lineno=1)
+    assert rate_filter.filter(record)
+    assert record.suppressed == 2
+
+
+def test_configure_logging_writes_json_through_the_queue(restore_logging):
+    stream = io.StringIO()
+    listener = configure_logging(Settings(LOG_FORMAT="json", LOG_RATE_LIMITS={}), stream=stream)
+    try:
+        logging.getLogger("app.test").info("provisioned %s", "sensor-1")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("uvicorn.error").exception("failed")
+    finally:
+        listener.stop()
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert entries[0]["message"] == "provisioned sensor-1"
+    assert entries[1]["logger"] == "uvicorn.error"
+    assert "ValueError: boom" in entries[1]["exception"]
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.api.middleware import TracingMiddleware
+from app.core.settings import Settings
+from app.core.tracing import JsonLinesSpanExporter, build_exporter, instrument_engine, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture(scope="module")
+def exporter():
+    # The global provider can only be installed once per process
+    span_exporter = InMemorySpanExporter()
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider()
+        trace.set_tracer_provider(provider)
+    provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    return span_exporter
+
+
+@pytest.mark.asyncio
+class TestRequestTracing:
+    async def test_incoming_trace_context_is_continued(self, exporter, client):
+        exporter.clear()
+        resp = await client.get(
+            "/private/v1/admin/keys",
+            headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+        )
+        assert resp.status_code == 200
+
+        spans = exporter.get_finished_spans()
+        server = next(s for s in spans if s.name == "GET /private/v1/admin/keys")
+        assert f"{server.context.trace_id:032x}" == TRACE_ID
+        assert f"{server.parent.span_id:016x}" == PARENT_ID
+        assert server.attributes["http.response.status_code"] == 200
+
+    async def test_db_spans_are_children_of_request(self, exporter, client, test_engine):
+        # The suite runs on its own engine, instrument it like the application one
+        instrument_engine(test_engine.sync_engine)
+        exporter.clear()
+        await client.get("/private/v1/admin/keys")
+
+        spans = exporter.get_finished_spans()
+        server = next(s for s in spans if s.name == "GET /private/v1/admin/keys")
+        queries = [s for s in spans if s.name == "db.query"]
+        assert queries
+        assert all(q.context.trace_id == server.context.trace_id for q in queries)
+
+
+@pytest.mark.asyncio
+async def test_tracing_middleware_continues_trace_context(exporter):
+    async def plain_app(scope, receive, send):
+        with tracer.start_as_current_span("handler"):
+            await send({"type": "http.response.start", "status": 503, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+    exporter.clear()
+    transport = ASGITransport(app=TracingMiddleware(plain_app))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.get("/x", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    handler, server = exporter.get_finished_spans()
+    assert server.name == "GET unmatched"
+    assert f"{server.parent.span_id:016x}" == PARENT_ID
+    assert handler.parent.span_id == server.context.span_id
+    assert server.status.status_code.name == "ERROR"
+
+
+def test_json_lines_exporter(tmp_path, exporter):
+    path = tmp_path / "traces.jsonl"
+    file_exporter = JsonLinesSpanExporter(str(path))
+    exporter.clear()
+    with tracer.start_as_current_span("outer"):
+        with tracer.start_as_current_span("inner"):
+            pass
+    file_exporter.export(exporter.get_finished_spans())
+    file_exporter.shutdown()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["inner", "outer"]
+    assert records[0]["parent_span_id"] == records[1]["span_id"]
+
+
+def test_build_exporter():
+    assert build_exporter(Settings(TRACING_EXPORTER="none")) is None
+    assert isinstance(build_exporter(Settings(TRACING_EXPORTER="stdout")), JsonLinesSpanExporter)
+    custom = build_exporter(
+        Settings(
+            TRACING_EXPORTER="opentelemetry.sdk.trace.export.in_memory_span_exporter"
+            ":InMemorySpanExporter"
+        )
+    )
+    assert isinstance(custom, InMemorySpanExporter)
+    with pytest.raises(ValueError):
+        build_exporter(Settings(TRACING_EXPORTER="bogus"))
@@ -0,0 +1,123 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.core.crud.key_group_stats import get_stats
+from app.core.crud.key_import import KeyImportFormatError, import_keys, iter_lines
+from app.core.db import models
+from app.core.security import get_password_hash
+
+EXPIRES = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+
+
+async def as_lines(text: str):
+    for line in text.split("\n"):
+        yield line
+
+
+async def as_chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+class TestKeyImport:
+    async def test_import_csv_reports_rejections(self, db_session):
+        hash_a, hash_b = get_password_hash("key-a-aaaa"), get_password_hash("key-b-bbbb")
+        csv_text = "\n".join(
+            [
+                "key_hash,key_hint,group,expiration_date,is_active",
+                f"{hash_a},aaaa,import-group,{EXPIRES},true",
+                f"{hash_b},bbbb,import-group,{EXPIRES},false",
+                f"not-a-hash,cccc,import-group,{EXPIRES},true",
+                f"{hash_a},aaaa,import-group,{EXPIRES},true",
+                f"{hash_b},bbbb,import-group,not-a-date,true",
+                "too,few",
+            ]
+        )
+        report = await import_keys(db_session, as_lines(csv_text), "csv")
+
+        assert report.total_rows == 6
+        assert report.imported == 2
+        assert report.rejected == 4
+        assert [r.line for r in report.rejections] == [4, 5, 6, 7]
+        assert "unsupported hash format" in report.rejections[0].reason
+        assert report.rejections[1].reason == "key_hash: duplicated in file"
+        assert report.rejections[2].reason.startswith("expiration_date")
+
+        stats = {row["group"]: row for row in await get_stats(db_session)}
+        assert stats["import-group"]["active"] == 1
+        assert stats["import-group"]["inactive"] == 1
+
+    async def test_import_ndjson_rejects_existing(self, db_session):
+        record = {
+            "key_hash": get_password_hash("key-d-dddd"),
+            "key_hint": "dddd",
+            "expiration_date": EXPIRES,
+        }
+        first = await import_keys(db_session, as_lines(json.dumps(record)), "ndjson")
+        second = await import_keys(db_session, as_lines(json.dumps(record) + "\n{oops"), "ndjson")
+
+        assert first.imported == 1
+        assert second.imported == 0
+        assert [r.reason for r in second.rejections] == [
+            "key_hash: already exists",
+            "Invalid JSON: Expecting property name enclosed in double quotes",
+        ]
+        count = await db_session.scalar(
+            select(func.count()).where(models.BootstrapKey.key_hint == "dddd")
+        )
+        assert count == 1
+
+    async def test_import_csv_quoted_fields_span_lines(self, db_session):
+        hash_f, hash_g = get_password_hash("key-f-ffff"), get_password_hash("key-g-gggg")
+        csv_text = "\n".join(
+            [
+                "key_hash,key_hint,group,expiration_date",
+                f'{hash_f},ffff,"multi',
+                f'line ""group""",{EXPIRES}',
+                "",
+                f"{hash_g},gggg,plain-group,{EXPIRES}",
+                f'{hash_g},gggg,"never closed,{EXPIRES}',
+            ]
+        )
+        report = await import_keys(db_session, as_lines(csv_text), "csv")
+
+        assert (report.total_rows, report.imported, report.rejected) == (3, 2, 1)
+        assert [(r.line, r.reason) for r in report.rejections] == [(6, "Unterminated quoted field")]
+        stats = {row["group"]: row for row in await get_stats(db_session)}
+        assert stats['multi\nline "group"']["active"] == 1
+
+    async def test_import_csv_requires_header_columns(self, db_session):
+        with pytest.raises(KeyImportFormatError):
+            await import_keys(db_session, as_lines("key_hint,group\nabcd,x"), "csv")
+
+    async def test_iter_lines_across_chunks(self):
+        chunks = as_chunks(b"first\r\nsec", "ond-é".encode()[:-1], "é".encode()[-1:], b"\nlast")
+        assert [line async for line in iter_lines(chunks)] == ["first", "second-é", "last"]
+
+
+@pytest.mark.asyncio
+async def test_import_endpoint(client):
+    record = {
+        "key_hash": get_password_hash("key-e-eeee"),
+        "key_hint": "eeee",
+        "group": "endpoint-import",
+        "expiration_date": EXPIRES,
+    }
+    resp = await client.post(
+        "/private/v1/admin/keys/import",
+        params={"format": "ndjson"},
+        content=json.dumps(record) + "\n" + json.dumps({"key_hint": "x"}) + "\n",
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["imported"] == 1
+    assert body["rejected"] == 1
+    assert body["rejections_truncated"] is False
+
+    keys = await client.get("/private/v1/admin/keys", params={"group": "endpoint-import"})
+    assert [key["key_hint"] for key in keys.json()] == ["eeee"]
@@ -0,0 +1,125 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select, text
+
+from app.core.crud import bootstrap_keys
+from app.core.crud.key_group_stats import get_stats
+from app.core.crud.key_partitions import (
+    DEFAULT_PARTITION,
+    KEYS_TABLE,
+    default_partition_months,
+    drop_partition,
+    ensure_partitions,
+    expired_partitions,
+)
+from app.core.crud.partitions import list_partitions
+from app.core.db import models
+from app.core.schemas import schemas
+
+
+async def add_key(db_session, expiration_date: datetime, group: str = "lot-1") -> int:
+    db_key = models.BootstrapKey(
+        key_hash=f"hash-{expiration_date.isoformat()}",
+        key_hint="hint",
+        key_group=group,
+        expiration_date=expiration_date,
+    )
+    db_session.add(db_key)
+    await db_session.flush()
+    return db_key.id
+
+
+async def partition_of(db_session, key_id: int) -> str:
+    result = await db_session.execute(
+        text(f"SELECT tableoid::regclass::text FROM {KEYS_TABLE} WHERE id = :id"), {"id": key_id}
+    )
+    return result.scalar_one()
+
+
+@pytest.mark.asyncio
+class TestKeyPartitions:
+    async def test_keys_without_partition_go_to_the_default_partition(self, db_session):
+        key_id = await add_key(db_session, datetime(2031, 5, 10, tzinfo=timezone.utc))
+
+        assert await partition_of(db_session, key_id) == DEFAULT_PARTITION
+        assert date(2031, 5, 1) in await default_partition_months(db_session)
+
+    async def test_new_partitions_take_over_their_keys(self, db_session):
+        key_id = await add_key(db_session, datetime(2031, 5, 10, tzinfo=timezone.utc))
+
+        created = await ensure_partitions(db_session, [date(2031, 5, 1), date(2031, 6, 1)])
+        assert created == [date(2031, 5, 1), date(2031, 6, 1)]
+        assert await ensure_partitions(db_session, [date(2031, 5, 1)]) == []
+
+        assert await partition_of(db_session, key_id) == "bootstrap_keys_y2031m05"
+        db_key = await db_session.get(models.BootstrapKey, key_id)
+        assert db_key.key_group == "lot-1"
+        later_id = await add_key(db_session, datetime(2031, 6, 2, tzinfo=timezone.utc))
+        assert await partition_of(db_session, later_id) == "bootstrap_keys_y2031m06"
+
+    async def test_partitions_are_attached_with_their_indexes(self, db_session):
+        await ensure_partitions(db_session, [date(2031, 5, 1)])
+
+        indexes = await db_session.execute(
+            text(
+                """
+                SELECT count(*) FILTER (WHERE i.indisvalid), count(inh.inhparent)
+                FROM pg_index i LEFT JOIN pg_inherits inh ON inh.inhrelid = i.indexrelid
+                WHERE i.indrelid = 'bootstrap_keys_y2031m05'::regclass
+                """
+            )
+        )
+        valid, attached = indexes.one()
+        assert valid == attached > 0
+        # The CHECK constraints sparing the scans are gone
+        constraints = await db_session.scalars(
+            text(
+                """
+                SELECT conname FROM pg_constraint WHERE contype = 'c' AND conrelid IN (
+                    'bootstrap_keys_y2031m05'::regclass, 'bootstrap_keys_default'::regclass
+                )
+                """
+            )
+        )
+        assert list(constraints) == []
+
+    async def test_unexpired_listing_skips_expired_partitions(self, db_session):
+        await ensure_partitions(db_session, [date(2020, 1, 1), date(2099, 1, 1)])
+        query = bootstrap_keys._apply_key_filters(select(models.BootstrapKey), {"expired": False})
+        compiled = query.compile(
+            dialect=db_session.bind.dialect, compile_kwargs={"literal_binds": True}
+        )
+
+        plan = "\n".join((await db_session.execute(text(f"EXPLAIN {compiled}"))).scalars())
+
+        assert "bootstrap_keys_y2099m01" in plan
+        assert "bootstrap_keys_y2020m01" not in plan
+
+    async def test_dropping_a_partition_removes_its_keys_and_stats(self, db_session):
+        key_data = schemas.BootstrapKeyCreateRequest(group="lot-live")
+        live_key, _ = await bootstrap_keys.create_key(db_session, key_data)
+        expired_id = await add_key(
+            db_session, datetime(2020, 1, 15, tzinfo=timezone.utc), group="lot-old"
+        )
+        db_session.add(
+            models.KeyGroupStats(
+                key_group="lot-old",
+                expiration_hour=datetime(2020, 1, 15, tzinfo=timezone.utc),
+                active_count=1,
+                inactive_count=0,
+                used_count=0,
+            )
+        )
+        await ensure_partitions(db_session, [date(2020, 1, 1)])
+
+        assert await expired_partitions(db_session, datetime(2020, 2, 1, tzinfo=timezone.utc)) == [
+            date(2020, 1, 1)
+        ]
+        await drop_partition(db_session, date(2020, 1, 1))
+
+        assert date(2020, 1, 1) not in await list_partitions(db_session, KEYS_TABLE)
+        remaining = set((await db_session.scalars(select(models.BootstrapKey.id))).all())
+        assert expired_id not in remaining
+        assert live_key.id in remaining
+        assert "lot-old" not in {row["group"] for row in await get_stats(db_session)}